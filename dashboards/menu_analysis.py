@@ -3,23 +3,61 @@ import pandas as pd
 import plotly.express as px
 from pathlib import Path
 
-def show_menu_analysis(item_data=None):
+from utils.calendar_dim import calendar_lookup, day_key
+from utils.perf_profiler import cache_call, cache_miss, chart
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def item_trends(data_version, _item_data, top_items, period):
+    """
+    Revenue / quantity of the top items per 'Date' or 'Week'.
+
+    _item_data is not hashed: data_version identifies it (None = the static
+    CSV fallback). Returns None if there is no item-level data.
+    """
+    cache_miss("item_trends")
+    if _item_data is not None and not _item_data.empty:
+        trend_source = _item_data
+    else:
+        data_path = Path(__file__).parent.parent / 'data' / 'raw' / 'chocoberry_cardiff'
+        trend_source = pd.read_csv(data_path / 'sales_data.csv')
+    if 'Item' not in trend_source.columns:
+        return None
+
+    top_items_rows = trend_source[trend_source['Item'].isin(top_items)]
+    order_time = pd.to_datetime(top_items_rows['Order time'])
+    if period == 'Date':
+        keys = order_time.dt.date
+    else:
+        # Monday-Sunday week labels from the calendar dimension
+        weeks = calendar_lookup(day_key(order_time), ['Week'])['Week']
+        keys = pd.Series(weeks.astype(str).to_numpy(), index=top_items_rows.index)
+
+    trends = top_items_rows.groupby([keys.rename(period), top_items_rows['Item']], observed=True).agg({
+        'Revenue': 'sum',
+        'Quantity': 'sum'
+    }).reset_index()
+    trends.columns = [period, 'Item', 'Revenue', 'Quantity']
+    return trends
+
+
+def show_menu_analysis(item_data=None, data_version=None):
     st.markdown("---")
     st.header("🍔 Menu Analysis")
     st.caption("Detailed breakdown of top sellers, categories, and slow-moving items")
 
     # ── DATA SOURCE LOGIC ──────────────────────────────────
     if item_data is not None and not item_data.empty:
-        st.sidebar.info("✨ Using Live Item Details")
+        st.caption("✨ Using Live Item Details")
 
-        most_sold = item_data.groupby('Item').agg({
+        most_sold = item_data.groupby('Item', observed=True).agg({
             'Revenue': 'sum',
             'Quantity': 'sum'
         }).reset_index()
         most_sold.columns = ['Item', 'Sales', 'Items sold']
         most_sold = most_sold.sort_values('Sales', ascending=False)
 
-        categories = item_data.groupby('Category').agg({
+        categories = item_data.groupby('Category', observed=True).agg({
             'Revenue': 'sum',
             'Quantity': 'sum'
         }).reset_index()
@@ -44,7 +82,7 @@ def show_menu_analysis(item_data=None):
                     df['Items sold'] = pd.to_numeric(
                         df['Items sold'].astype(str).str.replace(',', ''), errors='coerce'
                     )
-            st.sidebar.warning("⚠️ Using Static CSV Data")
+            st.warning("⚠️ Using Static CSV Data")
 
         except Exception as e:
             st.info("No menu data available yet. Menu analysis will populate as new orders come in via webhook.")
@@ -69,7 +107,8 @@ def show_menu_analysis(item_data=None):
             color_continuous_scale='Greens'
         )
         fig_rev.update_layout(yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig_rev, use_container_width=True)
+        with chart("menu_top_revenue", fig_rev):
+            st.plotly_chart(fig_rev, use_container_width=True)
 
     with col2:
         sorted_vol = most_sold.sort_values('Items sold', ascending=False).head(10)
@@ -83,7 +122,8 @@ def show_menu_analysis(item_data=None):
             color_continuous_scale='Blues'
         )
         fig_vol.update_layout(yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig_vol, use_container_width=True)
+        with chart("menu_top_quantity", fig_vol):
+            st.plotly_chart(fig_vol, use_container_width=True)
 
     # ── CATEGORY ANALYSIS ──────────────────────────────────
     st.subheader("📂 Category Performance")
@@ -97,7 +137,8 @@ def show_menu_analysis(item_data=None):
             title="Revenue Share by Category",
             hole=0.4
         )
-        st.plotly_chart(fig_cat, use_container_width=True)
+        with chart("menu_categories", fig_cat):
+            st.plotly_chart(fig_cat, use_container_width=True)
 
     with col4:
         st.markdown("### 💡 Insights")
@@ -121,81 +162,57 @@ def show_menu_analysis(item_data=None):
     st.caption("Track how your top items perform over time")
 
     try:
-        if item_data is not None and not item_data.empty:
-            sales_df_for_trends = item_data.copy()
-        else:
-            data_path = Path(__file__).parent.parent / 'data' / 'raw' / 'chocoberry_cardiff'
-            sales_df_for_trends = pd.read_csv(data_path / 'sales_data.csv')
-            sales_df_for_trends['Order time'] = pd.to_datetime(sales_df_for_trends['Order time'])
-
-        top_5_items = most_sold.head(5)['Item'].tolist()
-        tab1, tab2 = st.tabs(["📅 Daily Trends", "📊 Weekly Trends"])
+        top_5_items = tuple(most_sold.head(5)['Item'].tolist())
+        # Only the open tab is computed (and each result is cached per data version)
+        tab1, tab2 = st.tabs(["📅 Daily Trends", "📊 Weekly Trends"], key="menu_trend_tabs", on_change="rerun")
 
         with tab1:
-            st.markdown("**Daily sales for top 5 items**")
-            if 'Item' in sales_df_for_trends.columns:
-                top_items_daily = sales_df_for_trends[
-                    sales_df_for_trends['Item'].isin(top_5_items)
-                ].copy()
-                top_items_daily['Date'] = pd.to_datetime(
-                    top_items_daily['Order time']
-                ).dt.date
-
-                daily_trends = top_items_daily.groupby(['Date', 'Item']).agg({
-                    'Revenue': 'sum',
-                    'Quantity': 'sum'
-                }).reset_index()
-                daily_trends.columns = ['Date', 'Item', 'Revenue', 'Quantity']
-
-                fig_daily = px.line(
-                    daily_trends,
-                    x='Date',
-                    y='Revenue',
-                    color='Item',
-                    title='Daily Revenue by Top 5 Items',
-                    markers=True
-                )
-                fig_daily.update_layout(hovermode='x unified')
-                st.plotly_chart(fig_daily, use_container_width=True)
-            else:
-                st.info("Item-level daily data will appear as new webhook orders come in.")
+            if tab1.open:
+                st.markdown("**Daily sales for top 5 items**")
+                with cache_call("item_trends"):
+                    daily_trends = item_trends(data_version, item_data, top_5_items, 'Date')
+                if daily_trends is not None:
+                    fig_daily = px.line(
+                        daily_trends,
+                        x='Date',
+                        y='Revenue',
+                        color='Item',
+                        title='Daily Revenue by Top 5 Items',
+                        markers=True
+                    )
+                    fig_daily.update_layout(hovermode='x unified')
+                    with chart("menu_daily_trends", fig_daily):
+                        st.plotly_chart(fig_daily, use_container_width=True)
+                else:
+                    st.info("Item-level daily data will appear as new webhook orders come in.")
 
         with tab2:
-            st.markdown("**Weekly sales for top 5 items**")
-            if 'Item' in sales_df_for_trends.columns:
-                top_items_weekly = sales_df_for_trends[
-                    sales_df_for_trends['Item'].isin(top_5_items)
-                ].copy()
-                top_items_weekly['Week'] = pd.to_datetime(
-                    top_items_weekly['Order time']
-                ).dt.to_period('W').astype(str)
-
-                weekly_trends = top_items_weekly.groupby(['Week', 'Item']).agg({
-                    'Revenue': 'sum',
-                    'Quantity': 'sum'
-                }).reset_index()
-                weekly_trends.columns = ['Week', 'Item', 'Revenue', 'Quantity']
-
-                fig_weekly = px.bar(
-                    weekly_trends,
-                    x='Week',
-                    y='Revenue',
-                    color='Item',
-                    title='Weekly Revenue by Top 5 Items',
-                    barmode='group'
-                )
-                st.plotly_chart(fig_weekly, use_container_width=True)
-
-                st.markdown("**Weekly Summary Table**")
-                pivot_table = weekly_trends.pivot(
-                    index='Week', columns='Item', values='Revenue'
-                ).fillna(0)
-                pivot_table = pivot_table.apply(
-                    lambda x: x.map(lambda y: f"£{y:,.0f}")
-                )
-                st.dataframe(pivot_table, use_container_width=True)
-            else:
-                st.info("Item-level weekly data will appear as new webhook orders come in.")
+            if tab2.open:
+                st.markdown("**Weekly sales for top 5 items**")
+                with cache_call("item_trends"):
+                    weekly_trends = item_trends(data_version, item_data, top_5_items, 'Week')
+                if weekly_trends is not None:
+                    fig_weekly = px.bar(
+                        weekly_trends,
+                        x='Week',
+                        y='Revenue',
+                        color='Item',
+                        title='Weekly Revenue by Top 5 Items',
+                        barmode='group'
+                    )
+                    with chart("menu_weekly_trends", fig_weekly):
+                        st.plotly_chart(fig_weekly, use_container_width=True)
+
+                    st.markdown("**Weekly Summary Table**")
+                    pivot_table = weekly_trends.pivot(
+                        index='Week', columns='Item', values='Revenue'
+                    ).fillna(0)
+                    pivot_table = pivot_table.apply(
+                        lambda x: x.map(lambda y: f"£{y:,.0f}")
+                    )
+                    st.dataframe(pivot_table, use_container_width=True)
+                else:
+                    st.info("Item-level weekly data will appear as new webhook orders come in.")
 
     except Exception as e:
         st.warning(f"⚠️ Could not load trend data: {e}")
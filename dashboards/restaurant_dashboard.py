@@ -5,15 +5,17 @@ Built with Streamlit - Connected to Supabase
 """
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 import sys
+import functools
 import logging
 import psycopg2
-from sqlalchemy import create_engine
 from urllib.parse import quote_plus
 
 
@@ -21,6 +23,29 @@ from urllib.parse import quote_plus
 sys.path.append(str(Path(__file__).parent))
 sys.path.append(str(Path(__file__).parent.parent))
 from menu_analysis import show_menu_analysis
+from utils.background_refresh import BackgroundRefresher
+from utils.calendar_dim import calendar_lookup, day_key, restaurant_now
+from utils.chart_resolution import bar_bins, downsample, scatter_trace
+from utils.data_export import ExportCache, available_formats, export_file_type, export_key, write_export
+from utils.data_version import current_data_version
+from utils.db import POOL_DEFAULTS, create_pooled_engine, get_pool_stats
+from utils.demand_cube import DemandCube
+from utils.derived_columns import add_derived_columns, source_columns
+from utils.filter_engine import FilterIndex
+from utils.forecast import Forecaster
+from utils.order_schema import memory_report
+from utils.order_value_sketch import OrderValueSketches, histogram, quantiles, sketch_mean
+from utils.order_store import OrderStore
+from utils.period_compare import COMPARISONS, DailyTotals, change, comparison_range, prior_range
+from utils.pacing import SLOT_LABELS, current_slot, pacing_summary, today_curve, typical_curves
+from utils.perf_profiler import Profiler, cache_call, cache_miss, chart, stage
+from utils.rollup_cache import RollupCache
+from utils.rollup_engine import build_rollups
+from utils.snapshot_cache import SnapshotCache
+from utils.sql_rollups import build_where, fetch_rollups
+from utils.time_buckets import HOUR_LABELS, meal_periods_from_config
+from utils.time_index import date_range_positions
+from utils.transaction_pages import PAGE_SIZES, SORT_KEYS, date_cursor, fetch_page
 
 # ============================================================================
 # PASSWORD PROTECTION
@@ -28,8 +53,15 @@ from menu_analysis import show_menu_analysis
 
 def check_password():
     def password_entered():
+        admin_password = st.secrets.get("admin_password")
         if st.session_state["password"] == st.secrets["password"]:
             st.session_state["password_correct"] = True
+            st.session_state["is_admin"] = False
+            del st.session_state["password"]
+        elif admin_password and st.session_state["password"] == admin_password:
+            # The admin password also unlocks the sidebar performance panel
+            st.session_state["password_correct"] = True
+            st.session_state["is_admin"] = True
             del st.session_state["password"]
         else:
             st.session_state["password_correct"] = False
@@ -76,81 +108,213 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ============================================================================
-# SUPABASE CONNECTION
+# PROFILING
 # ============================================================================
+SNAPSHOT_DIR = Path(__file__).parent.parent / 'data' / 'cache'
+IS_ADMIN = st.session_state.get("is_admin", False)
+
+
+@st.cache_resource
+def get_profiler():
+    """Run timings shared by every session, also logged to data/cache/perf.log."""
+    return Profiler(log_path=str(SNAPSHOT_DIR / 'perf.log'))
+
+
+def section(name):
+    """Time a dashboard section: a stage of the page run, or its own run on a fragment rerun."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            # A fragment rerun has no page run, whatever an interrupted page
+            # run (st.stop / st.rerun / an error) left on this thread
+            ctx = get_script_run_ctx()
+            standalone = ctx is not None and bool(ctx.fragment_ids_this_run)
+            with get_profiler().section(name, detailed=IS_ADMIN, standalone=standalone):
+                return fn(*args, **kwargs)
+        return timed
+    return decorate
 
 
+# Every stage below is timed into this run; admins also get chart payload sizes
+page_run = get_profiler().start("page", detailed=IS_ADMIN)
+
+# ============================================================================
+# SUPABASE CONNECTION
+# ============================================================================
+
+@st.cache_resource
 def get_db():
+    # One engine (and connection pool) per process, reused by every session
     db_host     = st.secrets["supabase"]["db_host"]
     db_port     = st.secrets["supabase"]["db_port"]
     db_name     = st.secrets["supabase"]["db_name"]
     db_user     = st.secrets["supabase"]["db_user"]
     db_password = quote_plus(st.secrets["supabase"]["db_password"])
-    
+    pool_settings = {
+        key: st.secrets["supabase"].get(key, default) for key, default in POOL_DEFAULTS.items()
+    }
+
     connection_string = f"postgresql+psycopg2://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-    return create_engine(connection_string)
+    return create_pooled_engine(connection_string, **pool_settings)
 # ============================================================================
 # LOAD DATA FROM SUPABASE
 # ============================================================================
-@st.cache_data(ttl=30)
-def load_data():
-    try:
-        engine = get_db()
-
-        query = """
-        SELECT
-            order_id as "Order ID",
-            order_time as "Order time",
-            property_name as "Property name",
-            gross_sales as "Gross sales",
-            tax as "Tax on gross sales",
-            tips as "Tips",
-            delivery_charges as "Delivery charges",
-            service_charges as "Service charges",
-            additional_charges as "Additional charges",
-            charges as "Charges",
-            revenue as "Revenue",
-            refunds as "Refunds",
-            discounts as "Discounts",
-            dispatch_type as "Dispatch type",
-            payment_method as "Payment method",
-            sales_channel_type as "Sales channel type",
-            sales_channel_name as "Sales channel name",
-            is_preorder as "Is preorder"
-        FROM orders
-        ORDER BY order_time DESC
-        """
-
-        item_query = """
-        SELECT
-            order_id as "Order ID",
-            order_time as "Order time",
-            item_name as "Item",
-            category as "Category",
-            price as "Price",
-            quantity as "Quantity",
-            revenue as "Revenue"
-        FROM order_items
-        """
-
-        with engine.connect() as conn:
-            sales_data = pd.read_sql_query(query, conn)
-            item_data  = pd.read_sql_query(item_query, conn)
-
-        sales_data['Order time'] = pd.to_datetime(
-            sales_data['Order time'], format='mixed', dayfirst=False
-        )
-        if not item_data.empty:
-            item_data['Order time'] = pd.to_datetime(
-                item_data['Order time'], format='mixed', dayfirst=False
-            )
 
-        return sales_data, "supabase", item_data
 
+@st.cache_resource
+def get_order_store():
+    """One incremental store per server process, shared by all sessions."""
+    source = f"{st.secrets['supabase']['db_host']}/{st.secrets['supabase']['db_name']}"
+    # Optional [dashboard] history_days keeps only that many recent days in memory
+    history_days = st.secrets.get("dashboard", {}).get("history_days")
+    return OrderStore(
+        snapshot=SnapshotCache(str(SNAPSHOT_DIR), source=source),
+        window_days=history_days,
+    )
+
+
+# How often the background refresher polls the data_version counter
+DATA_VERSION_POLL_SECONDS = 10
+
+
+@st.cache_resource
+def get_refresher():
+    """
+    One background refresher per process: rebuilds the dataset off the
+    request path whenever the data version moves (utils.data_version), so
+    viewers never wait on Supabase after the first load.
+    """
+    engine, store, meal_periods = get_db(), get_order_store(), get_meal_periods()
+    profiler = get_profiler()
+    source = f"{st.secrets['supabase']['db_host']}/{st.secrets['supabase']['db_name']}"
+    forecast_path = str(SNAPSHOT_DIR / 'forecast.npz')
+    demand = {"cube": None, "sketches": None, "forecaster": None}
+
+    def build(data_version):
+        _, rewrite_version = data_version
+        with profiler.run("refresh"):
+            # Only orders newer than the store's watermark cross the network
+            with stage("load_data"):
+                sales_data, item_data = store.refresh(engine, rewrite_version)
+            # Day / week / month / hour / meal period columns are derived once per
+            # load; sections read them through the filtered view, never a copy
+            with stage("derived_columns"):
+                sales_data = add_derived_columns(sales_data, meal_periods)
+            # Sidebar filter bitmaps and the unfiltered rollups are built once
+            # per load, not per rerun
+            with stage("filter_index"):
+                filter_index = FilterIndex(sales_data)
+            with stage("rollups"):
+                all_rollups = build_rollups(sales_data)
+            # The weekday x time-of-day cube only regroups the re-read tail
+            with stage("demand_cube"):
+                previous = demand["cube"]
+                if previous is None:
+                    cube = DemandCube.build(sales_data)
+                else:
+                    cube = previous.updated(sales_data, since=store.changed_since)
+            # Per-day order-value sketches, merged per request for percentiles
+            with stage("order_value_sketches"):
+                previous = demand["sketches"]
+                if previous is None:
+                    sketches = OrderValueSketches.build(sales_data)
+                else:
+                    sketches = previous.updated(sales_data, since=store.changed_since)
+            # Daily KPI totals behind every period-over-period comparison
+            with stage("daily_totals"):
+                daily_totals = DailyTotals.build(sales_data)
+            # Forecast states absorb only the newly closed days; the saved
+            # state lets a restart resume instead of refitting
+            with stage("forecast"):
+                previous = demand["forecaster"] or Forecaster.load(forecast_path, source)
+                forecaster = previous.updated(daily_totals, restaurant_now().date(), since=store.changed_since)
+                if forecaster is not previous:
+                    forecaster.save(forecast_path, source)
+        demand["cube"], demand["sketches"], demand["forecaster"] = cube, sketches, forecaster
+        return sales_data, item_data, filter_index, all_rollups, cube, daily_totals, sketches, forecaster
+
+    return BackgroundRefresher(
+        build, lambda: current_data_version(engine), interval=DATA_VERSION_POLL_SECONDS
+    )
+
+
+def get_data():
+    """
+    Latest dataset snapshot, or None if there has never been a good load.
+
+    Returns:
+        DataSnapshot whose value is
+        (sales_data, item_data, filter_index, all_rollups, demand_cube, daily_totals,
+        order_value_sketches, forecaster)
+    """
+    try:
+        return get_refresher().get()
     except Exception as e:
         logging.error(f"Supabase Load Error: {e}")
         st.error(f"Database error: {e}")
-        return None, "error", None
+        return None
+
+
+@st.cache_resource(max_entries=256)
+def get_filter_rows(_filter_index, index_token, lo, hi, selections):
+    """Row positions for one filter combination, shared across sessions."""
+    cache_miss("filter_rows")
+    return _filter_index.select(lo, hi, dict(selections))
+
+
+@st.cache_resource(max_entries=2)
+def get_memory_report(_sales_data, data_version):
+    """Per-column bytes of the orders frame; the deep scan runs once per data version."""
+    cache_miss("memory_report")
+    return memory_report(_sales_data)
+
+
+def get_meal_periods():
+    """Shop-specific [[meal_periods]] from secrets, else the defaults."""
+    return meal_periods_from_config(st.secrets.get("meal_periods"))
+
+
+@st.cache_resource
+def get_rollup_cache():
+    """Rollup bundles shared by every session, keyed by data version and filters."""
+    settings = st.secrets.get("dashboard", {})
+    return RollupCache(
+        max_entries=int(settings.get("rollup_cache_entries", 128)),
+        max_bytes=int(settings.get("rollup_cache_mb", 64)) * 1024 * 1024,
+    )
+
+
+def load_rollups(start_date, end_date, dispatch_type, channel_type):
+    """Section aggregates grouped in Supabase; only the small results come back."""
+    return fetch_rollups(
+        get_db(), start_date, end_date, dispatch_type, channel_type,
+        meal_periods=get_meal_periods(),
+    )
+
+
+@st.cache_resource(max_entries=16)
+def get_pacing_curves(_demand_cube, closed_version, today, dispatch_type, channel_type):
+    """Typical same-weekday curves; only rebuilt once a day has closed."""
+    cache_miss("pacing_curves")
+    return typical_curves(_demand_cube, today, dispatch_type, channel_type)
+
+
+@st.cache_resource
+def get_export_cache():
+    """Finished export files on local disk, shared by every session."""
+    return ExportCache(str(SNAPSHOT_DIR / 'exports'))
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def load_transaction_page(data_version, start_date, end_date, dispatch_type, channel_type,
+                          sort, descending, after, page_size):
+    """One keyset page of the transaction grid; only page_size rows come back."""
+    cache_miss("transaction_page")
+    where, params = build_where(start_date, end_date, dispatch_type, channel_type)
+    with get_db().connect() as conn:
+        return fetch_page(conn, where, params, sort, descending, after, page_size)
+
+
 # ============================================================================
 # SIDEBAR
 # ============================================================================
@@ -158,238 +322,511 @@ def load_data():
 st.sidebar.image("https://cdn-icons-png.flaticon.com/512/3170/3170733.png", width=100)
 
 if st.sidebar.button("🔄 Refresh Data"):
-    load_data.clear()
-    st.rerun()
+    # Manual refresh re-reads the full history (picks up edited/refunded orders)
+    get_order_store().reset()
+    get_rollup_cache().clear()
+    get_export_cache().clear()
+    try:
+        get_refresher().refresh_now()
+    except Exception as e:
+        logging.error(f"Manual refresh failed: {e}")
+        st.sidebar.error(f"Refresh failed: {e}")
+    else:
+        st.rerun()
 
 # Load Data
-sales_data, data_source, item_data = load_data()
+with stage("load_data"):
+    snapshot = get_data()
 
-if sales_data is None:
+if snapshot is None:
     st.error("Error loading data from Supabase.")
     st.stop()
 
+data_version = snapshot.version
+(sales_data, item_data, filter_index, all_rollups, demand_cube, daily_totals,
+ order_value_sketches, forecaster) = snapshot.value
+
 # Sidebar stats
 total_db = len(sales_data)
 st.sidebar.success(f"🟢 **Live Supabase**")
 st.sidebar.caption(f"💎 Total: {total_db:,} orders")
 st.sidebar.caption(f"📅 Latest: {sales_data['Order time'].max().strftime('%d %b %Y %H:%M')}")
+st.sidebar.caption(
+    f"🕒 Loaded {snapshot.built_at.strftime('%H:%M:%S')} ({snapshot.age_seconds:.0f}s ago)"
+)
+if get_refresher().last_error is not None:
+    st.sidebar.warning(f"Showing last good data - refresh failed: {get_refresher().last_error}")
+
+with st.sidebar.expander("🔌 Connection Pool"):
+    pool_stats = get_pool_stats(get_db())
+    st.caption(
+        f"In use: {pool_stats['checked_out']} · Idle: {pool_stats['idle']} · "
+        f"Overflow: {pool_stats['overflow']}"
+    )
+    st.caption(
+        f"Connects: {pool_stats['connects']:,} · Checkouts: {pool_stats['checkouts']:,} · "
+        f"Waits: {pool_stats['waits']:,} ({pool_stats['wait_seconds']:.2f}s)"
+    )
+
+with st.sidebar.expander("💾 Data Memory"):
+    sales_memory = get_memory_report(sales_data, data_version)
+    st.caption(f"Orders frame: {sales_memory['Bytes'].sum() / 1024 / 1024:.2f} MB")
+    st.dataframe(sales_memory, hide_index=True, use_container_width=True)
+    rollup_stats = get_rollup_cache().stats()
+    st.caption(
+        f"Rollup cache: {rollup_stats['entries']} bundles · "
+        f"{rollup_stats['bytes'] / 1024 / 1024:.2f} MB · "
+        f"{rollup_stats['hits']:,} hits / {rollup_stats['misses']:,} misses"
+    )
 
 st.sidebar.title("Filters")
 
-# Date filter
-min_date = sales_data['Order time'].min().date()
-max_date = sales_data['Order time'].max().date()
-
-st.sidebar.subheader("📅 Date Range")
-date_range = st.sidebar.date_input(
-    "Select Date Range",
-    value=(min_date, max_date),
-    min_value=min_date,
-    max_value=max_date
-)
-
-if len(date_range) == 2:
-    start_date, end_date = date_range
-    filtered_sales = sales_data[
-        (sales_data['Order time'].dt.date >= start_date) &
-        (sales_data['Order time'].dt.date <= end_date)
-    ]
-else:
-    start_date, end_date = min_date, max_date
-    filtered_sales = sales_data
-
-# Dispatch filter
-st.sidebar.subheader("🚚 Dispatch Type")
-all_dispatch_types = ['All'] + list(filtered_sales['Dispatch type'].dropna().unique())
-selected_dispatch = st.sidebar.selectbox("Select Dispatch Type", all_dispatch_types)
-if selected_dispatch != 'All':
-    filtered_sales = filtered_sales[filtered_sales['Dispatch type'] == selected_dispatch]
-
-# Channel filter
-st.sidebar.subheader("📱 Sales Channel")
-all_channels = ['All'] + list(filtered_sales['Sales channel type'].dropna().unique())
-selected_channel = st.sidebar.selectbox("Select Sales Channel", all_channels)
-if selected_channel != 'All':
-    filtered_sales = filtered_sales[filtered_sales['Sales channel type'] == selected_channel]
+with stage("filters"):
+    # Date filter
+    min_date = sales_data['Order time'].min().date()
+    max_date = sales_data['Order time'].max().date()
+
+    st.sidebar.subheader("📅 Date Range")
+    date_range = st.sidebar.date_input(
+        "Select Date Range",
+        value=(min_date, max_date),
+        min_value=min_date,
+        max_value=max_date
+    )
+
+    if len(date_range) == 2:
+        start_date, end_date = date_range
+        # sales_data is sorted on Order time: binary search for the row range
+        lo, hi = date_range_positions(sales_data, start_date, end_date)
+    else:
+        start_date, end_date = min_date, max_date
+        lo, hi = 0, len(sales_data)
+
+    # Dimension filters - each option list only offers values present in the
+    # rows selected so far; rows come from the precomputed bitmaps.
+    selections = {}
+    filter_rows = None
+
+    st.sidebar.subheader("🚚 Dispatch Type")
+    all_dispatch_types = ['All'] + filter_index.values_in('Dispatch type', slice(lo, hi))
+    selected_dispatch = st.sidebar.selectbox("Select Dispatch Type", all_dispatch_types)
+    if selected_dispatch != 'All':
+        selections['Dispatch type'] = (selected_dispatch,)
+        with cache_call("filter_rows"):
+            filter_rows = get_filter_rows(filter_index, filter_index.token, lo, hi, tuple(selections.items()))
+
+    st.sidebar.subheader("📱 Sales Channel")
+    channel_rows = slice(lo, hi) if filter_rows is None else filter_rows
+    all_channels = ['All'] + filter_index.values_in('Sales channel type', channel_rows)
+    selected_channel = st.sidebar.selectbox("Select Sales Channel", all_channels)
+    if selected_channel != 'All':
+        selections['Sales channel type'] = (selected_channel,)
+        with cache_call("filter_rows"):
+            filter_rows = get_filter_rows(filter_index, filter_index.token, lo, hi, tuple(selections.items()))
+
+    filtered_sales = FilterIndex.apply(sales_data, lo, hi, filter_rows)
 
 st.sidebar.markdown("---")
 st.sidebar.info(f"📊 **{len(filtered_sales):,}** transactions selected")
 
+# The selection as the SQL / cube / daily-total helpers take it (None = all)
+dispatch_type = None if selected_dispatch == 'All' else selected_dispatch
+channel_type = None if selected_channel == 'All' else selected_channel
+
+# Section rollups: one pass over the filtered orders already in memory, or
+# pushed down to Supabase with [dashboard] rollup_source = "database".
+# Either way each (data version, filters) bundle is built once per process.
+rollup_source = st.secrets.get("dashboard", {}).get("rollup_source", "memory")
+rollup_key = RollupCache.key(
+    data_version, source=rollup_source, start_date=start_date, end_date=end_date,
+    dispatch=selected_dispatch, channel=selected_channel,
+)
+with stage("rollups"):
+    if rollup_source == "database":
+        rollups = get_rollup_cache().get_or_build(rollup_key, lambda: load_rollups(
+            start_date, end_date, dispatch_type, channel_type,
+        ))
+    elif filter_rows is None and (lo, hi) == (0, len(sales_data)):
+        # Unfiltered full range: already built by the background refresher
+        rollups = all_rollups
+    else:
+        rollups = get_rollup_cache().get_or_build(rollup_key, lambda: build_rollups(filtered_sales))
+
 # ============================================================================
 # MAIN DASHBOARD
 # ============================================================================
+# Each section is an st.fragment taking exactly the filter-dependent data it
+# draws from (rollups / filtered_sales / item_data). Sidebar changes rerun the
+# page; a widget inside a section reruns only that section.
 
 st.markdown('<h1 class="main-header">🍽️ Restaurant Analytics Dashboard</h1>', unsafe_allow_html=True)
 st.markdown(f"**Analytics Period:** {start_date.strftime('%d %b %Y')} - {end_date.strftime('%d %b %Y')}")
 
 # KPI METRICS
-col1, col2, col3, col4, col5 = st.columns(5)
-with col1:
-    total_revenue = filtered_sales['Revenue'].sum()
-    revenue_display = f"£{total_revenue/1000:.1f}K" if total_revenue >= 1000 else f"£{total_revenue:,.2f}"
-    st.metric("💰 Total Revenue", revenue_display, f"{len(filtered_sales)} orders")
-with col2:
-    avg_order_value = filtered_sales['Gross sales'].mean()
-    st.metric("📊 Average Order", f"£{avg_order_value:.2f}", "Per transaction")
-with col3:
-    st.metric("🧾 Total Orders", f"{len(filtered_sales):,}", "All time")
-with col4:
-    total_tax = filtered_sales['Tax on gross sales'].sum()
-    tax_display = f"£{total_tax/1000:.1f}K" if total_tax >= 1000 else f"£{total_tax:,.2f}"
-    st.metric("💷 Total Tax", tax_display, "Collected")
-with col5:
-    total_delivery = filtered_sales['Delivery charges'].sum()
-    st.metric("📦 Delivery Charges", f"£{total_delivery:,.2f}", "Total delivery fees")
+@st.fragment
+@section("kpi_metrics")
+def kpi_metrics(daily_totals, start_date, end_date, dispatch_type, channel_type):
+    # Current and prior values are both lookups in the daily totals table
+    basis = st.selectbox("Compare to", COMPARISONS, key="kpi_compare")
+    compared = comparison_range(daily_totals, start_date, end_date, basis)
+    current = daily_totals.kpis(start_date, end_date, dispatch_type, channel_type)
+    prior = compared and daily_totals.kpis(compared[1], compared[2], dispatch_type, channel_type)
+
+    def delta(name, fallback):
+        # Without a loaded prior range (e.g. the full history) keep the plain captions
+        if prior is None:
+            return fallback
+        growth = change(current[name], prior[name])
+        return None if growth is None else f"{growth:+.1%} vs {compared[0].lower()}"
+
+    col1, col2, col3, col4, col5 = st.columns(5)
+    with col1:
+        total_revenue = current['Revenue']
+        revenue_display = f"£{total_revenue/1000:.1f}K" if total_revenue >= 1000 else f"£{total_revenue:,.2f}"
+        st.metric("💰 Total Revenue", revenue_display, delta('Revenue', f"{current['Orders']:,.0f} orders"))
+    with col2:
+        st.metric("📊 Average Order", f"£{current['Average Order']:.2f}", delta('Average Order', "Per transaction"))
+    with col3:
+        st.metric("🧾 Total Orders", f"{current['Orders']:,.0f}", delta('Orders', "In period"))
+    with col4:
+        total_tax = current['Tax']
+        tax_display = f"£{total_tax/1000:.1f}K" if total_tax >= 1000 else f"£{total_tax:,.2f}"
+        st.metric("💷 Total Tax", tax_display, delta('Tax', "Collected"))
+    with col5:
+        st.metric(
+            "📦 Delivery Charges", f"£{current['Delivery Charges']:,.2f}",
+            delta('Delivery Charges', "Total delivery fees"),
+        )
 
+    if prior is None:
+        st.caption("No comparison: no earlier period of the same length is in the loaded history")
+    else:
+        _, prior_start, prior_end = compared
+        period = f"{prior_start.strftime('%d %b %Y')} - {prior_end.strftime('%d %b %Y')}"
+        fallback = "" if compared[0] == basis else f" (previous period: {basis.lower()} is outside the loaded history)"
+        st.caption(f"Compared with {period}{fallback}")
+
+
+kpi_metrics(daily_totals, start_date, end_date, dispatch_type, channel_type)
 st.markdown("---")
 
 # ============================================================================
-# SECTION 1: PERFORMANCE TRENDS
+# INTRADAY PACING
 # ============================================================================
 
-st.header("📊 Performance Trends")
-
-daily_data = filtered_sales.groupby(filtered_sales['Order time'].dt.date).agg({
-    'Revenue': 'sum',
-    'Gross sales': 'sum',
-    'Order ID': 'count'
-}).reset_index()
-daily_data.columns = ['Date', 'Revenue', 'Gross Sales', 'Orders']
-daily_data = daily_data.sort_values('Date')
-daily_data['Revenue_7d_avg'] = daily_data['Revenue'].rolling(window=7, min_periods=1).mean()
-daily_data['Orders_7d_avg'] = daily_data['Orders'].rolling(window=7, min_periods=1).mean()
-
-daily_data['Week'] = pd.to_datetime(daily_data['Date']).dt.isocalendar().week
-weekly_data = daily_data.groupby('Week').agg({
-    'Revenue': 'sum', 'Orders': 'sum', 'Date': 'min'
-}).reset_index().sort_values('Date')
-
-if len(weekly_data) >= 2:
-    wow_revenue_change = ((weekly_data.iloc[-1]['Revenue'] - weekly_data.iloc[-2]['Revenue']) / weekly_data.iloc[-2]['Revenue'] * 100)
-    wow_orders_change  = ((weekly_data.iloc[-1]['Orders']  - weekly_data.iloc[-2]['Orders'])  / weekly_data.iloc[-2]['Orders']  * 100)
-else:
-    wow_revenue_change = wow_orders_change = 0
-
-col1, col2 = st.columns(2)
-with col1:
-    st.subheader("📈 7-Day Rolling Average")
-    fig_rolling = go.Figure()
-    fig_rolling.add_trace(go.Scatter(x=daily_data['Date'], y=daily_data['Revenue'], name='Daily Revenue', line=dict(color='lightblue', width=1), opacity=0.5))
-    fig_rolling.add_trace(go.Scatter(x=daily_data['Date'], y=daily_data['Revenue_7d_avg'], name='7-Day Average', line=dict(color='#FF6B6B', width=3)))
-    fig_rolling.update_layout(height=350, xaxis_title="Date", yaxis_title="Revenue (£)", hovermode='x unified')
-    st.plotly_chart(fig_rolling, use_container_width=True)
-    st.metric("Current 7-Day Average", f"£{daily_data['Revenue_7d_avg'].iloc[-1]:,.2f}/day")
-
-with col2:
-    st.subheader("📅 Week-over-Week Growth")
-    col_a, col_b = st.columns(2)
-    with col_a:
-        st.metric("Revenue Growth", f"{wow_revenue_change:+.1f}%", "vs last week")
-    with col_b:
-        st.metric("Orders Growth", f"{wow_orders_change:+.1f}%", "vs last week")
-    recent_weeks = weekly_data.tail(5).copy()
-    recent_weeks['Week Start'] = pd.to_datetime(recent_weeks['Date']).dt.strftime('%b %d')
-    recent_weeks['Revenue'] = recent_weeks['Revenue'].apply(lambda x: f"£{x:,.0f}")
-    recent_weeks['Orders']  = recent_weeks['Orders'].apply(lambda x: f"{x:,.0f}")
-    st.dataframe(recent_weeks[['Week Start', 'Revenue', 'Orders']], hide_index=True, use_container_width=True)
+@st.fragment(run_every=60)
+@section("intraday_pacing")
+def intraday_pacing(dispatch_type, channel_type):
+    # Redrawn every minute from the latest in-memory snapshot: one cube row
+    # for today plus cached curves, never a scan of the order history
+    snapshot = get_data()
+    if snapshot is None:
+        return
+    demand_cube = snapshot.value[4]
+    # Order times are restaurant-local, so "now" must be too
+    now = restaurant_now()
+    today = now.date()
+    with cache_call("pacing_curves"):
+        curves = get_pacing_curves(
+            demand_cube, demand_cube.closed_version, today, dispatch_type, channel_type
+        )
+    today_so_far = today_curve(demand_cube, today, dispatch_type, channel_type)
+    pace = pacing_summary(curves, today_so_far, now)
+    weekday = today.strftime('%A')
+
+    st.header(f"⏱️ Today's Pacing ({weekday})")
+    if curves.empty:
+        st.caption(f"No past {weekday}s to compare against yet.")
+    else:
+        st.caption(
+            f"Cumulative sales so far vs the last {curves.attrs['days']} {weekday}s "
+            f"(median, with the p10-p90 band) · updated {now.strftime('%H:%M')}"
+        )
+
+    measure = st.radio("Pace by", ['Revenue', 'Orders'], horizontal=True, key="pacing_measure")
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        for name, fmt in (('Revenue', "£{:,.0f}"), ('Orders', "{:,.0f}")):
+            values = pace[name]
+            delta = None if values['pace'] is None else f"{values['pace']:+.0%} vs typical"
+            st.metric(f"{name} so far", fmt.format(values['actual']), delta)
+            if values['median'] is not None:
+                st.caption(
+                    f"Typical by now: {fmt.format(values['median'])} "
+                    f"({fmt.format(values['p10'])}-{fmt.format(values['p90'])})"
+                )
+
+    with col2:
+        slot = current_slot(now)
+        fig_pacing = go.Figure()
+        if not curves.empty:
+            fig_pacing.add_trace(go.Scatter(
+                x=curves['Slot'], y=curves[f'{measure} P90'], line=dict(width=0),
+                name='P90', showlegend=False, hoverinfo='skip'
+            ))
+            fig_pacing.add_trace(go.Scatter(
+                x=curves['Slot'], y=curves[f'{measure} P10'], line=dict(width=0),
+                fill='tonexty', fillcolor='rgba(102,126,234,0.2)', name='P10-P90'
+            ))
+            fig_pacing.add_trace(go.Scatter(
+                x=curves['Slot'], y=curves[f'{measure} Median'], name=f'Typical {weekday}',
+                line=dict(color='#667eea', dash='dash')
+            ))
+        fig_pacing.add_trace(go.Scatter(
+            x=today_so_far['Slot'].iloc[:slot + 1], y=today_so_far[measure].iloc[:slot + 1],
+            name='Today', line=dict(color='#FF6B6B', width=3)
+        ))
+        # Only the trading hours: from the first to the last slot anything happens
+        busy = today_so_far[measure].diff().fillna(today_so_far[measure]) > 0
+        if not curves.empty:
+            busy |= curves[f'{measure} P90'].diff().fillna(curves[f'{measure} P90']) > 0
+        if busy.any():
+            first, last = np.flatnonzero(busy)[[0, -1]]
+            fig_pacing.update_xaxes(range=[max(first - 1, 0), min(last + 1, len(SLOT_LABELS) - 1)])
+        fig_pacing.update_layout(
+            height=320, xaxis_title="Time of Day",
+            yaxis_title="Revenue (£)" if measure == 'Revenue' else "Orders", hovermode='x unified'
+        )
+        with chart("intraday_pacing", fig_pacing):
+            st.plotly_chart(fig_pacing, use_container_width=True)
+
 
+intraday_pacing(dispatch_type, channel_type)
 st.markdown("---")
 
 # ============================================================================
-# SECTION 2: SALES PERFORMANCE
+# SECTION 1: PERFORMANCE TRENDS
 # ============================================================================
 
-st.header("📈 Sales Performance")
-tab1, tab2, tab3 = st.tabs(["Daily Sales", "Weekly Trends", "Monthly Overview"])
-
-with tab1:
-    fig_daily = px.bar(daily_data, x='Date', y='Revenue', title='Daily Revenue', color='Revenue', color_continuous_scale='Viridis')
-    st.plotly_chart(fig_daily, use_container_width=True)
+@st.fragment
+@section("performance_trends")
+def performance_trends(rollups, daily_totals, forecaster, start_date, end_date, dispatch_type, channel_type):
+    st.header("📊 Performance Trends")
+
+    daily_data = rollups['daily'].copy()
+    daily_data['Revenue_7d_avg'] = daily_data['Revenue'].rolling(window=7, min_periods=1).mean()
+    daily_data['Orders_7d_avg'] = daily_data['Orders'].rolling(window=7, min_periods=1).mean()
+
+    # ISO year-week from the calendar dimension, so weeks of different years never merge
+    daily_data['Week'] = calendar_lookup(day_key(daily_data['Date']), ['ISO Year Week'])['ISO Year Week'].to_numpy()
+    weekly_data = daily_data.groupby('Week').agg({
+        'Revenue': 'sum', 'Orders': 'sum', 'Date': 'min'
+    }).reset_index().sort_values('Date')
+
+    # Week-over-week: the last 7 days of the range against the 7 days before
+    # them, so a partial calendar week is never set against a full one
+    week_start = max(start_date, end_date - timedelta(days=6))
+    week_days = (end_date - week_start).days + 1
+    this_week = daily_totals.kpis(week_start, end_date, dispatch_type, channel_type)
+    last_week = daily_totals.kpis(
+        *prior_range(week_start, end_date, 'Previous period'), dispatch_type, channel_type
+    )
+    wow_revenue_change = change(this_week['Revenue'], last_week and last_week['Revenue'])
+    wow_orders_change = change(this_week['Orders'], last_week and last_week['Orders'])
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("📈 7-Day Rolling Average")
+        # Averages are computed on every day; only the plotted points are thinned
+        daily_points = downsample(daily_data, 'Date', 'Revenue')
+        avg_points = downsample(daily_data, 'Date', 'Revenue_7d_avg')
+        fig_rolling = go.Figure()
+        fig_rolling.add_trace(scatter_trace(len(daily_points))(x=daily_points['Date'], y=daily_points['Revenue'], name='Daily Revenue', line=dict(color='lightblue', width=1), opacity=0.5))
+        fig_rolling.add_trace(scatter_trace(len(avg_points))(x=avg_points['Date'], y=avg_points['Revenue_7d_avg'], name='7-Day Average', line=dict(color='#FF6B6B', width=3)))
+        # The forecast continues the chart only when the range reaches the latest closed day
+        forecast_days = st.radio("Forecast", [7, 14, 28], horizontal=True, format_func=lambda d: f"{d} days", key="forecast_days")
+        forecast = pd.DataFrame()
+        if forecaster.through is not None and end_date >= forecaster.through.date():
+            forecast = forecaster.forecast(forecast_days, dispatch_type, channel_type)
+        if not forecast.empty:
+            fig_rolling.add_trace(go.Scatter(x=forecast['Date'], y=forecast['Revenue High'], line=dict(width=0), showlegend=False, hoverinfo='skip'))
+            fig_rolling.add_trace(go.Scatter(x=forecast['Date'], y=forecast['Revenue Low'], name='Forecast (80% range)', line=dict(width=0), fill='tonexty', fillcolor='rgba(255, 107, 107, 0.2)'))
+            fig_rolling.add_trace(go.Scatter(x=forecast['Date'], y=forecast['Revenue'], name='Forecast', line=dict(color='#FF6B6B', width=2, dash='dash')))
+        fig_rolling.update_layout(height=350, xaxis_title="Date", yaxis_title="Revenue (£)", hovermode='x unified')
+        with chart("rolling_revenue", fig_rolling):
+            st.plotly_chart(fig_rolling, use_container_width=True)
+        st.metric("Current 7-Day Average", f"£{daily_data['Revenue_7d_avg'].iloc[-1]:,.2f}/day")
+        if not forecast.empty:
+            st.caption(
+                f"Next {forecast_days} days forecast: £{forecast['Revenue'].sum():,.0f} from "
+                f"{forecast['Orders'].sum():,.0f} orders (Holt-Winters, weekly season)"
+            )
 
-with tab2:
-    filtered_sales['Week'] = filtered_sales['Order time'].dt.to_period('W').astype(str)
-    weekly_sales = filtered_sales.groupby('Week')['Revenue'].sum().reset_index()
-    fig_weekly = px.bar(weekly_sales, x='Week', y='Revenue', title='Weekly Revenue')
-    st.plotly_chart(fig_weekly, use_container_width=True)
+    with col2:
+        st.subheader("📅 Week-over-Week Growth")
+        col_a, col_b = st.columns(2)
+        versus = f"last {week_days} days vs the {week_days} before"
+        with col_a:
+            st.metric("Revenue Growth", "n/a" if wow_revenue_change is None else f"{wow_revenue_change:+.1%}", versus)
+        with col_b:
+            st.metric("Orders Growth", "n/a" if wow_orders_change is None else f"{wow_orders_change:+.1%}", versus)
+        recent_weeks = weekly_data.tail(5).copy()
+        recent_weeks['Week Start'] = pd.to_datetime(recent_weeks['Date']).dt.strftime('%b %d')
+        recent_weeks['Revenue'] = recent_weeks['Revenue'].apply(lambda x: f"£{x:,.0f}")
+        recent_weeks['Orders']  = recent_weeks['Orders'].apply(lambda x: f"{x:,.0f}")
+        st.dataframe(recent_weeks[['Week Start', 'Revenue', 'Orders']], hide_index=True, use_container_width=True)
+
+
+performance_trends(rollups, daily_totals, forecaster, start_date, end_date, dispatch_type, channel_type)
+st.markdown("---")
 
-with tab3:
-    filtered_sales['Month'] = filtered_sales['Order time'].dt.to_period('M').astype(str)
-    monthly_sales = filtered_sales.groupby('Month')['Revenue'].sum().reset_index()
-    fig_monthly = px.bar(monthly_sales, x='Month', y='Revenue', title='Monthly Revenue')
-    st.plotly_chart(fig_monthly, use_container_width=True)
+# ============================================================================
+# SECTION 2: SALES PERFORMANCE
+# ============================================================================
 
+@st.fragment
+@section("sales_performance")
+def sales_performance(rollups):
+    st.header("📈 Sales Performance")
+    # Only the open tab builds its figure; figures are memoized on the bundle
+    tab1, tab2, tab3 = st.tabs(
+        ["Daily Sales", "Weekly Trends", "Monthly Overview"], key="sales_tabs", on_change="rerun"
+    )
+
+    with tab1:
+        if tab1.open:
+            def daily_figure():
+                # Long ranges are rebinned to weekly / monthly bars
+                bars, grain = bar_bins(rollups['daily'])
+                return px.bar(
+                    bars, x='Date', y='Revenue', title=f'{grain} Revenue',
+                    color='Revenue', color_continuous_scale='Viridis'
+                )
+            fig_daily = rollups.memo("fig_daily", daily_figure)
+            with chart("daily_sales", fig_daily):
+                st.plotly_chart(fig_daily, use_container_width=True)
+
+    with tab2:
+        if tab2.open:
+            fig_weekly = rollups.memo("fig_weekly", lambda: px.bar(
+                rollups['week'], x='Week', y='Revenue', title='Weekly Revenue'
+            ))
+            with chart("weekly_sales", fig_weekly):
+                st.plotly_chart(fig_weekly, use_container_width=True)
+
+    with tab3:
+        if tab3.open:
+            fig_monthly = rollups.memo("fig_monthly", lambda: px.bar(
+                rollups['month'], x='Month', y='Revenue', title='Monthly Revenue'
+            ))
+            with chart("monthly_sales", fig_monthly):
+                st.plotly_chart(fig_monthly, use_container_width=True)
+
+
+sales_performance(rollups)
 st.markdown("---")
 
 # ============================================================================
 # SECTION 3: WEEKLY PATTERNS
 # ============================================================================
 
-st.header("📅 Weekly Trading Patterns")
-col1, col2 = st.columns([2, 1])
+@st.fragment
+@section("weekly_patterns")
+def weekly_patterns(rollups):
+    st.header("📅 Weekly Trading Patterns")
+    col1, col2 = st.columns([2, 1])
+
+    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    weekly_stats = rollups['weekday'].set_index('Day').reindex(day_order).fillna(0).reset_index()
 
-pattern_data = filtered_sales.copy()
-pattern_data['Day Name'] = pattern_data['Order time'].dt.day_name()
-day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-weekly_stats = pattern_data.groupby('Day Name').agg({
-    'Revenue': 'sum', 'Order ID': 'count', 'Gross sales': 'mean'
-}).reindex(day_order).fillna(0).reset_index()
-weekly_stats.columns = ['Day', 'Total Revenue', 'Orders', 'Avg Order Value']
+    busiest_day = weekly_stats.loc[weekly_stats['Total Revenue'].idxmax()]
+    operating_days = weekly_stats[weekly_stats['Total Revenue'] > 0]
+    slowest_day = operating_days.loc[operating_days['Total Revenue'].idxmin()] if not operating_days.empty else weekly_stats.iloc[0]
 
-busiest_day = weekly_stats.loc[weekly_stats['Total Revenue'].idxmax()]
-operating_days = weekly_stats[weekly_stats['Total Revenue'] > 0]
-slowest_day = operating_days.loc[operating_days['Total Revenue'].idxmin()] if not operating_days.empty else weekly_stats.iloc[0]
+    with col1:
+        fig_week = px.bar(weekly_stats, x='Day', y='Total Revenue', title='Revenue by Day of Week', color='Total Revenue', color_continuous_scale='Viridis')
+        fig_week.update_layout(height=350)
+        with chart("weekday_revenue", fig_week):
+            st.plotly_chart(fig_week, use_container_width=True)
 
-with col1:
-    fig_week = px.bar(weekly_stats, x='Day', y='Total Revenue', title='Revenue by Day of Week', color='Total Revenue', color_continuous_scale='Viridis')
-    fig_week.update_layout(height=350)
-    st.plotly_chart(fig_week, use_container_width=True)
+    with col2:
+        st.subheader("🏆 Day Performance")
+        st.success(f"**Busiest:** {busiest_day['Day']}\n\n💰 £{busiest_day['Total Revenue']:,.0f} ({int(busiest_day['Orders'])} orders)")
+        st.info(f"**Slowest:** {slowest_day['Day']}\n\n💤 £{slowest_day['Total Revenue']:,.0f} ({int(slowest_day['Orders'])} orders)")
+        avg_rev = weekly_stats[weekly_stats['Total Revenue'] > 0]['Total Revenue'].mean()
+        st.metric("Avg Daily Revenue", f"£{avg_rev:,.0f}")
 
-with col2:
-    st.subheader("🏆 Day Performance")
-    st.success(f"**Busiest:** {busiest_day['Day']}\n\n💰 £{busiest_day['Total Revenue']:,.0f} ({int(busiest_day['Orders'])} orders)")
-    st.info(f"**Slowest:** {slowest_day['Day']}\n\n💤 £{slowest_day['Total Revenue']:,.0f} ({int(slowest_day['Orders'])} orders)")
-    avg_rev = weekly_stats[weekly_stats['Total Revenue'] > 0]['Total Revenue'].mean()
-    st.metric("Avg Daily Revenue", f"£{avg_rev:,.0f}")
 
+weekly_patterns(rollups)
 st.markdown("---")
 
 # ============================================================================
 # SECTION 4: DISPATCH & CHANNELS
 # ============================================================================
 
-st.header("📦 Dispatch & Sales Channels")
-col1, col2 = st.columns(2)
+@st.fragment
+@section("dispatch_and_channels")
+def dispatch_and_channels(rollups):
+    st.header("📦 Dispatch & Sales Channels")
+    col1, col2 = st.columns(2)
+
+    with col1:
+        dispatch_sales = rollups['dispatch']
+        fig_dispatch = px.pie(dispatch_sales, values='Gross sales', names='Dispatch type', title='Revenue by Dispatch Type', hole=0.4)
+        with chart("dispatch_share", fig_dispatch):
+            st.plotly_chart(fig_dispatch, use_container_width=True)
 
-with col1:
-    dispatch_sales = filtered_sales.groupby('Dispatch type').agg({'Gross sales': 'sum'}).reset_index()
-    fig_dispatch = px.pie(dispatch_sales, values='Gross sales', names='Dispatch type', title='Revenue by Dispatch Type', hole=0.4)
-    st.plotly_chart(fig_dispatch, use_container_width=True)
+    with col2:
+        channel_sales = rollups['channel']
+        fig_channel = px.bar(channel_sales, x='Sales channel name', y='Gross sales', title='Revenue by Platform', color='Gross sales')
+        with chart("channel_revenue", fig_channel):
+            st.plotly_chart(fig_channel, use_container_width=True)
 
-with col2:
-    channel_sales = filtered_sales.groupby('Sales channel name').agg({'Gross sales': 'sum'}).reset_index()
-    fig_channel = px.bar(channel_sales, x='Sales channel name', y='Gross sales', title='Revenue by Platform', color='Gross sales')
-    st.plotly_chart(fig_channel, use_container_width=True)
 
+dispatch_and_channels(rollups)
 st.markdown("---")
 
 # ============================================================================
-# SECTION 5: HOURLY ANALYSIS
+# SECTION 4B: ORDER VALUE DISTRIBUTION
 # ============================================================================
 
-st.header("🕐 Hourly & Meal Period Analysis")
-
-hourly_data = filtered_sales.copy()
-hourly_data['Hour'] = hourly_data['Order time'].dt.hour
-hourly_stats = hourly_data.groupby('Hour')['Revenue'].sum().reset_index()
-all_hours = pd.DataFrame({'Hour': range(24)})
-hourly_stats = all_hours.merge(hourly_stats, on='Hour', how='left').fillna(0)
-hourly_stats['Hour Label'] = hourly_stats['Hour'].apply(
-    lambda h: datetime.strptime(str(int(h)), "%H").strftime("%I %p").lstrip("0")
-)
+@st.fragment
+@section("order_value_distribution")
+def order_value_distribution(sketches, start_date, end_date, dispatch_type, channel_type):
+    st.header("🧺 Order Value Distribution")
+    st.caption("Percentiles are accurate to within 1% of the true order value.")
+
+    sketch = sketches.merged(start_date, end_date, dispatch_type, channel_type)
+    if sketch.sum() == 0:
+        st.info("No orders with a gross sales value in the selected period.")
+        return
+
+    median, p90, p99 = quantiles(sketch, [0.5, 0.9, 0.99])
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Mean", f"£{sketch_mean(sketch):,.2f}")
+    col2.metric("Median", f"£{median:,.2f}")
+    col3.metric("P90", f"£{p90:,.2f}")
+    col4.metric("P99", f"£{p99:,.2f}")
+
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        bars = histogram(sketch, bins=30)
+        bars['Range'] = [f"£{lo:,.0f}–£{hi:,.0f}" for lo, hi in zip(bars['From'], bars['To'])]
+        fig_values = px.bar(bars, x='Range', y='Orders', title='Orders by Order Value (up to P99)')
+        fig_values.update_layout(height=350, bargap=0.05)
+        with chart("order_value_histogram", fig_values):
+            st.plotly_chart(fig_values, use_container_width=True)
+
+    with col2:
+        by = st.radio("Break down by", ['Sales channel type', 'Dispatch type'], horizontal=True, key="order_value_by")
+        rows = [
+            {by: value, 'Orders': int(group.sum()),
+             **dict(zip(['Median', 'P90', 'P99'], quantiles(group, [0.5, 0.9, 0.99])))}
+            for value, group in sketches.merged(start_date, end_date, dispatch_type, channel_type, by=by).items()
+        ]
+        if not rows:
+            st.info(f"No orders with a {by.lower()} in the selected period.")
+            return
+        breakdown = pd.DataFrame(rows).round(2).sort_values('Orders', ascending=False)
+        st.dataframe(breakdown, hide_index=True, use_container_width=True)
+
+
+order_value_distribution(order_value_sketches, start_date, end_date, dispatch_type, channel_type)
+st.markdown("---")
 
-top_3_hours    = hourly_stats.sort_values('Revenue', ascending=False).head(3)
-operating_hours = hourly_stats[hourly_stats['Revenue'] > 0]
-bottom_3_hours  = operating_hours.sort_values('Revenue').head(3)
+# ============================================================================
+# SECTION 5: HOURLY ANALYSIS
+# ============================================================================
 
 def styled_metric_box(hour, revenue, rank, is_peak=True):
     color = "#FF6B6B" if is_peak else "#667eea"
@@ -405,75 +842,266 @@ def styled_metric_box(hour, revenue, rank, is_peak=True):
         <div style="font-size:1.2em;font-weight:bold;color:{color};">£{revenue:,.0f}</div>
     </div>""", unsafe_allow_html=True)
 
-m1, m2 = st.columns(2)
-with m1:
-    st.subheader("🔥 Top 3 Busiest Hours")
-    for i, (_, row) in enumerate(top_3_hours.iterrows(), 1):
-        styled_metric_box(row['Hour Label'], row['Revenue'], i, is_peak=True)
-with m2:
-    st.subheader("💤 Top 3 Quietest Hours")
-    for i, (_, row) in enumerate(bottom_3_hours.iterrows(), 1):
-        styled_metric_box(row['Hour Label'], row['Revenue'], i, is_peak=False)
-
-st.markdown("##### 📈 24-Hour Activity Trend")
-fig_hourly = px.line(hourly_stats, x='Hour', y='Revenue', markers=True)
-fig_hourly.update_layout(
-    xaxis=dict(tickmode='array', tickvals=hourly_stats['Hour'], ticktext=hourly_stats['Hour Label'], title="Time of Day"),
-    yaxis=dict(title="Total Revenue (£)"), height=300
-)
-st.plotly_chart(fig_hourly, use_container_width=True)
-
-st.subheader("🍱 Meal Period Breakdown")
-def categorize_meal_period(hour):
-    if 8  <= hour < 12: return "🌅 Breakfast (8am-12pm)"
-    elif 12 <= hour < 16: return "🍽️ Lunch (12pm-4pm)"
-    elif 16 <= hour < 20: return "🌆 Evening (4pm-8pm)"
-    elif 20 <= hour < 24: return "🌙 Dinner (8pm-12am)"
-    else: return "🌃 Night Shift (12am-8am)"
-
-meal_data = filtered_sales.copy()
-meal_data['Hour'] = meal_data['Order time'].dt.hour
-meal_data['Meal Period'] = meal_data['Hour'].apply(categorize_meal_period)
-meal_summary = meal_data.groupby('Meal Period').agg({'Revenue': 'sum', 'Order ID': 'count'}).reset_index()
-meal_summary.columns = ['Meal Period', 'Revenue', 'Orders']
-meal_summary = meal_summary.sort_values('Revenue', ascending=False)
-
-col1, col2 = st.columns([3, 2])
-with col1:
-    fig_pie = px.pie(meal_summary, values='Revenue', names='Meal Period', title='Sales by Meal Time', color_discrete_sequence=px.colors.qualitative.Set3)
-    st.plotly_chart(fig_pie, use_container_width=True)
-with col2:
-    st.subheader("🏆 Best & Worst Periods")
-    if not meal_summary.empty:
-        st.success(f"**Best:** {meal_summary.iloc[0]['Meal Period']} (£{meal_summary.iloc[0]['Revenue']:,.0f})")
-        st.error(f"**Slowest:** {meal_summary.iloc[-1]['Meal Period']} (£{meal_summary.iloc[-1]['Revenue']:,.0f})")
+
+@st.fragment
+@section("hourly_analysis")
+def hourly_analysis(rollups):
+    st.header("🕐 Hourly & Meal Period Analysis")
+
+    hourly_stats = rollups['hour'][['Hour', 'Revenue', 'Orders']]
+    all_hours = pd.DataFrame({'Hour': range(24)})
+    hourly_stats = all_hours.merge(hourly_stats, on='Hour', how='left').fillna(0)
+    hourly_stats['Hour Label'] = HOUR_LABELS[hourly_stats['Hour'].astype(int).to_numpy()]
+
+    top_3_hours    = hourly_stats.sort_values('Revenue', ascending=False).head(3)
+    operating_hours = hourly_stats[hourly_stats['Revenue'] > 0]
+    bottom_3_hours  = operating_hours.sort_values('Revenue').head(3)
+
+    m1, m2 = st.columns(2)
+    with m1:
+        st.subheader("🔥 Top 3 Busiest Hours")
+        for i, (_, row) in enumerate(top_3_hours.iterrows(), 1):
+            styled_metric_box(row['Hour Label'], row['Revenue'], i, is_peak=True)
+    with m2:
+        st.subheader("💤 Top 3 Quietest Hours")
+        for i, (_, row) in enumerate(bottom_3_hours.iterrows(), 1):
+            styled_metric_box(row['Hour Label'], row['Revenue'], i, is_peak=False)
+
+    st.markdown("##### 📈 24-Hour Activity Trend")
+    fig_hourly = px.line(hourly_stats, x='Hour', y='Revenue', markers=True)
+    fig_hourly.update_layout(
+        xaxis=dict(tickmode='array', tickvals=hourly_stats['Hour'], ticktext=hourly_stats['Hour Label'], title="Time of Day"),
+        yaxis=dict(title="Total Revenue (£)"), height=300
+    )
+    with chart("hourly_revenue", fig_hourly):
+        st.plotly_chart(fig_hourly, use_container_width=True)
+
+    st.subheader("🍱 Meal Period Breakdown")
+    meal_summary = rollups['meal'].sort_values('Revenue', ascending=False)
+
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        fig_pie = px.pie(meal_summary, values='Revenue', names='Meal Period', title='Sales by Meal Time', color_discrete_sequence=px.colors.qualitative.Set3)
+        with chart("meal_periods", fig_pie):
+            st.plotly_chart(fig_pie, use_container_width=True)
+    with col2:
+        st.subheader("🏆 Best & Worst Periods")
+        if not meal_summary.empty:
+            st.success(f"**Best:** {meal_summary.iloc[0]['Meal Period']} (£{meal_summary.iloc[0]['Revenue']:,.0f})")
+            st.error(f"**Slowest:** {meal_summary.iloc[-1]['Meal Period']} (£{meal_summary.iloc[-1]['Revenue']:,.0f})")
+
+    st.subheader("🌗 Day Part Breakdown")
+    day_parts = rollups['day_part']
+    fig_day_parts = px.bar(
+        day_parts, x='Day Part', y='Revenue', text='Orders',
+        title='Sales by Part of Day (bar labels = orders)', color_discrete_sequence=['#667eea'],
+    )
+    fig_day_parts.update_layout(height=300, xaxis_title=None, yaxis_title="Total Revenue (£)")
+    with chart("day_parts", fig_day_parts):
+        st.plotly_chart(fig_day_parts, use_container_width=True)
+
+
+hourly_analysis(rollups)
+st.markdown("---")
+
+# ============================================================================
+# SECTION 5B: DEMAND HEATMAP
+# ============================================================================
+
+@st.fragment
+@section("demand_heatmap")
+def demand_heatmap(demand_cube, start_date, end_date, dispatch_type, channel_type):
+    st.header("🗓️ Demand by Day & Time")
+    st.caption("When orders land through the week - use it to plan staffing")
+
+    col1, col2 = st.columns(2)
+    measure = col1.radio(
+        "Show", ['Orders', 'Revenue', 'Avg Order Value'], horizontal=True, key="heatmap_measure"
+    )
+    slot_minutes = col2.radio(
+        "Time slots", [60, 30, 15], format_func=lambda m: f"{m} min", horizontal=True,
+        key="heatmap_slot"
+    )
+
+    # Precomputed cube: the same cost for a week or for years of history
+    demand = demand_cube.query(start_date, end_date, dispatch_type, channel_type, slot_minutes)
+    if demand['Orders'].sum() == 0:
+        st.info("No orders in the selected period.")
+        return
+
+    grid = demand.pivot(index='Day', columns='Slot', values=measure)
+    # Trim the hours the shop never trades in this selection
+    active = demand.groupby('Slot')['Orders'].sum()
+    active = active[active > 0].index
+    grid = grid.loc[:, active.min():active.max()]
+
+    value_format = {'Orders': ',.0f', 'Revenue': ',.0f', 'Avg Order Value': ',.2f'}[measure]
+    prefix = '' if measure == 'Orders' else '£'
+    fig_heatmap = go.Figure(go.Heatmap(
+        z=grid.to_numpy(), x=grid.columns, y=grid.index.astype(str),
+        colorscale='YlOrRd', hoverongaps=False,
+        hovertemplate=f"%{{y}} %{{x}}<br>{measure}: {prefix}%{{z:{value_format}}}<extra></extra>",
+    ))
+    fig_heatmap.update_layout(
+        height=380, xaxis_title="Time of Day", yaxis=dict(autorange='reversed'),
+        margin=dict(t=20),
+    )
+    with chart("demand_heatmap", fig_heatmap):
+        st.plotly_chart(fig_heatmap, use_container_width=True)
+
+    busiest = demand.loc[demand['Orders'].idxmax()]
+    st.caption(
+        f"Busiest slot: **{busiest['Day']} {busiest['Slot']}** - "
+        f"{busiest['Orders']:,} orders, £{busiest['Revenue']:,.0f}"
+    )
+
+
+demand_heatmap(demand_cube, start_date, end_date, dispatch_type, channel_type)
 
 # ============================================================================
 # SECTION 6: MENU ANALYSIS
 # ============================================================================
 
-show_menu_analysis(item_data)
+@st.fragment
+@section("menu_breakdown")
+def menu_breakdown(item_data, data_version):
+    show_menu_analysis(item_data, data_version)
+
+
+menu_breakdown(item_data, data_version)
 
 # ============================================================================
 # SECTION 7: FULL TRANSACTION HISTORY
 # ============================================================================
 
-st.markdown("---")
-st.header("📑 Full Transaction History")
-st.caption(f"Showing {len(filtered_sales):,} transactions")
-
-st.dataframe(
-    filtered_sales[[
-        'Order ID', 'Order time', 'Revenue', 'Tax on gross sales',
-        'Delivery charges', 'Dispatch type', 'Payment method', 'Sales channel name'
-    ]].sort_values('Order time', ascending=False),
-    use_container_width=True,
-    hide_index=True
+@st.fragment
+@section("transaction_history")
+def transaction_history(filtered_sales, item_data, data_version, start_date, end_date,
+                        dispatch_type, channel_type):
+    st.markdown("---")
+    st.header("📑 Full Transaction History")
+    st.caption(f"Showing {len(filtered_sales):,} transactions")
+
+    col1, col2, col3, col4 = st.columns(4)
+    sort = col1.selectbox("Sort by", list(SORT_KEYS), key="txn_sort")
+    descending = col2.radio(
+        "Order", [True, False], format_func=lambda d: "Descending" if d else "Ascending",
+        horizontal=True, key="txn_descending"
+    )
+    page_size = col3.selectbox("Rows per page", PAGE_SIZES, index=1, key="txn_page_size")
+    jump_to = col4.date_input(
+        "Jump to date", value=None, min_value=start_date, max_value=end_date,
+        key="txn_jump_to", disabled=sort != "Order time"
+    )
+    if sort != "Order time":
+        jump_to = None
+
+    # Pages are keyset cursors, so they stay valid as new orders arrive; a new
+    # filter / sort / jump starts again from its first page
+    query = (start_date, end_date, dispatch_type, channel_type, sort, descending, page_size, jump_to)
+    if st.session_state.get("txn_query") != query:
+        st.session_state["txn_query"] = query
+        st.session_state["txn_cursors"] = [None if jump_to is None else date_cursor(jump_to, descending)]
+    cursors = st.session_state["txn_cursors"]
+
+    try:
+        with cache_call("transaction_page"):
+            page, next_cursor = load_transaction_page(
+                data_version, start_date, end_date, dispatch_type, channel_type,
+                sort, descending, cursors[-1], page_size
+            )
+    except Exception as e:
+        logging.error(f"Transaction page error: {e}")
+        st.warning(f"Could not load transactions: {e}")
+        page, next_cursor = None, None
+
+    if page is not None:
+        st.dataframe(page, use_container_width=True, hide_index=True)
+
+    # Callbacks move the cursor before the section reruns
+    prev_col, page_col, next_col = st.columns([1, 4, 1])
+    prev_col.button(
+        "◀ Previous", disabled=len(cursors) == 1, key="txn_prev", on_click=cursors.pop
+    )
+    page_col.caption(f"Page {len(cursors)}")
+    next_col.button(
+        "Next ▶", disabled=next_cursor is None, key="txn_next",
+        on_click=cursors.append, args=(next_cursor,)
+    )
+
+    # Exports are only generated when the button is clicked (in a worker
+    # thread), written in chunks and cached per data version and filters
+    st.markdown("##### 📥 Export")
+    fmt_col, items_col = st.columns(2)
+    export_format = fmt_col.selectbox("Format", available_formats(), key="export_format")
+    include_items = items_col.checkbox("Include order items", key="export_items")
+    extension, mime = export_file_type(export_format, include_items)
+    key = export_key(
+        data_version, export_format, include_items, start_date=start_date, end_date=end_date,
+        dispatch=dispatch_type, channel=channel_type,
+    )
+
+    export_cache = get_export_cache()
+
+    def build_export():
+        def write(fh):
+            items = None
+            if include_items and item_data is not None:
+                items = item_data[item_data['Order ID'].isin(filtered_sales['Order ID'])]
+            write_export(fh, export_format, filtered_sales, items, columns=source_columns(filtered_sales))
+        return export_cache.get_or_build(key, extension, write)
+
+    st.download_button(
+        label=f"📥 Download Full Dataset ({export_format})",
+        data=build_export,
+        file_name=f"chocoberry_sales_export_{datetime.now().strftime('%Y%m%d')}{extension}",
+        mime=mime,
+    )
+
+
+transaction_history(
+    filtered_sales, item_data, data_version, start_date, end_date,
+    dispatch_type, channel_type,
 )
 
-st.download_button(
-    label="📥 Download Full Dataset (CSV)",
-    data=filtered_sales.to_csv(index=False).encode('utf-8'),
-    file_name=f"chocoberry_sales_export_{datetime.now().strftime('%Y%m%d')}.csv",
-    mime='text/csv',
-)
\ No newline at end of file
+# ============================================================================
+# PERFORMANCE PANEL (admin only)
+# ============================================================================
+
+get_profiler().finish(page_run)
+
+if IS_ADMIN:
+    with st.sidebar.expander("⏱️ Performance"):
+        st.caption(f"This run: {page_run.total_seconds * 1000:,.0f} ms")
+        st.dataframe(
+            pd.DataFrame(
+                [(name, round(seconds * 1000, 1)) for name, seconds in page_run.stages],
+                columns=['Stage', 'ms'],
+            ),
+            hide_index=True, use_container_width=True,
+        )
+        if page_run.caches:
+            st.caption("Cache hits / misses")
+            st.dataframe(
+                pd.DataFrame(
+                    [(name, hits, misses) for name, (hits, misses) in page_run.caches.items()],
+                    columns=['Cache', 'Hits', 'Misses'],
+                ),
+                hide_index=True, use_container_width=True,
+            )
+        if page_run.payloads:
+            st.caption(f"Chart payloads: {sum(page_run.payloads.values()) / 1024:,.0f} KB")
+            st.dataframe(
+                pd.DataFrame(
+                    [(name, size / 1024) for name, size in page_run.payloads.items()],
+                    columns=['Chart', 'KB'],
+                ).round(1).sort_values('KB', ascending=False),
+                hide_index=True, use_container_width=True,
+            )
+        page_runs = get_profiler().runs("page")
+        st.caption(f"Last {len(page_runs)} page runs, all sessions")
+        st.dataframe(get_profiler().stage_summary("page"), hide_index=True, use_container_width=True)
+        refresh_runs = get_profiler().runs("refresh")
+        if refresh_runs:
+            st.caption(f"Dataset rebuilds: last took {refresh_runs[-1].total_seconds:.2f}s")
+            st.dataframe(get_profiler().stage_summary("refresh"), hide_index=True, use_container_width=True)
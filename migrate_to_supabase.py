@@ -2,6 +2,10 @@
 ONE-TIME MIGRATION SCRIPT
 Copies your local SQLite data to Supabase
 Run this ONCE from your local PC
+
+To bring an existing Supabase database up to date with a newer dashboard
+(indexes, change tracking, calendar table) run upgrade_supabase_schema.py
+instead - running this again would duplicate every order item.
 """
 import sqlite3
 import psycopg2
@@ -9,6 +13,10 @@ from pathlib import Path
 from dotenv import load_dotenv
 import os
 
+from utils.calendar_dim import install_calendar_table
+from utils.data_version import install_postgres_trigger
+from utils.transaction_pages import install_page_indexes
+
 # Load from .env file
 load_dotenv()
 
@@ -71,6 +79,12 @@ def migrate():
             revenue REAL
         )
     """)
+    # Keyset pagination of the transaction grid (utils/transaction_pages.py)
+    install_page_indexes(pg_cursor)
+    # Dashboards poll this counter instead of reloading on a timer
+    install_postgres_trigger(pg_cursor)
+    # Calendar dimension (day_key = YYYYMMDD) for joins on order dates
+    install_calendar_table(pg_cursor, 2020, 2035)
     pg.commit()
     print("Tables created successfully!")
 
@@ -9,6 +9,8 @@ from pathlib import Path
 from dotenv import load_dotenv
 import os
 
+from utils.data_version import bump_data_version
+
 load_dotenv()
 
 DB_HOST     = os.getenv("DB_HOST")
@@ -131,6 +133,9 @@ def push():
         except Exception as e:
             print(f"  Skipped item: {e}")
 
+    # Both tables were cleared and re-inserted above, so this is a rewrite:
+    # dashboards must drop their incremental state and reload in full
+    bump_data_version(cursor, "push_sqlite_to_supabase", rewrite=True, placeholder="%s")
     pg.commit()
 
     # Final verification
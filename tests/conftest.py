@@ -0,0 +1,49 @@
+"""Synthetic order histories and refreshes for the incremental-structure tests."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+DISPATCH_TYPES = ['Delivery', 'Collection', None]
+CHANNEL_TYPES = ['Web', 'POS']
+
+
+def make_orders(first_day, days, per_day=10, seed=0, prefix="o", dispatch_types=DISPATCH_TYPES):
+    """Orders spread over `days` days from first_day, sorted on Order time."""
+    rng = np.random.default_rng(seed)
+    n = days * per_day
+    gross = rng.gamma(3.0, 5.0, n).round(2)
+    gross[::17] = np.nan
+    sales = pd.DataFrame({
+        'Order ID': [f"{prefix}{i}" for i in range(n)],
+        'Order time': pd.Timestamp(first_day) + pd.to_timedelta(rng.integers(0, days * 24 * 60, n), unit='min'),
+        'Gross sales': gross,
+        'Revenue': np.nan_to_num(gross) * 0.9,
+        'Tax on gross sales': np.nan_to_num(gross) * 0.1,
+        'Delivery charges': rng.choice([0.0, 1.5], n),
+        'Dispatch type': rng.choice(np.array(dispatch_types, dtype=object), n),
+        'Sales channel type': rng.choice(np.array(CHANNEL_TYPES, dtype=object), n),
+    })
+    return sales.sort_values('Order time', kind='stable', ignore_index=True)
+
+
+def refreshed(sales, new_rows=None, updated_rows=None):
+    """
+    What utils.order_store hands out after a refresh that read new_rows and
+    updated_rows (same Order IDs as held rows, new values).
+
+    Returns:
+        tuple: (sales_data sorted on Order time, changed_since)
+    """
+    new_rows = new_rows if new_rows is not None else sales.iloc[:0]
+    updated_rows = updated_rows if updated_rows is not None else sales.iloc[:0]
+    replaced = sales['Order ID'].isin(updated_rows['Order ID'])
+    touched = pd.concat([new_rows['Order time'], updated_rows['Order time'], sales.loc[replaced, 'Order time']])
+    result = pd.concat([sales[~replaced], new_rows, updated_rows], ignore_index=True)
+    return result.sort_values('Order time', kind='stable', ignore_index=True), touched.min()
+
+
+@pytest.fixture
+def history():
+    """Eight weeks of orders ending on 2026-02-28."""
+    return make_orders("2026-01-04", 56)
@@ -0,0 +1,61 @@
+"""Incremental updates of utils.demand_cube match a cube built from scratch."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_orders, refreshed
+from utils.demand_cube import DemandCube
+
+RANGES = [("2026-01-01", "2026-03-31"), ("2026-02-02", "2026-02-15"), ("2026-02-27", "2026-03-02")]
+
+
+def assert_same_demand(cube, fresh):
+    selections = {(None, None)} | {(d, None) for d, _ in fresh.pairs} | {(None, c) for _, c in fresh.pairs}
+    selections |= set(fresh.pairs)
+    for dispatch, channel in selections:
+        for start, end in RANGES:
+            pd.testing.assert_frame_equal(
+                cube.query(start, end, dispatch, channel), fresh.query(start, end, dispatch, channel)
+            )
+        days = pd.date_range("2026-01-01", "2026-03-05").date
+        np.testing.assert_allclose(cube.day_slots(days, dispatch, channel), fresh.day_slots(days, dispatch, channel))
+
+
+def test_new_days(history):
+    cube = DemandCube.build(history)
+    sales, since = refreshed(history, new_rows=make_orders("2026-03-01", 3, seed=1, prefix="n"))
+    assert_same_demand(cube.updated(sales, since=since), DemandCube.build(sales))
+
+
+@pytest.mark.parametrize("late_day", ["2026-01-04 08:00:00", "2026-01-20 13:05:00", "2026-02-27 23:59:00"])
+def test_late_old_dated_order(history, late_day):
+    cube = DemandCube.build(history)
+    late = make_orders(late_day, 1, per_day=1, seed=2, prefix="late").assign(**{'Order time': pd.Timestamp(late_day)})
+    sales, since = refreshed(history, new_rows=late)
+    assert_same_demand(cube.updated(sales, since=since), DemandCube.build(sales))
+
+
+def test_updated_order_moves_between_days(history):
+    cube = DemandCube.build(history)
+    moved = history.iloc[[100, 400]].assign(**{'Order time': pd.Timestamp("2026-02-20 18:30:00"), 'Revenue': 3.0})
+    sales, since = refreshed(history, updated_rows=moved)
+    assert_same_demand(cube.updated(sales, since=since), DemandCube.build(sales))
+
+
+def test_new_dispatch_type(history):
+    cube = DemandCube.build(history)
+    dine_in = make_orders("2026-02-25", 5, seed=3, prefix="d", dispatch_types=['Dine In'])
+    sales, since = refreshed(history, new_rows=dine_in)
+    updated, fresh = cube.updated(sales, since=since), DemandCube.build(sales)
+    assert set(updated.pairs) == set(fresh.pairs)
+    assert_same_demand(updated, fresh)
+
+
+def test_repeated_updates(history):
+    cube = DemandCube.build(history)
+    sales = history
+    for day in range(1, 6):
+        sales, since = refreshed(sales, new_rows=make_orders(f"2026-03-0{day}", 1, seed=10 + day, prefix=f"r{day}-"))
+        cube = cube.updated(sales, since=since)
+    assert_same_demand(cube, DemandCube.build(sales))
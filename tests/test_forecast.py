@@ -0,0 +1,68 @@
+"""utils.forecast: incremental updates and saved states match a fresh fit."""
+
+import pandas as pd
+import pytest
+
+from conftest import make_orders, refreshed
+from utils.forecast import REWIND_DAYS, Forecaster
+from utils.period_compare import DailyTotals
+
+TODAY = pd.Timestamp("2026-03-01").date()
+
+
+def assert_same_forecast(forecaster, fresh):
+    assert forecaster.keys == fresh.keys
+    assert forecaster.through == fresh.through
+    for dispatch, channel in fresh.keys:
+        pd.testing.assert_frame_equal(
+            forecaster.forecast(14, dispatch, channel), fresh.forecast(14, dispatch, channel), rtol=1e-9
+        )
+
+
+def update(history, today, **changes):
+    """(incrementally updated, freshly fitted) Forecaster after a refresh."""
+    forecaster = Forecaster.fit(DailyTotals.build(history), TODAY)
+    sales, since = refreshed(history, **changes)
+    totals = DailyTotals.build(sales)
+    return forecaster.updated(totals, today, since=since), Forecaster.fit(totals, today)
+
+
+def test_newly_closed_days(history):
+    new_rows = make_orders("2026-03-01", 3, seed=1, prefix="n")
+    updated, fresh = update(history, pd.Timestamp("2026-03-04").date(), new_rows=new_rows)
+    assert updated.through == pd.Timestamp("2026-03-03")
+    assert_same_forecast(updated, fresh)
+
+
+def test_orders_for_today_change_nothing(history):
+    forecaster = Forecaster.fit(DailyTotals.build(history), TODAY)
+    sales, since = refreshed(history, new_rows=make_orders("2026-03-01", 1, seed=2, prefix="t"))
+    assert forecaster.updated(DailyTotals.build(sales), TODAY, since=since).through == forecaster.through
+
+
+@pytest.mark.parametrize("days_back", [0, REWIND_DAYS - 1, REWIND_DAYS + 3, 40])
+def test_late_order_is_rewound_or_refitted(history, days_back):
+    day = pd.Timestamp("2026-02-28") - pd.Timedelta(days=days_back)
+    late = make_orders(day, 1, per_day=3, seed=3, prefix="late")
+    updated, fresh = update(history, TODAY, new_rows=late)
+    assert_same_forecast(updated, fresh)
+
+
+def test_edited_order_and_new_dispatch_type(history):
+    edited = history.iloc[[-5]].assign(**{'Revenue': 80.0})
+    dine_in = make_orders("2026-02-26", 2, seed=4, prefix="d", dispatch_types=['Dine In'])
+    updated, fresh = update(history, TODAY, new_rows=dine_in, updated_rows=edited)
+    assert ('Dine In', None) in updated.keys
+    assert_same_forecast(updated, fresh)
+
+
+def test_saved_state_resumes(history, tmp_path):
+    path = str(tmp_path / "forecast.npz")
+    Forecaster.fit(DailyTotals.build(history), TODAY).save(path, source="db")
+    assert Forecaster.load(path, source="other").through is None
+
+    late = make_orders("2026-02-26", 1, per_day=4, seed=5, prefix="late")
+    sales, since = refreshed(history, new_rows=late)
+    totals = DailyTotals.build(sales)
+    resumed = Forecaster.load(path, source="db").updated(totals, TODAY, since=since)
+    assert_same_forecast(resumed, Forecaster.fit(totals, TODAY))
@@ -0,0 +1,121 @@
+"""Incremental loads of utils.order_store against a throwaway SQLite database."""
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from utils.order_store import OrderStore
+
+ORDERS_DDL = """
+CREATE TABLE orders (
+    order_id TEXT PRIMARY KEY, change_id INTEGER, order_time TIMESTAMP,
+    property_name TEXT, gross_sales REAL, tax REAL, tips REAL, delivery_charges REAL,
+    service_charges REAL, additional_charges REAL, charges REAL, revenue REAL,
+    refunds REAL, discounts REAL, dispatch_type TEXT, payment_method TEXT,
+    sales_channel_type TEXT, sales_channel_name TEXT, is_preorder TEXT
+)
+"""
+ITEMS_DDL = """
+CREATE TABLE order_items (
+    id INTEGER PRIMARY KEY, order_id TEXT, order_time TIMESTAMP, item_name TEXT,
+    category TEXT, price REAL, quantity INTEGER, revenue REAL
+)
+"""
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'orders.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(ORDERS_DDL))
+        conn.execute(text(ITEMS_DDL))
+    return engine
+
+
+def insert_order(engine, order_id, order_time, revenue=10.0):
+    """Insert an order and one item, stamping change_id as the Postgres trigger would."""
+    with engine.begin() as conn:
+        change_id = conn.execute(text("SELECT COALESCE(MAX(change_id), 0) + 1 FROM orders")).scalar()
+        conn.execute(
+            text("INSERT INTO orders (order_id, change_id, order_time, revenue, gross_sales, dispatch_type) "
+                 "VALUES (:id, :change, :time, :revenue, :revenue, 'Delivery')"),
+            {"id": order_id, "change": change_id, "time": order_time, "revenue": revenue},
+        )
+        conn.execute(
+            text("INSERT INTO order_items (order_id, order_time, item_name, price, quantity, revenue) "
+                 "VALUES (:id, :time, 'Waffle', :revenue, 1, :revenue)"),
+            {"id": order_id, "time": order_time, "revenue": revenue},
+        )
+
+
+def test_late_order_with_old_order_time_is_loaded(engine):
+    for i in range(20):
+        insert_order(engine, f"o{i}", f"2026-02-10 {10 + i % 10:02d}:00:00")
+    store = OrderStore()
+    sales, items = store.refresh(engine)
+    assert len(sales) == 20 and store.changed_since is None
+
+    # A backfill lands days behind the newest order
+    insert_order(engine, "late", "2026-02-01 12:00:00", revenue=25.0)
+    sales, items = store.refresh(engine)
+
+    assert len(sales) == 21
+    assert "late" in set(sales["Order ID"])
+    assert set(items["Order ID"]) == set(sales["Order ID"])
+    assert store.changed_since == pd.Timestamp("2026-02-01 12:00:00")
+    assert sales["Order time"].is_monotonic_increasing
+
+
+def test_updated_order_replaces_the_held_row(engine):
+    insert_order(engine, "a", "2026-02-10 12:00:00")
+    insert_order(engine, "b", "2026-02-11 12:00:00")
+    store = OrderStore()
+    store.refresh(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE orders SET revenue = 4.0, change_id = 3, order_time = '2026-02-09 09:00:00' "
+                          "WHERE order_id = 'a'"))
+    sales, _ = store.refresh(engine)
+
+    assert len(sales) == 2
+    assert sales.set_index("Order ID").loc["a", "Revenue"] == 4.0
+    assert store.changed_since == pd.Timestamp("2026-02-09 09:00:00")
+
+
+def test_nothing_new_keeps_the_frame(engine):
+    insert_order(engine, "a", "2026-02-10 12:00:00")
+    store = OrderStore()
+    first, _ = store.refresh(engine)
+    second, _ = store.refresh(engine)
+    assert second is first
+    assert store.changed_since == pd.Timestamp("2026-02-10 12:00:00")
+
+
+def test_late_commit_below_the_watermark_is_loaded(engine):
+    # Two writers took change ids 1..3 and item ids 1..3; the one holding 2 commits last
+    with engine.begin() as conn:
+        for order_id, change_id in (("a", 1), ("c", 3)):
+            conn.execute(
+                text("INSERT INTO orders (order_id, change_id, order_time, revenue, gross_sales) "
+                     "VALUES (:id, :change, '2026-02-10 12:00:00', 10, 10)"),
+                {"id": order_id, "change": change_id},
+            )
+            conn.execute(
+                text("INSERT INTO order_items (id, order_id, order_time, item_name, quantity, revenue) "
+                     "VALUES (:change, :id, '2026-02-10 12:00:00', 'Waffle', 1, 10)"),
+                {"id": order_id, "change": change_id},
+            )
+    store = OrderStore()
+    store.refresh(engine)
+    assert (store.order_watermark, store.item_watermark) == (3, 3)
+
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO orders (order_id, change_id, order_time, revenue, gross_sales) "
+                          "VALUES ('b', 2, '2026-02-10 11:00:00', 10, 10)"))
+        conn.execute(text("INSERT INTO order_items (id, order_id, order_time, item_name, quantity, revenue) "
+                          "VALUES (2, 'b', '2026-02-10 11:00:00', 'Waffle', 1, 10)"))
+    sales, items = store.refresh(engine)
+
+    assert sorted(sales["Order ID"]) == ["a", "b", "c"]
+    assert sorted(items["Row ID"]) == [1, 2, 3]
+    assert store.changed_since == pd.Timestamp("2026-02-10 11:00:00")
@@ -0,0 +1,55 @@
+"""utils.order_value_sketch: incremental updates match a fresh build, quantiles stay within accuracy."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_orders, refreshed
+from utils.order_value_sketch import RELATIVE_ACCURACY, OrderValueSketches, quantiles
+
+RANGES = [("2026-01-01", "2026-03-31"), ("2026-02-02", "2026-02-15"), ("2026-02-27", "2026-03-02")]
+
+
+def assert_same_sketches(sketches, fresh):
+    for start, end in RANGES:
+        for dispatch, channel in [(None, None)] + fresh.pairs:
+            np.testing.assert_array_equal(
+                sketches.merged(start, end, dispatch, channel), fresh.merged(start, end, dispatch, channel)
+            )
+        for by in ('Dispatch type', 'Sales channel type'):
+            merged, fresh_merged = sketches.merged(start, end, by=by), fresh.merged(start, end, by=by)
+            assert merged.keys() == fresh_merged.keys()
+            for value in merged:
+                np.testing.assert_array_equal(merged[value], fresh_merged[value])
+
+
+def test_new_days(history):
+    sketches = OrderValueSketches.build(history)
+    sales, since = refreshed(history, new_rows=make_orders("2026-03-01", 3, seed=1, prefix="n"))
+    assert_same_sketches(sketches.updated(sales, since=since), OrderValueSketches.build(sales))
+
+
+def test_late_order_and_update(history):
+    sketches = OrderValueSketches.build(history)
+    late = make_orders("2026-01-10", 1, per_day=2, seed=2, prefix="late")
+    changed = history.iloc[[50, 300]].assign(**{'Gross sales': 99.5, 'Order time': pd.Timestamp("2026-02-01 20:00")})
+    sales, since = refreshed(history, new_rows=late, updated_rows=changed)
+    assert_same_sketches(sketches.updated(sales, since=since), OrderValueSketches.build(sales))
+
+
+def test_new_dispatch_type_and_repeated_updates(history):
+    sketches = OrderValueSketches.build(history)
+    sales = history
+    for day in range(1, 4):
+        new_rows = make_orders(f"2026-03-0{day}", 1, seed=20 + day, prefix=f"r{day}-", dispatch_types=['Dine In'])
+        sales, since = refreshed(sales, new_rows=new_rows)
+        sketches = sketches.updated(sales, since=since)
+    assert_same_sketches(sketches, OrderValueSketches.build(sales))
+
+
+def test_quantiles_within_relative_accuracy(history):
+    sketch = OrderValueSketches.build(history).merged("2026-01-01", "2026-03-31")
+    values = np.sort(history['Gross sales'].dropna().to_numpy())
+    for q, estimate in zip([0.5, 0.9, 0.99], quantiles(sketch, [0.5, 0.9, 0.99])):
+        exact = values[int(np.ceil(q * len(values))) - 1]
+        assert estimate == pytest.approx(exact, rel=RELATIVE_ACCURACY)
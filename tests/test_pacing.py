@@ -0,0 +1,59 @@
+"""utils.pacing over an incrementally updated demand cube matches a fresh one."""
+
+import pandas as pd
+import pytest
+
+from conftest import make_orders, refreshed
+from utils import demand_cube
+from utils.demand_cube import DemandCube
+from utils.pacing import pacing_summary, today_curve, typical_curves
+
+NOW = pd.Timestamp("2026-02-28 15:20:00")
+
+
+@pytest.fixture(autouse=True)
+def restaurant_clock(monkeypatch):
+    monkeypatch.setattr(demand_cube, "restaurant_now", lambda: NOW)
+
+
+def pacing(cube, dispatch=None):
+    curves = typical_curves(cube, NOW.date(), dispatch)
+    today = today_curve(cube, NOW.date(), dispatch)
+    return curves, today, pacing_summary(curves, today, NOW)
+
+
+def assert_same_pacing(cube, fresh):
+    for dispatch in (None, 'Delivery', 'Collection'):
+        curves, today, summary = pacing(cube, dispatch)
+        fresh_curves, fresh_today, fresh_summary = pacing(fresh, dispatch)
+        pd.testing.assert_frame_equal(curves, fresh_curves)
+        assert curves.attrs['days'] == fresh_curves.attrs['days']
+        pd.testing.assert_frame_equal(today, fresh_today)
+        for measure, values in summary.items():
+            assert values == pytest.approx(fresh_summary[measure])
+
+
+def test_orders_today_keep_the_closed_days(history):
+    cube = DemandCube.build(history[history['Order time'] < NOW.normalize()])
+    updated = cube.updated(history, since=NOW.normalize())
+    # Only today changed, so curves cached on closed_version are still right
+    assert updated.closed_version == cube.closed_version
+    pd.testing.assert_frame_equal(typical_curves(updated, NOW.date()), typical_curves(cube, NOW.date()))
+    assert_same_pacing(updated, DemandCube.build(history))
+
+
+def test_late_order_on_a_closed_day_moves_the_curves(history):
+    cube = DemandCube.build(history)
+    late = make_orders("2026-02-21", 1, per_day=1, seed=5, prefix="late").assign(
+        **{'Order time': pd.Timestamp("2026-02-21 12:00:00"), 'Dispatch type': 'Delivery'}
+    )
+    sales, since = refreshed(history, new_rows=late)
+    updated = cube.updated(sales, since=since)
+    assert updated.closed_version != cube.closed_version
+    assert_same_pacing(updated, DemandCube.build(sales))
+
+
+def test_today_is_not_part_of_its_own_history(history):
+    curves = typical_curves(DemandCube.build(history), NOW.date())
+    # Eight weeks of history hold seven earlier Saturdays (the 12-week window reaches past the start)
+    assert curves.attrs['days'] == 7
@@ -0,0 +1,55 @@
+"""Run and section bookkeeping of utils.perf_profiler."""
+
+import pytest
+
+from utils.perf_profiler import Profiler, active_run, cache_call, cache_miss, stage
+
+
+class ScriptStopped(Exception):
+    """Stands in for the control-flow exception st.stop() / st.rerun() raise."""
+
+
+def test_nested_stages_and_cache_counts():
+    profiler = Profiler()
+    with profiler.run("page") as run:
+        with stage("load"):
+            with stage("orders"):
+                pass
+        with cache_call("rollups"):
+            cache_miss("rollups")
+        with cache_call("rollups"):
+            pass
+    assert [name for name, _ in run.stages] == ["load/orders", "load"]
+    assert run.caches == {"rollups": [1, 1]}
+    assert active_run() is None and profiler.runs("page") == [run]
+
+
+def test_interrupted_run_is_recorded_and_the_outer_run_resumes():
+    profiler = Profiler()
+    outer = profiler.start("page")
+    with pytest.raises(ScriptStopped):
+        with profiler.run("refresh"):
+            raise ScriptStopped
+    assert active_run() is outer
+    assert [run.name for run in profiler.runs()] == ["refresh"]
+    profiler.finish(outer)
+
+
+def test_standalone_section_never_joins_a_stale_run():
+    profiler = Profiler()
+    # A page run stopped mid-script is left attached to the thread
+    stale = profiler.start("page")
+    with profiler.section("pacing", standalone=True):
+        pass
+    assert stale.stages == []
+    assert [run.name for run in profiler.runs()] == ["fragment:pacing"]
+    assert active_run() is None
+
+
+def test_section_is_a_stage_of_the_active_run():
+    profiler = Profiler()
+    with profiler.run("page") as run:
+        with profiler.section("kpis"):
+            pass
+    assert [name for name, _ in run.stages] == ["kpis"]
+    assert profiler.runs("fragment:kpis") == []
@@ -0,0 +1,86 @@
+"""Segmented snapshots of utils.snapshot_cache."""
+
+import os
+
+import pandas as pd
+
+from utils.snapshot_cache import MAX_DELTAS, SnapshotCache
+
+
+def frames(n_orders, n_items, revenue=1.0):
+    sales = pd.DataFrame({
+        'Order ID': [f"o{i}" for i in range(n_orders)],
+        'Change ID': range(1, n_orders + 1),
+        'Order time': pd.date_range("2026-02-01", periods=n_orders, freq="h"),
+        'Revenue': [revenue] * n_orders,
+    })
+    items = pd.DataFrame({'Row ID': range(1, n_items + 1), 'Order ID': [f"o{i % max(n_orders, 1)}" for i in range(n_items)]})
+    return sales, items
+
+
+def test_saves_after_the_first_write_deltas_only(tmp_path):
+    cache = SnapshotCache(str(tmp_path), source="db")
+    sales, items = frames(10, 20)
+    cache.save(sales, items, 10, 20, rewrite_version=1)
+    sales, items = frames(12, 25)
+    cache.save(sales, items, 12, 25, rewrite_version=1)
+
+    segments = sorted(os.listdir(tmp_path))
+    assert segments == ["snapshot-000001", "snapshot-000002"]
+    delta = pd.read_feather(tmp_path / "snapshot-000002" / "orders.arrow")
+    assert list(delta['Order ID']) == ["o10", "o11"]
+
+    loaded_sales, loaded_items, meta = SnapshotCache(str(tmp_path), source="db").load()
+    assert len(loaded_sales) == 12 and len(loaded_items) == 25
+    assert (meta["order_watermark"], meta["item_watermark"]) == (12, 25)
+
+
+def test_re_read_order_replaces_the_older_copy(tmp_path):
+    cache = SnapshotCache(str(tmp_path))
+    sales, items = frames(3, 3)
+    cache.save(sales, items, 3, 3)
+    sales.loc[0, ['Change ID', 'Revenue']] = [4, 9.0]
+    cache.save(sales, items, 4, 3)
+
+    loaded_sales, _, _ = SnapshotCache(str(tmp_path)).load()
+    assert len(loaded_sales) == 3
+    assert loaded_sales.set_index('Order ID').loc["o0", "Revenue"] == 9.0
+
+
+def test_unfinished_segment_is_ignored(tmp_path):
+    cache = SnapshotCache(str(tmp_path))
+    sales, items = frames(5, 5)
+    cache.save(sales, items, 5, 5)
+    # A crash mid-save leaves only the temporary directory behind
+    os.makedirs(tmp_path / "snapshot-000002.tmp")
+    pd.DataFrame({'Row ID': [99]}).to_feather(tmp_path / "snapshot-000002.tmp" / "order_items.arrow")
+
+    loaded_sales, loaded_items, meta = SnapshotCache(str(tmp_path)).load()
+    assert len(loaded_sales) == 5 and len(loaded_items) == 5 and meta["item_watermark"] == 5
+
+
+def test_rewrite_or_many_deltas_start_a_new_full_segment(tmp_path):
+    cache = SnapshotCache(str(tmp_path))
+    for n in range(1, MAX_DELTAS + 3):
+        sales, items = frames(n, n)
+        cache.save(sales, items, n, n)
+    assert len(os.listdir(tmp_path)) < MAX_DELTAS + 2
+
+    sales, items = frames(2, 2)
+    cache.save(sales, items, 2, 2, rewrite_version=7)
+    assert os.listdir(tmp_path) == [sorted(os.listdir(tmp_path))[-1]]
+    loaded_sales, _, meta = SnapshotCache(str(tmp_path)).load()
+    assert len(loaded_sales) == 2 and meta["rewrite_version"] == 7
+
+
+def test_overlap_writes_late_rows_below_the_watermark(tmp_path):
+    cache = SnapshotCache(str(tmp_path))
+    sales, items = frames(5, 5)
+    late_sales, late_items = sales[sales['Change ID'] != 3], items[items['Row ID'] != 3]
+    cache.save(late_sales, late_items, 5, 5)
+    # Change / item id 3 committed after the first save
+    cache.save(sales, items, 5, 5, overlap=3)
+
+    loaded_sales, loaded_items, _ = SnapshotCache(str(tmp_path)).load()
+    assert sorted(loaded_sales['Change ID']) == [1, 2, 3, 4, 5]
+    assert sorted(loaded_items['Row ID']) == [1, 2, 3, 4, 5]
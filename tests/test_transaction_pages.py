@@ -0,0 +1,58 @@
+"""Keyset pagination of utils.transaction_pages against Postgres.
+
+Needs a scratch database: set TEST_DATABASE_URL (a SQLAlchemy URL) to run.
+"""
+
+import os
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from utils.transaction_pages import fetch_page
+
+DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+# Ties across page boundaries, REAL values with no exact float8 twin, and NULLs (sorted as 0)
+REVENUES = [12.34, 12.34, 12.34, 0.1, 0.1, 7.7, None, None, 0.0, 99.99, 99.99, 33.33, 1e-3, 12.35, 12.33]
+
+
+@pytest.fixture
+def conn():
+    engine = create_engine(DATABASE_URL)
+    schema = f"test_pages_{uuid.uuid4().hex[:8]}"
+    with engine.connect() as conn:
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+        conn.execute(text(f"SET search_path TO {schema}"))
+        conn.execute(text("""
+            CREATE TABLE orders (
+                order_id TEXT PRIMARY KEY, order_time TIMESTAMP, revenue REAL, tax REAL,
+                delivery_charges REAL, dispatch_type TEXT, payment_method TEXT, sales_channel_name TEXT
+            )
+        """))
+        for i, revenue in enumerate(REVENUES):
+            conn.execute(
+                text("INSERT INTO orders (order_id, order_time, revenue) "
+                     "VALUES (:id, TIMESTAMP '2026-02-01 12:00' + :i * INTERVAL '1 minute', :revenue)"),
+                {"id": f"o{i:02d}", "i": i, "revenue": revenue},
+            )
+        try:
+            yield conn
+        finally:
+            # Everything, schema included, was one transaction
+            conn.rollback()
+
+
+@pytest.mark.parametrize("descending", [True, False])
+@pytest.mark.parametrize("page_size", [1, 2, 3, 4])
+def test_revenue_pages_cover_every_row_once(conn, descending, page_size):
+    seen, cursor = [], None
+    for _ in range(len(REVENUES) + 1):
+        page, cursor = fetch_page(conn, "WHERE TRUE", {}, sort="Revenue", descending=descending,
+                                  after=cursor, page_size=page_size)
+        seen += list(page["Order ID"])
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(f"o{i:02d}" for i in range(len(REVENUES)))
+    assert len(seen) == len(set(seen))
@@ -0,0 +1,56 @@
+"""
+SCHEMA UPGRADE SCRIPT
+Brings an existing Supabase database up to what the dashboard expects:
+    - keyset pagination indexes for the transaction grid
+    - the data_version counter, orders.change_id and their triggers
+    - the calendar_dim table
+Only creates what is missing - safe to run any number of times, and it
+never touches the order rows themselves. Run it after pulling a new
+dashboard version, before restarting the app.
+"""
+import os
+
+import psycopg2
+from dotenv import load_dotenv
+
+from utils.calendar_dim import install_calendar_table
+from utils.data_version import install_postgres_trigger
+from utils.transaction_pages import install_page_indexes
+
+# Load from .env file
+load_dotenv()
+
+DB_HOST     = os.getenv("DB_HOST")
+DB_PORT     = int(os.getenv("DB_PORT", 5432))
+DB_NAME     = os.getenv("DB_NAME")
+DB_USER     = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+
+
+def upgrade():
+    print("Connecting to Supabase...")
+    pg = psycopg2.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        database=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD
+    )
+    cursor = pg.cursor()
+    print("Connected successfully!")
+
+    print("Creating transaction grid indexes...")
+    install_page_indexes(cursor)
+    print("Installing data_version counter and change tracking...")
+    install_postgres_trigger(cursor)
+    print("Filling calendar_dim...")
+    days = install_calendar_table(cursor, 2020, 2035)
+    pg.commit()
+    print(f"Schema up to date ({days:,} calendar days).")
+
+    cursor.close()
+    pg.close()
+
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,119 @@
+"""
+Background Refresher
+====================
+Stale-while-revalidate holder for the dashboard dataset.
+
+A daemon thread polls a cheap version function and, when the version moves,
+rebuilds the dataset off the request path and swaps the finished result in
+with a single reference assignment. Readers always get the last good
+snapshot immediately - they never wait on Supabase except for the very
+first build in a fresh process.
+
+Builds are serialized. Sessions that cold-start together all wait for the
+one first build instead of each running their own.
+
+If a rebuild fails the previous snapshot stays in place and the error is
+kept on `last_error`, so the page can show how stale the data is.
+
+Usage:
+    refresher = BackgroundRefresher(build, poll_version, interval=10)
+    snapshot = refresher.get()       # DataSnapshot(value, version, built_at)
+    snapshot.age_seconds
+    refresher.refresh_now()          # force a rebuild in the caller's thread
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class DataSnapshot:
+    """One built dataset and the data version it was built from."""
+
+    __slots__ = ("value", "version", "built_at", "build_seconds")
+
+    def __init__(self, value, version, built_at, build_seconds):
+        self.value = value
+        self.version = version
+        self.built_at = built_at
+        self.build_seconds = build_seconds
+
+    @property
+    def age_seconds(self):
+        return (datetime.now() - self.built_at).total_seconds()
+
+
+class BackgroundRefresher:
+    """
+    Keep build(version) current for whatever poll_version() returns.
+
+    Args:
+        build: version -> value; runs in the background thread
+        poll_version: () -> hashable version; should be cheap
+        interval: seconds between polls
+    """
+
+    def __init__(self, build, poll_version, interval=10, name="dashboard-refresher"):
+        self.build = build
+        self.poll_version = poll_version
+        self.interval = interval
+        self.name = name
+        self.current = None
+        self.last_error = None
+        self._build_lock = threading.Lock()
+        self._thread = None
+
+    def get(self):
+        """
+        The latest snapshot; builds synchronously only if there is none yet.
+
+        Raises:
+            whatever build() raised, if the first build fails
+        """
+        if self.current is None:
+            self._rebuild(self.poll_version(), raise_errors=True)
+        self._ensure_thread()
+        return self.current
+
+    def refresh_now(self):
+        """Poll and rebuild in the calling thread even if the version has not moved (manual refresh)."""
+        self._rebuild(self.poll_version(), raise_errors=True, force=True)
+        return self.current
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                version = self.poll_version()
+            except Exception as e:
+                logger.warning(f"Version poll failed: {e}")
+                continue
+            if self.current is None or version != self.current.version:
+                self._rebuild(version, raise_errors=False)
+
+    def _rebuild(self, version, raise_errors, force=False):
+        with self._build_lock:
+            # Another thread may have built this version while we waited
+            if not force and self.current is not None and self.current.version == version:
+                return
+            start = time.perf_counter()
+            try:
+                value = self.build(version)
+            except Exception as e:
+                self.last_error = e
+                logger.error(f"Background rebuild for version {version} failed: {e}")
+                if raise_errors:
+                    raise
+                return
+            # Readers hold the old snapshot object; this swap is atomic
+            self.current = DataSnapshot(value, version, datetime.now(), time.perf_counter() - start)
+            self.last_error = None
+            logger.info(f"Dataset rebuilt for version {version} in {self.current.build_seconds:.2f}s")
@@ -0,0 +1,253 @@
+"""
+Calendar Dimension
+==================
+One row per date with every calendar attribute the dashboard groups or
+labels by, keyed by an integer day key (YYYYMMDD). Orders carry the day
+key, and week / month / weekday labels are looked up from this table by
+position instead of re-decomposing timestamps in every section.
+
+Columns:
+    Day Key          -> 20260104 (int32)
+    Date             -> datetime64, midnight
+    Year, Month      -> 2026, '2026-01'
+    ISO Year, ISO Week, ISO Year Week  -> 2026, 1, '2026-W01'
+    Week Start, Week -> Monday date, 'YYYY-MM-DD/YYYY-MM-DD' (Monday-Sunday)
+    Weekday, Day Name -> 0 = Monday, 'Monday'
+    Is Bank Holiday  -> England & Wales bank holidays (incl. substitute days)
+    Trading Day      -> False on the dates the shop is closed (CLOSED_DATES)
+    Fiscal Year, Fiscal Period -> 'FY2025/26', 1-12 (April start by default)
+
+ISO Year Week keeps weeks from different years apart, unlike a bare
+isocalendar().week, and an ISO week straddling New Year stays one week.
+
+The same table is materialized in Supabase as `calendar_dim` (see
+migrate_to_supabase.py) for SQL-side joins on day_key.
+
+restaurant_now() is "now" on the same clock as the order times, whatever
+the server's time zone; use it wherever "today" or "now" is compared with
+orders.
+
+Usage:
+    keys = day_key(sales_data['Order time'])
+    calendar_lookup(keys, ['ISO Year Week', 'Is Bank Holiday'])
+    today = restaurant_now().date()
+"""
+
+import functools
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils.rollup_engine import DAY_NAMES, week_label
+
+FISCAL_START_MONTH = 4
+
+# Order times are naive wall-clock times in the restaurant's time zone
+RESTAURANT_TZ = "Europe/London"
+
+# (month, day) the shop never trades on
+CLOSED_DATES = ((12, 25),)
+
+# One-off changes to the England & Wales calendar: date -> True (added) / False (removed)
+BANK_HOLIDAY_OVERRIDES = {
+    date(2020, 5, 4): False, date(2020, 5, 8): True,        # VE Day
+    date(2022, 5, 30): False, date(2022, 6, 2): True,       # Platinum Jubilee
+    date(2022, 6, 3): True, date(2022, 9, 19): True,        # State funeral
+    date(2023, 5, 8): True,                                 # Coronation
+}
+
+CALENDAR_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS calendar_dim (
+    day_key INTEGER PRIMARY KEY,
+    date DATE NOT NULL,
+    year INTEGER,
+    month TEXT,
+    iso_year INTEGER,
+    iso_week INTEGER,
+    iso_year_week TEXT,
+    week_start DATE,
+    weekday INTEGER,
+    day_name TEXT,
+    is_bank_holiday BOOLEAN,
+    trading_day BOOLEAN,
+    fiscal_year TEXT,
+    fiscal_period INTEGER
+)
+"""
+
+CALENDAR_UPSERT_SQL = """
+INSERT INTO calendar_dim VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+ON CONFLICT (day_key) DO UPDATE SET
+    is_bank_holiday = EXCLUDED.is_bank_holiday,
+    trading_day = EXCLUDED.trading_day,
+    fiscal_year = EXCLUDED.fiscal_year,
+    fiscal_period = EXCLUDED.fiscal_period
+"""
+
+
+def restaurant_now():
+    """Current restaurant-local time as a naive Timestamp, like 'Order time'."""
+    return pd.Timestamp.now(tz=RESTAURANT_TZ).tz_localize(None)
+
+
+def easter_sunday(year):
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return date(year, month, day)
+
+
+def _nth_monday(year, month, n):
+    """n-th Monday of the month (n = -1 for the last)."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(7 - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=last.weekday())
+
+
+def uk_bank_holidays(year):
+    """England & Wales bank holidays for one year, substitute days included."""
+    holidays = set()
+
+    new_year = date(year, 1, 1)
+    holidays.add(new_year + timedelta(days={5: 2, 6: 1}.get(new_year.weekday(), 0)))
+
+    easter = easter_sunday(year)
+    holidays.update({easter - timedelta(days=2), easter + timedelta(days=1)})
+    holidays.update({_nth_monday(year, 5, 1), _nth_monday(year, 5, -1), _nth_monday(year, 8, -1)})
+
+    christmas, boxing = date(year, 12, 25), date(year, 12, 26)
+    if christmas.weekday() == 5:        # Saturday: both move to Mon/Tue
+        holidays.update({date(year, 12, 27), date(year, 12, 28)})
+    elif christmas.weekday() == 6:      # Sunday: Christmas to Tue, Boxing Day stays Mon
+        holidays.update({boxing, date(year, 12, 27)})
+    elif christmas.weekday() == 4:      # Friday: Boxing Day (Sat) to Mon
+        holidays.update({christmas, date(year, 12, 28)})
+    else:
+        holidays.update({christmas, boxing})
+
+    for day, added in BANK_HOLIDAY_OVERRIDES.items():
+        if day.year == year:
+            (holidays.add if added else holidays.discard)(day)
+    return holidays
+
+
+def day_key(dates):
+    """
+    Integer YYYYMMDD keys for datetimes / dates; -1 where missing.
+
+    Returns:
+        np.ndarray of int32
+    """
+    dates = pd.to_datetime(pd.Series(dates))
+    keys = dates.dt.year * 10000 + dates.dt.month * 100 + dates.dt.day
+    return keys.fillna(-1).to_numpy().astype(np.int32)
+
+
+def build_calendar(start, end, fiscal_start_month=FISCAL_START_MONTH, closed_dates=CLOSED_DATES):
+    """
+    Calendar rows for every date from start to end inclusive.
+
+    Returns:
+        pd.DataFrame sorted by Day Key
+    """
+    dates = pd.Series(pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq='D'))
+    iso = dates.dt.isocalendar()
+    weekday = dates.dt.weekday
+    week_start = dates - pd.to_timedelta(weekday, unit='D')
+
+    holidays = set()
+    for year in range(dates.dt.year.min(), dates.dt.year.max() + 1) if len(dates) else ():
+        holidays |= uk_bank_holidays(year)
+    plain_dates = dates.dt.date
+
+    month_num = dates.dt.month
+    fiscal_first_year = dates.dt.year - (month_num < fiscal_start_month).astype(int)
+    fiscal_year = (
+        "FY" + fiscal_first_year.astype(str) + "/" + ((fiscal_first_year + 1) % 100).map('{:02d}'.format)
+    )
+    closed = set(closed_dates)
+
+    return pd.DataFrame({
+        'Day Key': day_key(dates),
+        'Date': dates,
+        'Year': dates.dt.year.astype('int16'),
+        'Month': dates.dt.strftime('%Y-%m').astype('category'),
+        'ISO Year': iso['year'].astype('int16').to_numpy(),
+        'ISO Week': iso['week'].astype('int8').to_numpy(),
+        'ISO Year Week': pd.Categorical(
+            iso['year'].astype(str) + "-W" + iso['week'].map('{:02d}'.format)
+        ),
+        'Week Start': week_start,
+        'Week': pd.Categorical(week_label(week_start)),
+        'Weekday': weekday.astype('int8'),
+        'Day Name': pd.Categorical.from_codes(weekday, categories=DAY_NAMES, ordered=True),
+        'Is Bank Holiday': plain_dates.isin(holidays).to_numpy(),
+        'Trading Day': ~pd.Series(list(zip(month_num, dates.dt.day))).isin(closed).to_numpy(),
+        'Fiscal Year': fiscal_year.astype('category'),
+        'Fiscal Period': ((month_num - fiscal_start_month) % 12 + 1).astype('int8'),
+    })
+
+
+@functools.lru_cache(maxsize=8)
+def calendar_years(first_year, last_year):
+    """Cached calendar for whole years (callers must not modify it)."""
+    return build_calendar(date(first_year, 1, 1), date(last_year, 12, 31))
+
+
+def calendar_lookup(keys, columns):
+    """
+    Calendar attributes for an array of day keys, looked up by position.
+
+    Keys of -1 (missing dates) get NaN / NaT / missing categories.
+
+    Returns:
+        pd.DataFrame with one row per key
+    """
+    keys = np.asarray(keys, dtype=np.int32)
+    valid = keys >= 0
+    if not valid.any():
+        calendar = calendar_years(2000, 2000).iloc[:0]
+        return pd.DataFrame({col: calendar[col].reindex(range(len(keys))) for col in columns})
+
+    calendar = calendar_years(int(keys[valid].min()) // 10000, int(keys[valid].max()) // 10000)
+    positions = np.where(valid, np.searchsorted(calendar['Day Key'].to_numpy(), keys), -1)
+    out = {}
+    for col in columns:
+        values = calendar[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = np.where(valid, values.cat.codes.to_numpy()[positions], -1)
+            out[col] = pd.Categorical.from_codes(codes, dtype=values.dtype)
+        elif valid.all():
+            out[col] = values.to_numpy()[positions]
+        else:
+            out[col] = values.reindex(np.where(valid, positions, -1)).to_numpy()
+    return pd.DataFrame(out)
+
+
+def install_calendar_table(cursor, first_year, last_year):
+    """Create and fill `calendar_dim` in Postgres (psycopg2 cursor, idempotent)."""
+    cursor.execute(CALENDAR_TABLE_SQL)
+    calendar = build_calendar(date(first_year, 1, 1), date(last_year, 12, 31))
+    rows = [
+        (
+            int(row['Day Key']), row['Date'].date(), int(row['Year']), row['Month'],
+            int(row['ISO Year']), int(row['ISO Week']), row['ISO Year Week'],
+            row['Week Start'].date(), int(row['Weekday']), row['Day Name'],
+            bool(row['Is Bank Holiday']), bool(row['Trading Day']),
+            row['Fiscal Year'], int(row['Fiscal Period']),
+        )
+        for _, row in calendar.iterrows()
+    ]
+    cursor.executemany(CALENDAR_UPSERT_SQL, rows)
+    return len(rows)
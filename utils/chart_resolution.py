@@ -0,0 +1,102 @@
+"""
+Chart Resolution
+================
+Caps how many points a time-series chart sends to the browser, whatever
+date range is selected.
+
+    line traces -> Largest-Triangle-Three-Buckets (LTTB) downsampling to at
+                   most MAX_LINE_POINTS, which keeps peaks and troughs that
+                   plain striding would drop
+    bar charts  -> daily bars become weekly, then monthly, bins once there
+                   are more than MAX_BARS of them
+    trace type  -> go.Scattergl (WebGL) instead of go.Scatter above
+                   WEBGL_THRESHOLD points
+
+Usage:
+    points = downsample(daily_data, 'Date', 'Revenue')
+    fig.add_trace(scatter_trace(len(points))(x=points['Date'], y=points['Revenue']))
+    bars, grain = bar_bins(rollups['daily'])
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+MAX_LINE_POINTS = 2000
+MAX_BARS = 400
+WEBGL_THRESHOLD = 500
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Row positions LTTB keeps out of len(x) points (always the first and last).
+
+    Args:
+        x, y: numeric sequences of equal length, x ascending
+        threshold: points to keep
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+
+    bucket_size = (n - 2) / (threshold - 2)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        if end < next_end:
+            avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        # Area of the triangle (kept point, candidate, next bucket's average)
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def downsample(df, x, y, max_points=MAX_LINE_POINTS):
+    """Rows of df that LTTB keeps for the (x, y) line; df itself if small enough."""
+    if len(df) <= max_points:
+        return df
+    x_values = df[x]
+    if not pd.api.types.is_numeric_dtype(x_values):
+        x_values = pd.to_datetime(x_values).astype('int64')
+    return df.iloc[lttb_indices(x_values.to_numpy(), df[y].to_numpy(), max_points)]
+
+
+def scatter_trace(n_points):
+    """go.Scattergl for long traces, go.Scatter otherwise."""
+    return go.Scattergl if n_points > WEBGL_THRESHOLD else go.Scatter
+
+
+def bar_bins(daily, date_col='Date', max_bars=MAX_BARS):
+    """
+    Daily rollup rebinned so it has at most max_bars bars (monthly bins
+    are the coarsest, so very long ranges may still exceed it).
+
+    Summable columns are summed per bin; the bin is labelled by its first day.
+
+    Returns:
+        tuple: (frame, grain) with grain 'Daily', 'Weekly' or 'Monthly'
+    """
+    if len(daily) <= max_bars:
+        return daily, 'Daily'
+    days = pd.to_datetime(daily[date_col])
+    measures = daily.drop(columns=date_col).select_dtypes('number')
+    for grain, starts in (
+        ('Weekly', days - pd.to_timedelta(days.dt.weekday, unit='D')),
+        ('Monthly', days.dt.to_period('M').dt.start_time),
+    ):
+        binned = measures.groupby(starts.to_numpy(), sort=True).sum()
+        if len(binned) <= max_bars or grain == 'Monthly':
+            binned = binned.rename_axis(date_col).reset_index()
+            binned[date_col] = binned[date_col].dt.date
+            return binned, grain
@@ -0,0 +1,219 @@
+"""
+Data Export
+===========
+Builds downloadable exports of the filtered orders only when someone asks
+for one, writing them to disk in row chunks so a large export never holds
+a second full copy of the data in memory.
+
+Formats (name -> extension, mime):
+    CSV         -> .csv
+    CSV (gzip)  -> .csv.gz
+    Parquet     -> .parquet
+    Excel       -> .xlsx   (only offered if openpyxl / xlsxwriter is installed)
+
+With items included, Excel gets a second sheet and the other formats become
+a .zip holding orders and order_items in the chosen format.
+
+Finished files are kept in an ExportCache keyed by (data version, filters,
+format, items), so a second download of the same selection is just a file
+read.
+
+Usage:
+    cache = ExportCache("data/cache/exports")
+    data = cache.get_or_build(key, ".csv", lambda fh: write_export(fh, "CSV", sales))
+"""
+
+import gzip
+import hashlib
+import importlib.util
+import io
+import logging
+import os
+import threading
+import zipfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.perf_profiler import cache_event
+from utils.rollup_cache import filter_hash
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 50_000
+
+EXPORT_FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "CSV (gzip)": (".csv.gz", "application/gzip"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+    "Excel": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+
+def available_formats():
+    """EXPORT_FORMATS names usable in this environment."""
+    has_excel = any(importlib.util.find_spec(m) for m in ("openpyxl", "xlsxwriter"))
+    return [name for name in EXPORT_FORMATS if name != "Excel" or has_excel]
+
+
+def export_file_type(fmt, include_items=False):
+    """
+    Returns:
+        tuple: (extension, mime) of the file write_export() produces
+    """
+    if include_items and fmt != "Excel":
+        return ".zip", "application/zip"
+    return EXPORT_FORMATS[fmt]
+
+
+def export_key(data_version, fmt, include_items, **filters):
+    """ExportCache key for one data version, format and filter selection."""
+    raw = repr((data_version, fmt, bool(include_items), filter_hash(**filters)))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _chunks(df, columns=None):
+    """Row chunks of df (only `columns`); at least one, possibly empty, chunk."""
+    for start in range(0, max(len(df), 1), CHUNK_ROWS):
+        chunk = df.iloc[start:start + CHUNK_ROWS]
+        yield chunk if columns is None else chunk[columns]
+
+
+def _write_csv(df, fh, columns=None):
+    """CSV to a text stream, CHUNK_ROWS rows at a time."""
+    for i, chunk in enumerate(_chunks(df, columns)):
+        chunk.to_csv(fh, index=False, header=i == 0)
+
+
+def _write_parquet(df, fh, columns=None):
+    """Parquet to a binary stream, one row group per chunk."""
+    writer = None
+    try:
+        for chunk in _chunks(df, columns):
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                # A column that is all-null in the first chunk must not pin the type to null
+                for i, field in enumerate(schema):
+                    if pa.types.is_null(field.type):
+                        schema = schema.set(i, field.with_type(pa.string()))
+                writer = pq.ParquetWriter(fh, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_member(fh, fmt, df, columns=None):
+    """One table in `fmt` to the binary stream fh."""
+    if fmt == "Parquet":
+        _write_parquet(df, fh, columns)
+    elif fmt == "CSV (gzip)":
+        with gzip.GzipFile(fileobj=fh, mode="wb") as gz, \
+                io.TextIOWrapper(gz, encoding="utf-8", newline="") as text_fh:
+            _write_csv(df, text_fh, columns)
+    else:
+        text_fh = io.TextIOWrapper(fh, encoding="utf-8", newline="")
+        _write_csv(df, text_fh, columns)
+        text_fh.flush()
+        # Leave fh open for the caller (a zip member or the export file)
+        text_fh.detach()
+
+
+def write_export(fh, fmt, sales, items=None, columns=None):
+    """
+    Write an export to the binary stream fh.
+
+    Args:
+        fmt: an EXPORT_FORMATS name
+        sales: orders frame
+        items: order_items frame to include, or None
+        columns: orders columns to export (None = all); selected per chunk
+    """
+    if fmt == "Excel":
+        with pd.ExcelWriter(fh) as writer:
+            (sales if columns is None else sales[columns]).to_excel(writer, sheet_name="Orders", index=False)
+            if items is not None:
+                items.to_excel(writer, sheet_name="Order Items", index=False)
+        return
+
+    if items is None:
+        _write_member(fh, fmt, sales, columns)
+        return
+
+    # Zip members are already deflated, so gzip-CSV is stored as plain CSV inside
+    member_fmt = "CSV" if fmt == "CSV (gzip)" else fmt
+    extension = EXPORT_FORMATS[member_fmt][0]
+    compression = zipfile.ZIP_STORED if fmt == "Parquet" else zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(fh, "w", compression=compression) as archive:
+        for name, df, cols in (("orders", sales, columns), ("order_items", items, None)):
+            with archive.open(name + extension, "w", force_zip64=True) as member:
+                _write_member(member, member_fmt, df, cols)
+
+
+class ExportCache:
+    """
+    Finished export files on disk, keyed by a hex digest.
+
+    Builds are serialized and written to a temp file first, so a reader
+    never sees a half-written export. Only the newest max_files are kept.
+    """
+
+    def __init__(self, directory, max_files=16):
+        self.directory = directory
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, key + extension)
+
+    def get_or_build(self, key, extension, write):
+        """
+        Bytes of the export for key, calling write(binary_file) if missing.
+
+        The file is read under the lock, so a concurrent build cannot prune
+        it in between and no handle is left open for the caller to close.
+        """
+        path = self.path(key, extension)
+        with self._lock:
+            if os.path.exists(path):
+                os.utime(path)
+                cache_event("export_cache", True)
+                return self._read(path)
+            cache_event("export_cache", False)
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = path + ".tmp"
+            try:
+                with open(tmp_path, "wb") as fh:
+                    write(fh)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            logger.info(f"Export built: {os.path.basename(path)} ({os.path.getsize(path):,} bytes)")
+            data = self._read(path)
+            self._prune()
+        return data
+
+    @staticmethod
+    def _read(path):
+        with open(path, "rb") as fh:
+            return fh.read()
+
+    def clear(self):
+        with self._lock:
+            for path in self._files():
+                os.remove(path)
+
+    def _files(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return [
+            os.path.join(self.directory, name) for name in os.listdir(self.directory)
+            if not name.endswith(".tmp")
+        ]
+
+    def _prune(self):
+        files = sorted(self._files(), key=os.path.getmtime, reverse=True)
+        for path in files[self.max_files:]:
+            os.remove(path)
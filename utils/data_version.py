@@ -0,0 +1,173 @@
+"""
+Data Version Counter
+====================
+A one-row `data_version` table that every writer bumps, so readers can ask
+"has anything changed?" with a single-row query instead of reloading.
+
+    version          -> +1 on every change to orders / order_items
+    rewrite_version  -> +1 when rows are deleted, a table is truncated or
+                        an order item is updated; incremental loaders must
+                        then re-read everything, since their watermarks
+                        never see those changes. Order updates are not
+                        rewrites: an updated order gets a new change_id and
+                        is re-read like an insert.
+
+In Supabase a statement-level trigger on both tables keeps the counter up
+to date whoever writes (sync jobs, webhooks, push scripts). A row-level
+trigger also stamps orders.change_id from a sequence on every insert and
+update, so utils.order_store can fetch exactly the orders written since its
+last load whatever their order_time.
+
+Writers to a Postgres database without the trigger call bump_data_version()
+themselves in the same transaction, with rewrite=True whenever they deleted
+or replaced rows (push_sqlite_to_supabase clears both tables and re-inserts
+them). The local SQLite sync does not: the dashboard only reads Supabase,
+which sees those rows when they are pushed.
+
+Usage:
+    bump_data_version(cursor, "sync", placeholder="%s")                 # rows appended
+    bump_data_version(cursor, "push", rewrite=True, placeholder="%s")   # rows deleted / replaced
+    read_data_version(conn)                                             # SQLAlchemy
+    current_data_version(engine)                                        # cache key
+"""
+
+import logging
+import time
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Reload interval used when the database has no data_version table yet
+FALLBACK_REFRESH_SECONDS = 30
+
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS data_version (
+    id INTEGER PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    rewrite_version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP,
+    source TEXT
+)
+"""
+
+BUMP_SQL = """
+INSERT INTO data_version (id, version, rewrite_version, updated_at, source)
+VALUES (1, 1, {rewrite}, CURRENT_TIMESTAMP, {ph})
+ON CONFLICT (id) DO UPDATE SET
+    version = data_version.version + 1,
+    rewrite_version = data_version.rewrite_version + {rewrite},
+    updated_at = CURRENT_TIMESTAMP,
+    source = excluded.source
+"""
+
+# Postgres only: orders.change_id, re-stamped on every insert and update
+POSTGRES_CHANGE_ID_SQL = """
+ALTER TABLE orders ADD COLUMN IF NOT EXISTS change_id BIGSERIAL;
+CREATE INDEX IF NOT EXISTS idx_orders_change_id ON orders (change_id);
+
+CREATE OR REPLACE FUNCTION stamp_change_id() RETURNS trigger AS $$
+BEGIN
+    NEW.change_id := nextval(pg_get_serial_sequence('orders', 'change_id'));
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS orders_change_id ON orders;
+CREATE TRIGGER orders_change_id
+    BEFORE UPDATE ON orders
+    FOR EACH ROW EXECUTE FUNCTION stamp_change_id();
+"""
+
+# Postgres only: bump on every write statement to orders / order_items
+POSTGRES_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+DECLARE
+    is_rewrite INTEGER := CASE
+        WHEN TG_OP IN ('DELETE', 'TRUNCATE') THEN 1
+        WHEN TG_OP = 'UPDATE' AND TG_TABLE_NAME = 'order_items' THEN 1
+        ELSE 0
+    END;
+BEGIN
+    INSERT INTO data_version (id, version, rewrite_version, updated_at, source)
+    VALUES (1, 1, is_rewrite, now(), TG_TABLE_NAME)
+    ON CONFLICT (id) DO UPDATE SET
+        version = data_version.version + 1,
+        rewrite_version = data_version.rewrite_version + is_rewrite,
+        updated_at = now(),
+        source = excluded.source;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS orders_data_version ON orders;
+CREATE TRIGGER orders_data_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON orders
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+
+DROP TRIGGER IF EXISTS order_items_data_version ON order_items;
+CREATE TRIGGER order_items_data_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON order_items
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+"""
+
+
+def bump_data_version(cursor, source, rewrite=False, placeholder="?"):
+    """
+    Bump the counter on a DB-API cursor (commit is left to the caller).
+
+    Args:
+        source: who made the change (shown for diagnostics)
+        rewrite: True if rows were deleted or order items updated
+        placeholder: '?' for sqlite3, '%s' for psycopg2
+    """
+    cursor.execute(CREATE_TABLE_SQL)
+    cursor.execute(
+        BUMP_SQL.format(rewrite=1 if rewrite else 0, ph=placeholder), (source,)
+    )
+
+
+def install_postgres_trigger(cursor):
+    """Create the table, orders.change_id and the orders / order_items triggers (idempotent)."""
+    cursor.execute(CREATE_TABLE_SQL)
+    cursor.execute(POSTGRES_CHANGE_ID_SQL)
+    cursor.execute(POSTGRES_TRIGGER_SQL)
+
+
+def read_data_version(conn):
+    """
+    Current counters on a SQLAlchemy connection.
+
+    Returns:
+        tuple: (version, rewrite_version), or None if the table is missing
+        or empty (callers then fall back to time-based refresh)
+    """
+    try:
+        row = conn.execute(
+            text("SELECT version, rewrite_version FROM data_version WHERE id = 1")
+        ).fetchone()
+    except Exception as e:
+        logger.debug(f"data_version unavailable: {e}")
+        conn.rollback()
+        return None
+    return None if row is None else (int(row[0]), int(row[1]))
+
+
+def current_data_version(engine, fallback_seconds=FALLBACK_REFRESH_SECONDS):
+    """
+    Cache key for data loaded through `engine`.
+
+    Returns:
+        tuple: (version, rewrite_version) from the counter, or
+        ('t<bucket>', None) - a key that changes every fallback_seconds -
+        when the counter cannot be read
+    """
+    try:
+        with engine.connect() as conn:
+            version = read_data_version(conn)
+    except Exception as e:
+        logger.warning(f"Could not read data version: {e}")
+        version = None
+    if version is None:
+        return f"t{int(time.time() // fallback_seconds)}", None
+    return version
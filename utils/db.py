@@ -0,0 +1,132 @@
+"""
+Pooled Database Engine
+======================
+Builds the one SQLAlchemy engine a dashboard process shares across reruns
+and sessions, and keeps counters on how its connection pool is used.
+
+Settings (all optional, read from the [supabase] section of secrets.toml):
+    pool_size             -> connections kept open           (default 5)
+    max_overflow          -> extra connections under load    (default 10)
+    pool_timeout          -> seconds to wait for a connection (default 30)
+    pool_recycle          -> reconnect after N seconds       (default 1800)
+    statement_timeout_ms  -> server-side query limit, 0 = off (default 30000)
+
+Usage:
+    engine = create_pooled_engine(url, pool_size=5)
+    get_pool_stats(engine)
+"""
+
+import logging
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+POOL_DEFAULTS = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_timeout": 30,
+    "pool_recycle": 1800,
+    "statement_timeout_ms": 30000,
+}
+
+
+class PoolStats:
+    """Running counters for one engine's connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def add(self, field, amount=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how often (and how long) callers had to queue."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        # No idle connection and no overflow headroom -> this checkout waits
+        must_wait = self.checkedin() == 0 and self.overflow() >= self._max_overflow
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if must_wait:
+                self.stats.add("waits")
+                self.stats.add("wait_seconds", time.perf_counter() - start)
+
+    def recreate(self):
+        # Keep the counters when SQLAlchemy rebuilds the pool
+        new_pool = super().recreate()
+        new_pool.stats = self.stats
+        return new_pool
+
+
+def create_pooled_engine(connection_string, pool_size=5, max_overflow=10,
+                         pool_timeout=30, pool_recycle=1800, statement_timeout_ms=30000):
+    """
+    Create an engine with a pre-pinged, recycled connection pool.
+
+    Returns:
+        sqlalchemy.engine.Engine
+    """
+    connect_args = {}
+    if statement_timeout_ms:
+        connect_args["options"] = f"-c statement_timeout={int(statement_timeout_ms)}"
+
+    engine = create_engine(
+        connection_string,
+        poolclass=InstrumentedQueuePool,
+        pool_size=int(pool_size),
+        max_overflow=int(max_overflow),
+        pool_timeout=int(pool_timeout),
+        pool_recycle=int(pool_recycle),
+        pool_pre_ping=True,
+        connect_args=connect_args,
+    )
+
+    stats = engine.pool.stats
+    event.listen(engine, "connect", lambda *a: stats.add("connects"))
+    event.listen(engine, "checkout", lambda *a: stats.add("checkouts"))
+    event.listen(engine, "checkin", lambda *a: stats.add("checkins"))
+    event.listen(engine, "invalidate", lambda *a: stats.add("invalidations"))
+
+    logger.info(f"Created pooled engine (size={pool_size}, overflow={max_overflow})")
+    return engine
+
+
+def get_pool_stats(engine):
+    """
+    Current pool occupancy plus lifetime counters.
+
+    Returns:
+        dict
+    """
+    pool = engine.pool
+    stats = pool.stats
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "connects": stats.connects,
+        "checkouts": stats.checkouts,
+        "checkins": stats.checkins,
+        "invalidations": stats.invalidations,
+        "waits": stats.waits,
+        "wait_seconds": round(stats.wait_seconds, 3),
+    }
@@ -0,0 +1,229 @@
+"""
+Demand Cube
+===========
+Orders, revenue and average order value by weekday x time of day (15-minute
+slots), answerable for any date range and dispatch / channel selection in
+constant time - independent of how much history is loaded.
+
+Layout:
+    one row per calendar day (contiguous from the first order's day)
+    x one column per (dispatch type, sales channel type) pair seen so far
+    x 96 fifteen-minute slots
+    x measures (Orders, Revenue, Gross sales, Gross count)
+
+Each day stores the running total of all earlier days that fall on the
+same weekday (a prefix sum with a lag of 7), so a date range is at most 14
+row lookups: for each weekday, the last day in range minus the last day
+before it.
+
+Updates are incremental: updated() regroups only the orders from a cutoff
+time onwards (the rows the order store just re-read) and re-accumulates
+the days from there. Every update returns a new cube, so sessions reading
+the previous one are never affected. `closed_version` only changes when an
+update touches a day before today, so anything derived from closed days
+(utils.pacing) can be cached on it.
+
+Usage:
+    cube = DemandCube.build(sales_data)
+    cube = cube.updated(sales_data, since=store.changed_since)
+    cube.query(start_date, end_date, dispatch="Delivery", slot_minutes=60)
+"""
+
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from utils.calendar_dim import restaurant_now
+from utils.rollup_engine import DAY_NAMES
+
+SLOT_MINUTES = 15
+SLOTS = 24 * 60 // SLOT_MINUTES
+MEASURES = ['Orders', 'Revenue', 'Gross sales', 'Gross count']
+
+
+def _day_numbers(times):
+    """Days since the epoch for datetime64 values."""
+    return times.astype('datetime64[D]').astype(np.int64)
+
+
+def pair_codes(orders, pairs):
+    """
+    Column of each order's (dispatch type, sales channel type) pair.
+
+    Args:
+        pairs: pairs already given columns; new pairs are appended
+
+    Returns:
+        tuple: (codes array, extended pairs list)
+    """
+    dispatch_codes, dispatch_values = pd.factorize(orders['Dispatch type'], use_na_sentinel=False)
+    channel_codes, channel_values = pd.factorize(orders['Sales channel type'], use_na_sentinel=False)
+    combo_codes, combos = pd.factorize(dispatch_codes * len(channel_values) + channel_codes)
+    columns = {pair: i for i, pair in enumerate(pairs)}
+    lookup = np.empty(len(combos), dtype=np.int64)
+    for i, combo in enumerate(combos):
+        dispatch = dispatch_values[combo // len(channel_values)]
+        channel = channel_values[combo % len(channel_values)]
+        pair = (None if pd.isna(dispatch) else dispatch, None if pd.isna(channel) else channel)
+        lookup[i] = columns.setdefault(pair, len(columns))
+    return lookup[combo_codes], list(columns)
+
+
+class DemandCube:
+    """Weekday-lagged prefix sums of demand per day, dimension pair and slot."""
+
+    def __init__(self, first_day, pairs, totals, closed_version=None):
+        self.first_day = first_day      # epoch day number of row 0 (None when empty)
+        self.pairs = pairs              # [(dispatch type, sales channel type)], None = missing
+        self.totals = totals            # float64 [days, pairs, SLOTS, MEASURES]
+        self.closed_version = closed_version or (uuid.uuid4().hex, 0)
+
+    @classmethod
+    def build(cls, sales_data):
+        """Cube over every order in sales_data."""
+        return cls(None, [], np.zeros((0, 0, SLOTS, len(MEASURES)))).updated(sales_data)
+
+    @property
+    def n_days(self):
+        return self.totals.shape[0]
+
+    def updated(self, sales_data, since=None):
+        """
+        New cube with the days from `since` onwards recomputed from sales_data.
+
+        Args:
+            sales_data: orders frame sorted on 'Order time'
+            since: orders at or after this time may have changed (None, or
+                   an empty cube, = rebuild from every order)
+        """
+        times = sales_data['Order time'].to_numpy()
+        valid = ~np.isnat(times)
+        cut_day = None
+        if since is not None and self.first_day is not None:
+            cut_day = int(_day_numbers(np.datetime64(pd.Timestamp(since), 'D')))
+        if cut_day is None or cut_day <= self.first_day:
+            cut_day, first_day, pairs, kept = None, None, [], None
+        else:
+            first_day, pairs = self.first_day, list(self.pairs)
+            kept = self.totals[:cut_day - first_day]
+
+        if cut_day is not None:
+            start = np.datetime64(pd.Timestamp(cut_day, unit='D')).astype(times.dtype)
+            rows = np.flatnonzero(valid & (times >= start))
+        else:
+            rows = np.flatnonzero(valid)
+        if kept is None:
+            closed_version = None
+        elif cut_day < _day_numbers(np.datetime64(restaurant_now().date(), 'D')):
+            closed_version = (self.closed_version[0], self.closed_version[1] + 1)
+        else:
+            closed_version = self.closed_version
+        if first_day is None:
+            if len(rows) == 0:
+                return DemandCube(None, [], np.zeros((0, 0, SLOTS, len(MEASURES))))
+            first_day = int(_day_numbers(times[rows[0]]))
+
+        orders = sales_data.iloc[rows]
+        days = _day_numbers(times[rows]) - first_day
+        minutes = orders['Order time'].dt.hour.to_numpy() * 60 + orders['Order time'].dt.minute.to_numpy()
+        slots = minutes // SLOT_MINUTES
+
+        codes, pairs = pair_codes(orders, pairs)
+
+        n_days = int(days.max()) + 1 if len(days) else (cut_day - first_day if cut_day is not None else 0)
+        if kept is not None:
+            n_days = max(n_days, len(kept))
+        values = np.zeros((n_days, len(pairs), SLOTS, len(MEASURES)))
+        cell = (days, codes, slots)
+        np.add.at(values, cell + (0,), orders['Order ID'].notna().to_numpy(dtype=np.float64))
+        np.add.at(values, cell + (1,), orders['Revenue'].to_numpy(dtype=np.float64, na_value=0))
+        np.add.at(values, cell + (2,), orders['Gross sales'].to_numpy(dtype=np.float64, na_value=0))
+        np.add.at(values, cell + (3,), orders['Gross sales'].notna().to_numpy(dtype=np.float64))
+
+        start_row = 0
+        if kept is not None:
+            start_row = len(kept)
+            values[:start_row, :kept.shape[1]] = kept
+        # Lag-7 running totals from the first recomputed day on
+        for row in range(max(start_row, 7), n_days, 7):
+            end = min(row + 7, n_days)
+            values[row:end] += values[row - 7:end - 7]
+        return DemandCube(first_day, pairs, values, closed_version)
+
+    def _columns(self, dispatch, channel):
+        """Pair columns matching a dispatch type / sales channel type (None = all)."""
+        return [
+            i for i, (d, c) in enumerate(self.pairs)
+            if (dispatch is None or d == dispatch) and (channel is None or c == channel)
+        ]
+
+    def day_slots(self, dates, dispatch=None, channel=None):
+        """
+        Totals of single days (not running totals), zero for days outside the cube.
+
+        Returns:
+            np.ndarray [len(dates), SLOTS, MEASURES]
+        """
+        out = np.zeros((len(dates), SLOTS, len(MEASURES)))
+        columns = self._columns(dispatch, channel)
+        if self.first_day is None or not columns:
+            return out
+        rows = _day_numbers(np.asarray(dates, dtype='datetime64[D]')) - self.first_day
+        for i, row in enumerate(rows):
+            if 0 <= row < self.n_days:
+                out[i] = self.totals[row, columns].sum(axis=0)
+                if row >= 7:
+                    out[i] -= self.totals[row - 7, columns].sum(axis=0)
+        return out
+
+    def _range_totals(self, start_day, end_day, columns):
+        """[7, SLOTS, MEASURES] sums for days start_day..end_day, Monday first."""
+        out = np.zeros((7, SLOTS, len(MEASURES)))
+        lo = max(start_day - self.first_day, 0)
+        hi = min(end_day - self.first_day, self.n_days - 1)
+        for last in range(hi, max(hi - 7, lo - 1), -1):
+            # Running total at the weekday's last day in range, minus the one
+            # at its last day before the range
+            total = self.totals[last, columns].sum(axis=0)
+            before = last - 7 * ((last - lo) // 7 + 1)
+            if before >= 0:
+                total = total - self.totals[before, columns].sum(axis=0)
+            out[(self.first_day + last + 3) % 7] = total    # epoch day 0 was a Thursday
+        return out
+
+    def query(self, start_date, end_date, dispatch=None, channel=None, slot_minutes=SLOT_MINUTES):
+        """
+        Demand per weekday and time slot.
+
+        Args:
+            start_date, end_date: inclusive date range
+            dispatch, channel: a dispatch type / sales channel type, or None for all
+            slot_minutes: 15, 30 or 60
+
+        Returns:
+            pd.DataFrame: Day, Slot ('HH:MM'), Orders, Revenue, Avg Order Value -
+            7 x (1440 / slot_minutes) rows, Monday first
+        """
+        columns = self._columns(dispatch, channel)
+        if self.first_day is None or not columns:
+            sums = np.zeros((7, SLOTS, len(MEASURES)))
+        else:
+            start_day = int(_day_numbers(np.datetime64(pd.Timestamp(start_date), 'D')))
+            end_day = int(_day_numbers(np.datetime64(pd.Timestamp(end_date), 'D')))
+            sums = self._range_totals(start_day, end_day, columns)
+
+        per_slot = slot_minutes // SLOT_MINUTES
+        sums = sums.reshape(7, SLOTS // per_slot, per_slot, len(MEASURES)).sum(axis=2)
+        slot_starts = np.arange(0, 24 * 60, slot_minutes)
+        labels = [f"{m // 60:02d}:{m % 60:02d}" for m in slot_starts]
+        orders, revenue, gross, gross_count = (sums[..., i].ravel() for i in range(len(MEASURES)))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_order = np.where(gross_count > 0, gross / gross_count, np.nan)
+        return pd.DataFrame({
+            'Day': pd.Categorical(np.repeat(DAY_NAMES, len(labels)), categories=DAY_NAMES, ordered=True),
+            'Slot': np.tile(labels, 7),
+            'Orders': orders.astype(np.int64),
+            'Revenue': revenue,
+            'Avg Order Value': avg_order,
+        })
@@ -0,0 +1,51 @@
+"""
+Derived Time Columns
+====================
+Adds every calendar column the sections group by to the base orders frame,
+once per data load. Sections then read them through the filtered slice
+instead of copying the filtered frame to attach their own.
+
+    Day Key      -> YYYYMMDD (int32), the key into utils.calendar_dim
+    Day          -> order date (datetime64, midnight)
+    Day Name     -> Monday..Sunday (categorical, week order)
+    Week         -> 'YYYY-MM-DD/YYYY-MM-DD' Monday-Sunday (categorical)
+    Month        -> 'YYYY-MM' (categorical)
+    Hour, Meal Period, Day Part -> see utils.time_buckets
+
+Only the day key is computed from the timestamps; the rest is looked up
+from the calendar dimension by position, and the label columns hold
+category codes, so they cost a few bytes per order.
+
+Usage:
+    sales_data = add_derived_columns(sales_data)
+    sales_data.to_csv(columns=source_columns(sales_data))
+"""
+
+from utils.calendar_dim import calendar_lookup, day_key
+from utils.time_buckets import MEAL_PERIODS, add_time_buckets
+
+DERIVED_COLUMNS = ['Day Key', 'Day', 'Day Name', 'Week', 'Month', 'Hour', 'Meal Period', 'Day Part']
+
+# Load bookkeeping from utils.order_store, not order data
+INTERNAL_COLUMNS = ['Change ID']
+
+
+def add_derived_columns(df, meal_periods=MEAL_PERIODS):
+    """Return df with the DERIVED_COLUMNS added."""
+    times = df['Order time']
+    keys = day_key(times)
+    calendar = calendar_lookup(keys, ['Date', 'Day Name', 'Week', 'Month'])
+
+    df = add_time_buckets(df, meal_periods)
+    return df.assign(**{
+        'Day Key': keys,
+        'Day': calendar['Date'].astype(times.dtype).to_numpy(),
+        'Day Name': calendar['Day Name'].array,
+        'Week': calendar['Week'].array,
+        'Month': calendar['Month'].array,
+    })
+
+
+def source_columns(df):
+    """The order columns that came from the database (for exports and tables)."""
+    return [col for col in df.columns if col not in DERIVED_COLUMNS and col not in INTERNAL_COLUMNS]
@@ -0,0 +1,99 @@
+"""
+Bitmap Filter Engine
+====================
+Precomputes one packed bitmap per value of each filterable dimension when
+the data loads, then answers sidebar selections by OR-ing the bitmaps of the
+chosen values within a dimension and AND-ing across dimensions.
+
+The date range is a [lo, hi) row range on the time-sorted frame (see
+utils.time_index), so only the bytes of each bitmap covering that range are
+touched. The result is an array of row positions; applying it to the frame
+is the only copy made, however many filters are active.
+
+Usage:
+    index = FilterIndex(sales_data)
+    rows = index.select(lo, hi, {"Dispatch type": ["Delivery"]})
+    filtered = FilterIndex.apply(sales_data, lo, hi, rows)
+"""
+
+import uuid
+
+import numpy as np
+
+FILTER_COLUMNS = [
+    "Dispatch type",
+    "Sales channel type",
+    "Sales channel name",
+    "Payment method",
+    "Is preorder",
+    "Property name",
+]
+
+
+class FilterIndex:
+    """
+    Per-value bitmaps for a fixed frame.
+
+    `token` is unique to each build, so results cached under it can never be
+    applied to a different load of the data.
+    """
+
+    def __init__(self, df, columns=FILTER_COLUMNS):
+        self.n_rows = len(df)
+        self.token = uuid.uuid4().hex
+        self.categories = {}
+        self.codes = {}
+        self.bitmaps = {}
+        for col in columns:
+            if col not in df.columns:
+                continue
+            values = df[col].astype("category")
+            codes = values.cat.codes.to_numpy()
+            self.categories[col] = list(values.cat.categories)
+            self.codes[col] = codes
+            self.bitmaps[col] = {
+                value: np.packbits(codes == i)
+                for i, value in enumerate(self.categories[col])
+            }
+
+    def values_in(self, column, rows=slice(None)):
+        """Values of `column` that occur in `rows` (a slice or position array)."""
+        counts = np.bincount(
+            self.codes[column][rows] + 1, minlength=len(self.categories[column]) + 1
+        )
+        return [value for value, count in zip(self.categories[column], counts[1:]) if count]
+
+    def select(self, lo, hi, selections):
+        """
+        Row positions in [lo, hi) matching every dimension selection.
+
+        Args:
+            selections: column -> iterable of accepted values
+                        (empty / None = no filter on that column)
+
+        Returns:
+            np.ndarray of positions, or None when nothing filters (the
+            caller can then use the cheaper lo:hi slice).
+        """
+        active = {col: values for col, values in selections.items() if values}
+        if not active:
+            return None
+
+        byte_lo, byte_hi = lo // 8, (hi + 7) // 8
+        combined = None
+        for col, values in active.items():
+            col_mask = np.zeros(byte_hi - byte_lo, dtype=np.uint8)
+            for value in values:
+                bitmap = self.bitmaps[col].get(value)
+                if bitmap is not None:
+                    col_mask |= bitmap[byte_lo:byte_hi]
+            combined = col_mask if combined is None else combined & col_mask
+
+        offset = byte_lo * 8
+        bits = np.unpackbits(combined)[lo - offset:hi - offset]
+        return lo + np.flatnonzero(bits)
+
+    @staticmethod
+    def apply(df, lo, hi, rows):
+        """Frame view for a select() result."""
+        return df.iloc[lo:hi] if rows is None else df.iloc[rows]
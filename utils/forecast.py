@@ -0,0 +1,251 @@
+"""
+Revenue Forecast
+================
+Daily revenue and order forecasts for the next few weeks, for every
+dispatch type / sales channel type selection the sidebar can make.
+
+The model is additive Holt-Winters with a damped trend and a weekly season,
+run as a recursive filter: its state (level, trend, the last 7 seasonal
+terms and the one-step error variance) is all it needs to absorb another
+day. Every selection and measure is one column of the state arrays, so
+each day is a handful of vectorized NumPy operations whatever the number
+of selections, and a sync costs O(new days) - never a refit on the full
+history.
+
+Only closed days (before the restaurant-local today, and not past the
+last day with orders) are absorbed. The states of the last REWIND_DAYS days are kept, so when a
+refresh touches recent closed days (OrderStore.changed_since) they are
+re-absorbed from the state before them; older changes mean a refit.
+
+A Forecaster is immutable - updated() returns a new one - and save() /
+load() keep its state (rewind history included) on disk between server
+restarts.
+
+Usage:
+    today = restaurant_now().date()
+    forecaster = Forecaster.fit(daily_totals, today)
+    forecaster = forecaster.updated(daily_totals, today, since=store.changed_since)
+    forecaster.forecast(days=14, dispatch="Delivery")
+"""
+
+import json
+import logging
+import os
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils.period_compare import MEASURES as DAILY_MEASURES
+
+logger = logging.getLogger(__name__)
+
+MEASURES = ['Revenue', 'Orders']
+SEASON = 7
+ALPHA, BETA, GAMMA, PHI = 0.2, 0.01, 0.1, 0.95     # level, trend, season smoothing; trend damping
+ERROR_DECAY = 0.05                                  # weight of each new one-step error
+MIN_DAYS = 2 * SEASON                               # history needed to initialise a state
+REWIND_DAYS = 7
+INTERVAL_Z = 1.2816                                 # 80% prediction interval
+STATE_VERSION = 1
+
+_MEASURE_INDEX = [DAILY_MEASURES.index(m) for m in MEASURES]
+
+
+def _selections(pairs):
+    """Every (dispatch, channel) selection, None = all, with its pair columns."""
+    dispatches = sorted({d for d, _ in pairs if d is not None})
+    channels = sorted({c for _, c in pairs if c is not None})
+    selections = []
+    for dispatch in [None] + dispatches:
+        for channel in [None] + channels:
+            columns = [
+                i for i, (d, c) in enumerate(pairs)
+                if (dispatch is None or d == dispatch) and (channel is None or c == channel)
+            ]
+            if columns:
+                selections.append(((dispatch, channel), columns))
+    return selections
+
+
+def _daily_series(daily_totals, selections, first, last):
+    """
+    Measures per day for every selection.
+
+    Returns:
+        np.ndarray [days, selections * len(MEASURES)], first..last inclusive
+    """
+    lo = (pd.Timestamp(first) - daily_totals.first_day).days
+    hi = (pd.Timestamp(last) - daily_totals.first_day).days + 1
+    daily = np.diff(daily_totals.cumulative[lo:hi + 1], axis=0)[:, :, _MEASURE_INDEX]
+    membership = np.zeros((len(selections), len(daily_totals.pairs)))
+    for row, (_, columns) in enumerate(selections):
+        membership[row, columns] = 1
+    # [days, selections, measures] flattened so each column is one series
+    return np.einsum('dpm,sp->dsm', daily, membership).reshape(len(daily), -1)
+
+
+class Forecaster:
+    """Holt-Winters states for every selection and measure, as of the last absorbed day."""
+
+    def __init__(self, keys, through, level, trend, season, variance, history=()):
+        self.keys = keys                # [(dispatch, channel)], None = all
+        self.through = through          # pd.Timestamp of the last absorbed day (None = no state)
+        self.level = level              # float64 [series], series = keys x MEASURES
+        self.trend = trend
+        self.season = season            # [SEASON, series], row 0 = the day after `through`
+        self.variance = variance        # one-step error variance
+        self.history = list(history)    # [(day, level, trend, season, variance)], last REWIND_DAYS days
+
+    @classmethod
+    def empty(cls):
+        return cls([], None, None, None, None, None)
+
+    @classmethod
+    def fit(cls, daily_totals, today):
+        """States fitted over every closed day in daily_totals."""
+        last = cls._last_closed(daily_totals, today)
+        if last is None or (last - daily_totals.first_day).days + 1 < MIN_DAYS:
+            return cls.empty()
+        selections = _selections(daily_totals.pairs)
+        series = _daily_series(daily_totals, selections, daily_totals.first_day, last)
+
+        # Level from the first week, trend from the first two, season as the
+        # first week's deviations from its mean and the error variance from
+        # how far the second week strays from the first
+        first_week, second_week = series[:SEASON], series[SEASON:MIN_DAYS]
+        mean = first_week.mean(axis=0)
+        trend = (second_week.mean(axis=0) - mean) / SEASON
+        variance = ((second_week - first_week) ** 2).mean(axis=0)
+        start = daily_totals.first_day + timedelta(days=SEASON - 1)
+        state = cls(
+            [key for key, _ in selections], start, mean + (SEASON // 2) * trend, trend,
+            first_week - mean, variance,
+        )
+        return state._absorb(series[SEASON:], start + timedelta(days=1))
+
+    @staticmethod
+    def _last_closed(daily_totals, today):
+        if daily_totals.first_day is None:
+            return None
+        last = min(pd.Timestamp(today) - timedelta(days=1), daily_totals.last_day)
+        return last if last >= daily_totals.first_day else None
+
+    def _absorb(self, series, first_day):
+        """New Forecaster with the days of `series` (starting at first_day) absorbed."""
+        level, trend, season, variance = self.level, self.trend, self.season, self.variance
+        history = list(self.history)
+        for offset, actual in enumerate(series):
+            error = actual - (level + PHI * trend + season[0])
+            level = level + PHI * trend + ALPHA * error
+            trend = PHI * trend + BETA * error
+            season = np.vstack([season[1:], season[0] + GAMMA * error])
+            variance = (1 - ERROR_DECAY) * variance + ERROR_DECAY * error ** 2
+            history.append((first_day + timedelta(days=offset), level, trend, season, variance))
+        through = first_day + timedelta(days=len(series) - 1) if len(series) else self.through
+        return Forecaster(self.keys, through, level, trend, season, variance, history[-REWIND_DAYS:])
+
+    def updated(self, daily_totals, today, since=None):
+        """
+        New Forecaster with the closed days after `through` absorbed.
+
+        Args:
+            since: orders at or after this time may have changed (None = the
+                   whole history may have, so refit)
+        """
+        if self.through is None or since is None:
+            return Forecaster.fit(daily_totals, today)
+        selections = _selections(daily_totals.pairs)
+        if [key for key, _ in selections] != self.keys or daily_totals.first_day > self.through:
+            # A new dispatch type / channel (or history dropped past the state): refit
+            return Forecaster.fit(daily_totals, today)
+
+        state = self
+        changed_day = pd.Timestamp(since).normalize()
+        if changed_day <= self.through:
+            kept = [h for h in self.history if h[0] < changed_day]
+            if not kept or kept[-1][0] != changed_day - timedelta(days=1):
+                return Forecaster.fit(daily_totals, today)
+            day, level, trend, season, variance = kept[-1]
+            state = Forecaster(self.keys, day, level, trend, season, variance, kept)
+
+        last = self._last_closed(daily_totals, today)
+        if last is None or last <= state.through:
+            return state
+        first = state.through + timedelta(days=1)
+        return state._absorb(_daily_series(daily_totals, selections, first, last), first)
+
+    def forecast(self, days=14, dispatch=None, channel=None):
+        """
+        Daily forecast for the days after `through`.
+
+        Returns:
+            pd.DataFrame: Date, then '<measure>', '<measure> Low', '<measure> High'
+            for Revenue / Orders (empty when there is no state for the selection)
+        """
+        columns = ['Date'] + [f'{m}{s}' for m in MEASURES for s in ('', ' Low', ' High')]
+        if self.through is None or (dispatch, channel) not in self.keys:
+            return pd.DataFrame(columns=columns)
+        first = self.keys.index((dispatch, channel)) * len(MEASURES)
+        series = slice(first, first + len(MEASURES))
+        level, trend = self.level[series], self.trend[series]
+        season, variance = self.season[:, series], self.variance[series]
+
+        horizon = np.arange(1, days + 1)
+        damped = np.cumsum(PHI ** horizon)                          # sum of phi^1..phi^h
+        point = level + np.outer(damped, trend) + season[(horizon - 1) % SEASON]
+        # ETS(A,Ad,A) h-step variance: sigma^2 (1 + sum_{j<h} c_j^2)
+        c = ALPHA + BETA * damped[:-1] + GAMMA * (horizon[:-1] % SEASON == 0)
+        spread = np.sqrt(np.outer(1 + np.concatenate([[0], np.cumsum(c ** 2)]), variance))
+        out = pd.DataFrame({'Date': pd.date_range(self.through + timedelta(days=1), periods=days).date})
+        for i, measure in enumerate(MEASURES):
+            out[measure] = np.maximum(point[:, i], 0)
+            out[f'{measure} Low'] = np.maximum(point[:, i] - INTERVAL_Z * spread[:, i], 0)
+            out[f'{measure} High'] = np.maximum(point[:, i] + INTERVAL_Z * spread[:, i], 0)
+        return out
+
+    def save(self, path, source=""):
+        """Write the state and its rewind history to an .npz file; failures are logged."""
+        if self.through is None:
+            return
+        meta = {
+            "version": STATE_VERSION, "source": source, "through": self.through.isoformat(),
+            "keys": self.keys, "params": [ALPHA, BETA, GAMMA, PHI, ERROR_DECAY],
+            "history_days": [day.isoformat() for day, *_ in self.history],
+        }
+        arrays = {"level": self.level, "trend": self.trend, "season": self.season, "variance": self.variance}
+        for name, position in (("level", 1), ("trend", 2), ("season", 3), ("variance", 4)):
+            arrays[f"history_{name}"] = np.array([h[position] for h in self.history])
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp = f"{path}.tmp.npz"
+            np.savez(tmp, meta=json.dumps(meta), **arrays)
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.warning(f"Could not save forecast state: {e}")
+
+    @classmethod
+    def load(cls, path, source=""):
+        """The saved state, or an empty Forecaster if there is none usable."""
+        try:
+            with np.load(path, allow_pickle=False) as saved:
+                meta = json.loads(str(saved["meta"]))
+                if (
+                    meta.get("version") != STATE_VERSION or meta.get("source") != source
+                    or meta.get("params") != [ALPHA, BETA, GAMMA, PHI, ERROR_DECAY]
+                ):
+                    logger.info("Forecast state ignored (different version, source or parameters)")
+                    return cls.empty()
+                history = list(zip(
+                    [pd.Timestamp(day) for day in meta["history_days"]], saved["history_level"],
+                    saved["history_trend"], saved["history_season"], saved["history_variance"],
+                ))
+                return cls(
+                    [tuple(key) for key in meta["keys"]], pd.Timestamp(meta["through"]),
+                    saved["level"], saved["trend"], saved["season"], saved["variance"], history,
+                )
+        except FileNotFoundError:
+            return cls.empty()
+        except Exception as e:
+            logger.warning(f"Could not read forecast state: {e}")
+            return cls.empty()
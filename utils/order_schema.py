@@ -0,0 +1,90 @@
+"""
+Order Frame Schema
+==================
+Compact in-memory dtypes for the frames returned by load_data().
+
+    Dimension columns (dispatch, payment, channel, ...) -> category
+    Money columns                                       -> float32 when every
+                                                           value survives the
+                                                           round trip to the
+                                                           penny, else float64
+    Count columns                                       -> smallest int
+
+Supabase stores money as REAL (float32) already, so float32 loses nothing
+the database had. The cached frame is copied into every session, so the
+smaller it is the more sessions one server can hold.
+
+Usage:
+    sales_data = compact_frame(sales_data, ORDER_SCHEMA)
+    memory_report(sales_data)
+"""
+
+import numpy as np
+import pandas as pd
+
+
+ORDER_SCHEMA = {
+    "category": [
+        "Property name", "Dispatch type", "Payment method",
+        "Sales channel type", "Sales channel name", "Is preorder",
+    ],
+    "money": [
+        "Gross sales", "Tax on gross sales", "Tips", "Delivery charges",
+        "Service charges", "Additional charges", "Charges", "Revenue",
+        "Refunds", "Discounts",
+    ],
+    "integer": ["Change ID"],
+}
+
+ITEM_SCHEMA = {
+    "category": ["Item", "Category"],
+    "money": ["Price", "Revenue"],
+    "integer": ["Quantity"],
+}
+
+# Largest error allowed when downcasting money (half a penny)
+MONEY_TOLERANCE = 0.005
+
+
+def _downcast_money(series):
+    """float32 if no value moves by half a penny or more, else float64."""
+    as_float = pd.to_numeric(series, errors="coerce").astype("float64")
+    narrow = as_float.astype("float32")
+    drift = np.nanmax(np.abs(narrow.to_numpy(dtype="float64") - as_float.to_numpy()), initial=0.0)
+    return narrow if drift < MONEY_TOLERANCE else as_float
+
+
+def compact_frame(df, schema):
+    """
+    Return a copy of df with the schema's compact dtypes applied.
+
+    Columns missing from df are skipped, so the same schema works for
+    partial frames (e.g. an empty first load).
+    """
+    df = df.copy()
+    for col in schema.get("category", []):
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    for col in schema.get("money", []):
+        if col in df.columns:
+            df[col] = _downcast_money(df[col])
+    for col in schema.get("integer", []):
+        if col in df.columns and not df[col].isna().any():
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+
+def memory_report(df):
+    """
+    Bytes held by each column (deep, so strings are counted).
+
+    Returns:
+        pd.DataFrame: Column, Dtype, Bytes - largest first
+    """
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        "Column": usage.index,
+        "Dtype": [str(df[col].dtype) for col in usage.index],
+        "Bytes": usage.values,
+    })
+    return report.sort_values("Bytes", ascending=False).reset_index(drop=True)
@@ -0,0 +1,278 @@
+"""
+Incremental Order Store
+=======================
+Keeps the `orders` and `order_items` frames in memory between dashboard
+refreshes and only pulls the rows Supabase has gained since the last load.
+
+Watermarks:
+    orders       -> MAX(change_id) seen so far. change_id comes from a sequence
+                    and is re-stamped on every insert and update (see
+                    utils.data_version), so an order inserted late with an old
+                    order_time (a backfill, a delayed sync) or edited after the
+                    fact is still picked up; re-read orders replace the held
+                    row with the same order_id.
+    order_items  -> MAX(id) seen so far (SERIAL; item rows are never updated).
+
+Both keys are taken from their sequence when a row is written, not when its
+transaction commits, so a slow writer can commit ids below a watermark that
+has already moved past them. Each refresh therefore re-reads the last
+WATERMARK_OVERLAP ids below the watermark and keeps only the rows it does
+not already hold (same change_id / item id = same row).
+
+Frames are kept sorted ascending on 'Order time' (see utils.time_index), and
+with window_days set only that much recent history is queried and kept.
+
+After each refresh `changed_since` is the earliest order time the refresh
+touched (None after a full load), so derived structures such as
+utils.demand_cube can update just the days from there on.
+
+With a SnapshotCache attached, a cold start resumes from the local snapshot
+and its watermarks, and every refresh that brings in new rows re-saves it.
+
+Watermarks never see rows disappear. When the caller passes the database's
+rewrite version (see utils.data_version) and it has moved - rows were
+deleted or order items edited - the store drops what it holds (and any
+snapshot taken before the rewrite) and reloads in full.
+
+Usage:
+    store = OrderStore(snapshot=SnapshotCache("data/cache"))
+    sales_data, item_data = store.refresh(engine)   # full load the first time
+    sales_data, item_data = store.refresh(engine)   # only new rows afterwards
+"""
+
+import logging
+import threading
+from datetime import timedelta
+
+import pandas as pd
+from sqlalchemy import text
+
+from utils.calendar_dim import restaurant_now
+from utils.order_schema import ITEM_SCHEMA, ORDER_SCHEMA, compact_frame
+from utils.perf_profiler import stage
+from utils.time_index import sort_by_time
+
+logger = logging.getLogger(__name__)
+
+# Ids re-read below each watermark to catch transactions that commit late
+WATERMARK_OVERLAP = 1000
+
+ORDERS_QUERY = """
+SELECT
+    order_id as "Order ID",
+    change_id as "Change ID",
+    order_time as "Order time",
+    property_name as "Property name",
+    gross_sales as "Gross sales",
+    tax as "Tax on gross sales",
+    tips as "Tips",
+    delivery_charges as "Delivery charges",
+    service_charges as "Service charges",
+    additional_charges as "Additional charges",
+    charges as "Charges",
+    revenue as "Revenue",
+    refunds as "Refunds",
+    discounts as "Discounts",
+    dispatch_type as "Dispatch type",
+    payment_method as "Payment method",
+    sales_channel_type as "Sales channel type",
+    sales_channel_name as "Sales channel name",
+    is_preorder as "Is preorder"
+FROM orders
+{where}
+ORDER BY order_time
+"""
+
+ITEMS_QUERY = """
+SELECT
+    id as "Row ID",
+    order_id as "Order ID",
+    order_time as "Order time",
+    item_name as "Item",
+    category as "Category",
+    price as "Price",
+    quantity as "Quantity",
+    revenue as "Revenue"
+FROM order_items
+{where}
+ORDER BY id
+"""
+
+
+def _parse_order_time(df):
+    """Parse 'Order time' in place - only ever called on freshly fetched rows."""
+    with stage("parse_order_time"):
+        df['Order time'] = pd.to_datetime(df['Order time'], format='mixed', dayfirst=False)
+    return df
+
+
+class OrderStore:
+    """
+    Process-wide holder for the loaded order frames and their watermarks.
+
+    One instance is shared by every dashboard session, so refresh() is
+    guarded by a lock and never mutates a frame it has already handed out.
+    """
+
+    def __init__(self, snapshot=None, window_days=None):
+        self._lock = threading.Lock()
+        self.snapshot = snapshot
+        self.window_days = window_days
+        self.reset()
+        self.rewrite_version = None
+        # Only a cold start resumes from disk; after reset() the database is re-read
+        self._resume_from_snapshot = snapshot is not None
+
+    def reset(self):
+        """Forget everything; the next refresh() does a full database load."""
+        with self._lock:
+            self.sales_data = None
+            self.item_data = None
+            self.order_watermark = None
+            self.item_watermark = None
+            self.changed_since = None
+            self._resume_from_snapshot = False
+
+    def refresh(self, engine, rewrite_version=None):
+        """
+        Bring the frames up to date with the database.
+
+        Args:
+            rewrite_version: the database's current rewrite counter, or None
+                             if it is not tracked (watermarks only)
+
+        Returns:
+            tuple: (sales_data, item_data)
+        """
+        with self._lock:
+            if self._resume_from_snapshot:
+                self._resume_from_snapshot = False
+                with stage("load_snapshot"):
+                    self._load_snapshot(rewrite_version)
+
+            if rewrite_version is not None and self.rewrite_version not in (None, rewrite_version):
+                logger.info(f"Rows rewritten in the database (v{rewrite_version}); full reload")
+                self.sales_data = self.item_data = None
+                self.order_watermark = self.item_watermark = None
+            self.rewrite_version = rewrite_version
+
+            with engine.connect() as conn:
+                with stage("orders"):
+                    orders_changed = self._refresh_orders(conn)
+                with stage("items"):
+                    items_changed = self._refresh_items(conn)
+
+            if self.snapshot is not None and (orders_changed or items_changed):
+                with stage("save_snapshot"):
+                    self.snapshot.save(
+                        self.sales_data, self.item_data, self.order_watermark, self.item_watermark,
+                        rewrite_version=rewrite_version, overlap=WATERMARK_OVERLAP,
+                    )
+            return self.sales_data, self.item_data
+
+    def _window_start(self):
+        """Oldest order_time to keep, or None for the full history."""
+        if not self.window_days:
+            return None
+        return restaurant_now().normalize() - timedelta(days=int(self.window_days))
+
+    def _load_snapshot(self, rewrite_version):
+        loaded = self.snapshot.load()
+        if loaded is None:
+            return
+        sales_data, item_data, meta = loaded
+        if rewrite_version is not None and meta.get("rewrite_version") != rewrite_version:
+            logger.info("Snapshot predates a rewrite of the database rows; ignored")
+            return
+        # Segments are concatenated, so restore the compact dtypes and order
+        self.sales_data = sort_by_time(compact_frame(sales_data, ORDER_SCHEMA))
+        self.item_data = compact_frame(item_data, ITEM_SCHEMA)
+        self.order_watermark = meta.get("order_watermark")
+        self.item_watermark = meta.get("item_watermark")
+
+    def _refresh_orders(self, conn):
+        """Full or incremental orders load; True if the held rows changed."""
+        window_start = self._window_start()
+        if self.sales_data is None or self.order_watermark is None:
+            if window_start is None:
+                sales_data = pd.read_sql_query(text(ORDERS_QUERY.format(where="")), conn)
+            else:
+                sales_data = pd.read_sql_query(
+                    text(ORDERS_QUERY.format(where="WHERE order_time >= :window_start")),
+                    conn, params={"window_start": window_start.to_pydatetime()}
+                )
+            self.sales_data = compact_frame(_parse_order_time(sales_data), ORDER_SCHEMA)
+            self.changed_since = None
+            changed = True
+            logger.info(f"Full orders load: {len(self.sales_data):,} rows")
+        else:
+            since = int(self.order_watermark) - WATERMARK_OVERLAP
+            where, params = "WHERE change_id > :since", {"since": since}
+            if window_start is not None:
+                where += " AND order_time >= :window_start"
+                params["window_start"] = window_start.to_pydatetime()
+            new_rows = pd.read_sql_query(text(ORDERS_QUERY.format(where=where)), conn, params=params)
+            # The overlap mostly re-reads rows already held: a change id is
+            # one version of one order, so those are dropped unparsed
+            held = self.sales_data['Change ID']
+            new_rows = _parse_order_time(
+                new_rows[~new_rows['Change ID'].isin(held[held > since])].reset_index(drop=True)
+            )
+            # A re-read order replaces the row held for it, so inserts and
+            # updates alike never duplicate an order
+            replaced = self.sales_data['Order ID'].isin(new_rows['Order ID'])
+            kept = self.sales_data[~replaced]
+            if window_start is not None:
+                kept = kept[kept['Order time'] >= window_start]
+            # Days from the earliest new, updated or previously held time on
+            # are stale (an update may have moved an order between days)
+            touched = pd.concat([new_rows['Order time'], self.sales_data.loc[replaced, 'Order time']])
+            self.changed_since = touched.min() if touched.notna().any() else self.sales_data['Order time'].max()
+            changed = not new_rows.empty or len(kept) < len(self.sales_data)
+            if changed:
+                self.sales_data = compact_frame(
+                    pd.concat([kept, new_rows], ignore_index=True), ORDER_SCHEMA
+                )
+            logger.info(f"Incremental orders load: {len(new_rows):,} rows after change {since}")
+
+        self.sales_data = sort_by_time(self.sales_data)
+        if not self.sales_data.empty:
+            self.order_watermark = int(self.sales_data['Change ID'].max())
+        return changed
+
+    def _refresh_items(self, conn):
+        """Full or incremental items load; True if the held rows changed."""
+        window_start = self._window_start()
+        if self.item_data is None or self.item_watermark is None:
+            if window_start is None:
+                item_data = pd.read_sql_query(text(ITEMS_QUERY.format(where="")), conn)
+            else:
+                item_data = pd.read_sql_query(
+                    text(ITEMS_QUERY.format(where="WHERE order_time >= :window_start")),
+                    conn, params={"window_start": window_start.to_pydatetime()}
+                )
+            self.item_data = compact_frame(_parse_order_time(item_data), ITEM_SCHEMA)
+            changed = True
+        else:
+            since = int(self.item_watermark) - WATERMARK_OVERLAP
+            where, params = "WHERE id > :since", {"since": since}
+            if window_start is not None:
+                where += " AND order_time >= :window_start"
+                params["window_start"] = window_start.to_pydatetime()
+            new_rows = pd.read_sql_query(text(ITEMS_QUERY.format(where=where)), conn, params=params)
+            held = self.item_data['Row ID']
+            new_rows = _parse_order_time(
+                new_rows[~new_rows['Row ID'].isin(held[held > since])].reset_index(drop=True)
+            )
+            kept = self.item_data
+            if window_start is not None:
+                kept = kept[kept['Order time'] >= window_start]
+            changed = not new_rows.empty or len(kept) < len(self.item_data)
+            if changed:
+                self.item_data = compact_frame(
+                    pd.concat([kept, new_rows], ignore_index=True), ITEM_SCHEMA
+                )
+
+        if not self.item_data.empty:
+            self.item_watermark = self.item_data['Row ID'].max()
+        return changed
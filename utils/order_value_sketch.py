@@ -0,0 +1,177 @@
+"""
+Order Value Sketches
+====================
+Order-value percentiles and histograms for any date range and dispatch /
+channel selection, without sorting the orders.
+
+Each (day, dispatch type, sales channel type) keeps a quantile sketch of
+its orders' gross sales: counts over fixed logarithmic buckets, the
+bucketing DDSketch uses. Every value in a bucket is within
+RELATIVE_ACCURACY of the bucket's representative value, so any quantile
+read from the counts is too. Sketches merge by adding their counts, so a
+date range is the sum of a few hundred small count vectors, however many
+orders they hold.
+
+Values at or below zero (fully discounted / refunded orders) share one
+zero bucket; values above MAX_VALUE are counted in the top bucket.
+
+Like utils.demand_cube, updated() rebuilds only the days from the cutoff
+the order store re-read and returns a new object.
+
+Usage:
+    sketches = OrderValueSketches.build(sales_data)
+    sketch = sketches.merged(start_date, end_date, channel="Uber Eats")
+    quantiles(sketch, [0.5, 0.9, 0.99])
+    histogram(sketch, bins=30)
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.demand_cube import pair_codes
+
+RELATIVE_ACCURACY = 0.01
+MIN_VALUE = 0.01
+MAX_VALUE = 100_000
+
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = np.log(_GAMMA)
+_OFFSET = int(np.ceil(np.log(MIN_VALUE) / _LOG_GAMMA)) - 1
+N_BUCKETS = int(np.ceil(np.log(MAX_VALUE) / _LOG_GAMMA)) - _OFFSET + 1
+
+# Representative value of each bucket (bucket 0 is the zero bucket)
+BUCKET_VALUES = np.concatenate([
+    [0.0],
+    2 * _GAMMA ** np.arange(_OFFSET + 1, _OFFSET + N_BUCKETS) / (_GAMMA + 1),
+])
+
+
+def bucket_index(values):
+    """Sketch bucket for each value (NaN values are not counted: -1)."""
+    values = np.asarray(values, dtype=np.float64)
+    index = np.zeros(len(values), dtype=np.int64)
+    positive = values > 0
+    index[positive] = np.clip(
+        np.ceil(np.log(np.maximum(values[positive], MIN_VALUE)) / _LOG_GAMMA) - _OFFSET,
+        1, N_BUCKETS - 1,
+    )
+    index[np.isnan(values)] = -1
+    return index
+
+
+def quantiles(sketch, qs):
+    """
+    Quantiles of a sketch (nearest rank), NaN if it is empty.
+
+    Returns:
+        np.ndarray, one value per q
+    """
+    total = sketch.sum()
+    if total == 0:
+        return np.full(len(qs), np.nan)
+    cumulative = np.cumsum(sketch)
+    ranks = np.maximum(np.ceil(np.asarray(qs, dtype=np.float64) * total) - 1, 0)
+    return BUCKET_VALUES[np.searchsorted(cumulative, ranks, side='right')]
+
+
+def sketch_mean(sketch):
+    """Approximate mean from the bucket values."""
+    total = sketch.sum()
+    return float(sketch @ BUCKET_VALUES / total) if total else np.nan
+
+
+def histogram(sketch, bins=30, upper_quantile=0.99):
+    """
+    Equal-width histogram of a sketch from 0 to its upper_quantile (the
+    long tail is folded into the last bar).
+
+    Returns:
+        pd.DataFrame: From, To, Orders
+    """
+    upper = quantiles(sketch, [upper_quantile])[0]
+    if np.isnan(upper) or upper <= 0:
+        return pd.DataFrame(columns=['From', 'To', 'Orders'])
+    edges = np.linspace(0, upper, bins + 1)
+    positions = np.clip(np.searchsorted(edges, BUCKET_VALUES, side='right') - 1, 0, bins - 1)
+    counts = np.bincount(positions, weights=sketch, minlength=bins)
+    return pd.DataFrame({'From': edges[:-1], 'To': edges[1:], 'Orders': counts.astype(np.int64)})
+
+
+class OrderValueSketches:
+    """One gross-sales sketch per day and (dispatch type, sales channel type) pair."""
+
+    def __init__(self, first_day, pairs, counts):
+        self.first_day = first_day      # pd.Timestamp of row 0 (None when empty)
+        self.pairs = pairs              # [(dispatch type, sales channel type)], None = missing
+        self.counts = counts            # int32 [days, pairs, N_BUCKETS]
+
+    @classmethod
+    def build(cls, sales_data):
+        """Sketches for every order in sales_data."""
+        return cls(None, [], np.zeros((0, 0, N_BUCKETS), dtype=np.int32)).updated(sales_data)
+
+    def updated(self, sales_data, since=None):
+        """
+        New sketches with the days from `since` onwards rebuilt from sales_data.
+
+        Args:
+            since: orders at or after this time may have changed (None, or
+                   no sketches yet, = rebuild everything)
+        """
+        times = sales_data['Order time']
+        cut = None if since is None or self.first_day is None else pd.Timestamp(since).normalize()
+        if cut is not None and cut <= self.first_day:
+            cut = None
+
+        orders = sales_data[times.notna() if cut is None else times >= cut]
+        if cut is None:
+            if orders.empty:
+                return OrderValueSketches(None, [], np.zeros((0, 0, N_BUCKETS), dtype=np.int32))
+            first_day, pairs, kept = orders['Order time'].min().normalize(), [], None
+        else:
+            first_day, pairs = self.first_day, list(self.pairs)
+            kept = self.counts[:(cut - first_day).days]
+
+        codes, pairs = pair_codes(orders, pairs)
+
+        days = (orders['Order time'].dt.normalize() - first_day).dt.days.to_numpy()
+        n_days = max(int(days.max()) + 1 if len(days) else 0, 0 if kept is None else (cut - first_day).days)
+        counts = np.zeros((n_days, len(pairs), N_BUCKETS), dtype=np.int32)
+        if kept is not None:
+            counts[:len(kept), :kept.shape[1]] = kept
+        buckets = bucket_index(orders['Gross sales'].to_numpy(dtype=np.float64, na_value=np.nan))
+        counted = buckets >= 0
+        np.add.at(counts, (days[counted], codes[counted], buckets[counted]), 1)
+        return OrderValueSketches(first_day, pairs, counts)
+
+    def merged(self, start_date, end_date, dispatch=None, channel=None, by=None):
+        """
+        The merged sketch for a date range and selection.
+
+        Args:
+            by: None for one sketch, or 'Dispatch type' / 'Sales channel type'
+                for one sketch per value of that dimension
+
+        Returns:
+            np.ndarray [N_BUCKETS], or dict value -> np.ndarray when `by` is set
+        """
+        columns = [
+            i for i, (d, c) in enumerate(self.pairs)
+            if (dispatch is None or d == dispatch) and (channel is None or c == channel)
+        ]
+        empty = np.zeros(N_BUCKETS, dtype=np.int64)
+        if self.first_day is None or not columns:
+            return empty if by is None else {}
+        lo = max((pd.Timestamp(start_date) - self.first_day).days, 0)
+        hi = min((pd.Timestamp(end_date) - self.first_day).days + 1, len(self.counts))
+        per_pair = self.counts[lo:max(hi, lo), columns].sum(axis=0, dtype=np.int64)
+        if by is None:
+            return per_pair.sum(axis=0)
+
+        position = 0 if by == 'Dispatch type' else 1
+        groups = {}
+        for column, sketch in zip(columns, per_pair):
+            value = self.pairs[column][position]
+            if value is not None and sketch.any():
+                groups[value] = groups.get(value, empty) + sketch
+        return groups
@@ -0,0 +1,105 @@
+"""
+Intraday Pacing
+===============
+How today is trading against a typical day for the same weekday.
+
+Typical curves are the p10 / median / p90 of cumulative revenue and orders
+at every 15-minute slot, taken over the last HISTORY_WEEKS closed days on
+the same weekday that traded at all. They come from the per-day slot
+totals in utils.demand_cube, so building them never touches raw orders,
+and they only need rebuilding when a day closes (DemandCube.closed_version).
+
+Today's curve is one cube row, so the tile is cheap to redraw every minute.
+"Today" and "now" must be restaurant-local (utils.calendar_dim.restaurant_now),
+the clock the order times are recorded on.
+
+Usage:
+    now = restaurant_now()
+    curves = typical_curves(cube, now.date())
+    today = today_curve(cube, now.date())
+    pace = pacing_summary(curves, today, now)
+"""
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils.demand_cube import MEASURES, SLOT_MINUTES, SLOTS
+
+HISTORY_WEEKS = 12
+QUANTILES = {'P10': 0.1, 'Median': 0.5, 'P90': 0.9}
+SLOT_LABELS = [f"{m // 60:02d}:{m % 60:02d}" for m in range(0, 24 * 60, SLOT_MINUTES)]
+
+_REVENUE, _ORDERS = MEASURES.index('Revenue'), MEASURES.index('Orders')
+
+
+def typical_curves(cube, today, dispatch=None, channel=None, weeks=HISTORY_WEEKS):
+    """
+    Cumulative quantile curves for today's weekday, from closed days only.
+
+    Returns:
+        pd.DataFrame: Slot, then '<measure> <quantile>' for Revenue / Orders
+        and P10 / Median / P90 (empty if no comparable day traded);
+        attrs['days'] is the number of days behind the curves
+    """
+    history = [today - timedelta(weeks=w) for w in range(1, weeks + 1)]
+    slots = cube.day_slots(history, dispatch, channel)
+    slots = slots[slots[:, :, _ORDERS].sum(axis=1) > 0]
+    curves = pd.DataFrame({'Slot': SLOT_LABELS})
+    curves.attrs['days'] = len(slots)
+    if len(slots) == 0:
+        return curves.iloc[:0]
+
+    cumulative = slots.cumsum(axis=1)
+    for measure, index in (('Revenue', _REVENUE), ('Orders', _ORDERS)):
+        values = np.quantile(cumulative[:, :, index], list(QUANTILES.values()), axis=0)
+        for name, row in zip(QUANTILES, values):
+            curves[f'{measure} {name}'] = row
+    return curves
+
+
+def today_curve(cube, today, dispatch=None, channel=None):
+    """
+    Today's cumulative revenue and orders per slot.
+
+    Returns:
+        pd.DataFrame: Slot, Revenue, Orders
+    """
+    cumulative = cube.day_slots([today], dispatch, channel)[0].cumsum(axis=0)
+    return pd.DataFrame({
+        'Slot': SLOT_LABELS,
+        'Revenue': cumulative[:, _REVENUE],
+        'Orders': cumulative[:, _ORDERS],
+    })
+
+
+def current_slot(now):
+    """Index of the slot `now` falls in."""
+    return min((now.hour * 60 + now.minute) // SLOT_MINUTES, SLOTS - 1)
+
+
+def pacing_summary(curves, today, now):
+    """
+    Today so far against the typical day at the same time.
+
+    Returns:
+        dict: measure -> {'actual', 'median', 'p10', 'p90', 'pace'} where
+        pace is actual / median - 1 (None without history or a zero median)
+    """
+    slot = current_slot(now)
+    summary = {}
+    for measure in ('Revenue', 'Orders'):
+        actual = float(today[measure].iloc[slot])
+        if curves.empty:
+            summary[measure] = {'actual': actual, 'median': None, 'p10': None, 'p90': None, 'pace': None}
+            continue
+        median = float(curves[f'{measure} Median'].iloc[slot])
+        summary[measure] = {
+            'actual': actual,
+            'median': median,
+            'p10': float(curves[f'{measure} P10'].iloc[slot]),
+            'p90': float(curves[f'{measure} P90'].iloc[slot]),
+            'pace': actual / median - 1 if median else None,
+        }
+    return summary
@@ -0,0 +1,243 @@
+"""
+Performance Profiler
+====================
+Wall-clock timings for the dashboard's hot path, recorded per run.
+
+A run is one script execution (a page rerun, a fragment rerun or a
+background dataset rebuild). While a run is active in the current thread:
+
+    stage(name)            -> times a named block (nested stages get 'outer/inner' names)
+    cache_event(name, hit) -> counts a cache hit or miss
+    chart(name, fig)       -> times drawing a figure and, for detailed runs,
+                              records its JSON payload in bytes
+
+With no active run these are no-ops, so library code (order_store,
+rollup_cache, ...) can be instrumented unconditionally.
+
+Finished runs are kept in a bounded in-memory history (for the sidebar
+panel) and written as one JSON line each to a size-rotated log file.
+
+Usage:
+    profiler = Profiler(log_path="data/cache/perf.log")
+    with profiler.run("page", detailed=is_admin):
+        with stage("load_data"):
+            ...
+    profiler.stage_summary()
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class RunProfile:
+    """Timings, cache counters and chart payloads of one run."""
+
+    def __init__(self, name, detailed=False):
+        self.name = name
+        self.detailed = detailed
+        self.started_at = datetime.now()
+        self.total_seconds = None
+        self.stages = []            # (name, seconds), in completion order
+        self.caches = {}            # name -> [hits, misses]
+        self.payloads = {}          # chart name -> JSON bytes
+        self._path = []
+        self._start = time.perf_counter()
+
+    def as_record(self):
+        stages = {}
+        for name, seconds in self.stages:
+            stages[name] = stages.get(name, 0) + seconds
+        return {
+            "run": self.name,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "total_ms": round(self.total_seconds * 1000, 1),
+            "stages": {name: round(seconds * 1000, 1) for name, seconds in stages.items()},
+            "caches": {name: {"hits": h, "misses": m} for name, (h, m) in self.caches.items()},
+            "payload_bytes": dict(self.payloads),
+        }
+
+
+def active_run():
+    """The RunProfile active in this thread, or None."""
+    return getattr(_local, "run", None)
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as a stage of the active run."""
+    run = active_run()
+    if run is None:
+        yield
+        return
+    run._path.append(name)
+    full_name = "/".join(run._path)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        run.stages.append((full_name, time.perf_counter() - start))
+        run._path.pop()
+
+
+def cache_event(name, hit):
+    """Count one hit (or miss) of the named cache for the active run."""
+    run = active_run()
+    if run is not None:
+        counts = run.caches.setdefault(name, [0, 0])
+        counts[0 if hit else 1] += 1
+
+
+@contextmanager
+def cache_call(name):
+    """
+    Count a call to a Streamlit-cached function as a hit unless its body
+    reported cache_miss(name) while the block ran.
+    """
+    run = active_run()
+    if run is None:
+        yield
+        return
+    misses = run.caches.get(name, [0, 0])[1]
+    yield
+    if run.caches.get(name, [0, 0])[1] == misses:
+        cache_event(name, True)
+
+
+def cache_miss(name):
+    """Called from inside a cached function body, which only runs on a miss."""
+    cache_event(name, False)
+
+
+@contextmanager
+def chart(name, fig):
+    """Time drawing fig; detailed runs also record its serialized size."""
+    run = active_run()
+    if run is not None and run.detailed:
+        run.payloads[name] = run.payloads.get(name, 0) + len(fig.to_json())
+    with stage(f"chart:{name}"):
+        yield
+
+
+class Profiler:
+    """
+    Starts runs and keeps the finished ones.
+
+    Args:
+        history: finished runs kept in memory
+        log_path: rolling JSON-lines log of every run (None = no log)
+        max_log_bytes, log_backups: log rotation settings
+    """
+
+    def __init__(self, history=200, log_path=None, max_log_bytes=1024 * 1024, log_backups=3):
+        self._runs = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._log = None
+        if log_path is not None:
+            os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                log_path, maxBytes=max_log_bytes, backupCount=log_backups, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._log = logging.getLogger(f"{__name__}.runs.{id(self)}")
+            self._log.propagate = False
+            self._log.setLevel(logging.INFO)
+            self._log.addHandler(handler)
+
+    def start(self, name, detailed=False):
+        """
+        Begin a run in this thread, replacing any run left unfinished (a
+        script stopped by st.stop() / st.rerun() or an error never reaches
+        finish(); prefer run() where the code can be wrapped).
+        """
+        run = RunProfile(name, detailed)
+        _local.run = run
+        return run
+
+    def finish(self, run):
+        """End run, record it and log it."""
+        if active_run() is run:
+            _local.run = None
+        run.total_seconds = time.perf_counter() - run._start
+        with self._lock:
+            self._runs.append(run)
+        if self._log is not None:
+            try:
+                self._log.info(json.dumps(run.as_record()))
+            except Exception as e:
+                logger.warning(f"Could not write profile log: {e}")
+        return run
+
+    @contextmanager
+    def run(self, name, detailed=False):
+        """A run for the enclosed block; a run already active in this thread resumes afterwards."""
+        outer = active_run()
+        run = self.start(name, detailed)
+        try:
+            yield run
+        finally:
+            # Also on st.stop() / st.rerun(), which raise through the block
+            try:
+                self.finish(run)
+            finally:
+                _local.run = outer
+
+    @contextmanager
+    def section(self, name, detailed=False, standalone=False):
+        """
+        A stage of the active run, or a run of its own when there is none.
+        Usable as a decorator.
+
+        Args:
+            standalone: always a run of its own (an st.fragment rerunning on
+                        its own); a run an interrupted script left on this
+                        thread is dropped rather than timed into
+        """
+        if standalone:
+            _local.run = None
+        if active_run() is not None:
+            with stage(name):
+                yield
+        else:
+            with self.run(f"fragment:{name}", detailed), stage(name):
+                yield
+
+    def runs(self, name=None):
+        """Finished runs, oldest first (only those called name, if given)."""
+        with self._lock:
+            runs = list(self._runs)
+        return [run for run in runs if name is None or run.name == name]
+
+    def stage_summary(self, name=None):
+        """
+        Per-stage timing across the kept runs.
+
+        Returns:
+            pd.DataFrame: Stage, Runs, Mean ms, P95 ms, Max ms (slowest mean first)
+        """
+        rows = [
+            (stage_name, seconds * 1000)
+            for run in self.runs(name) for stage_name, seconds in run.stages
+        ]
+        if not rows:
+            return pd.DataFrame(columns=["Stage", "Runs", "Mean ms", "P95 ms", "Max ms"])
+        timings = pd.DataFrame(rows, columns=["Stage", "ms"]).groupby("Stage")["ms"]
+        summary = pd.DataFrame({
+            "Runs": timings.size(),
+            "Mean ms": timings.mean(),
+            "P95 ms": timings.quantile(0.95),
+            "Max ms": timings.max(),
+        }).round(1)
+        return summary.sort_values("Mean ms", ascending=False).reset_index()
@@ -0,0 +1,185 @@
+"""
+Period Comparison
+=================
+KPI totals for any date range and dispatch / channel selection, and the
+same totals for an aligned prior range, from a small daily table built once
+per data load - never a rescan of the raw orders.
+
+DailyTotals holds running totals per calendar day and (dispatch type, sales
+channel type) pair, so a range total is two row lookups whatever its length.
+
+Comparison bases (selected range -> prior range):
+    Previous period         -> the same number of days just before it (a
+                               7-day range gives week-over-week)
+    Previous month          -> shifted back one month (whole months map to whole months)
+    Same period last year   -> same calendar dates a year earlier
+    Same weekdays last year -> shifted back 364 days, so Mondays line up with Mondays
+
+A prior range that reaches before the loaded history has no comparison
+(None), rather than a misleading partial one; comparison_range() then falls
+back to the previous period when that one is loaded.
+
+Usage:
+    totals = DailyTotals.build(sales_data)
+    current = totals.kpis(start_date, end_date, dispatch="Delivery")
+    basis, prior_start, prior_end = comparison_range(totals, start_date, end_date, "Previous month")
+    prior = totals.kpis(prior_start, prior_end, dispatch="Delivery")
+    change(current["Revenue"], prior and prior["Revenue"])
+"""
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+MEASURES = ['Revenue', 'Gross sales', 'Gross count', 'Orders', 'Tax on gross sales', 'Delivery charges']
+
+COMPARISONS = [
+    'Previous period',
+    'Previous month',
+    'Same period last year',
+    'Same weekdays last year',
+]
+
+
+def _is_whole_months(start, end):
+    return start.day == 1 and (end + timedelta(days=1)).day == 1
+
+
+def prior_range(start_date, end_date, basis):
+    """
+    The range a selection is compared against.
+
+    Returns:
+        tuple: (start, end) dates, inclusive
+    """
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    if basis == 'Previous period':
+        length = end - start + timedelta(days=1)
+        prior = start - length, start - timedelta(days=1)
+    elif basis == 'Previous month':
+        if _is_whole_months(start, end):
+            months = (end.year - start.year) * 12 + end.month - start.month + 1
+            prior = start - pd.DateOffset(months=months), start - timedelta(days=1)
+        else:
+            prior = start - pd.DateOffset(months=1), end - pd.DateOffset(months=1)
+    elif basis == 'Same period last year':
+        prior = start - pd.DateOffset(years=1), end - pd.DateOffset(years=1)
+    elif basis == 'Same weekdays last year':
+        prior = start - timedelta(days=364), end - timedelta(days=364)
+    else:
+        raise ValueError(f"Unknown comparison: {basis}")
+    return prior[0].date(), prior[1].date()
+
+
+def comparison_range(totals, start_date, end_date, basis):
+    """
+    The chosen prior range, or the previous period if only that one is loaded.
+
+    Returns:
+        tuple: (basis, start, end) actually compared against, or None if
+        neither range lies inside the history
+    """
+    for candidate in dict.fromkeys([basis, 'Previous period']):
+        prior_start, prior_end = prior_range(start_date, end_date, candidate)
+        if totals.covers(prior_start, prior_end):
+            return candidate, prior_start, prior_end
+    return None
+
+
+def change(current, prior):
+    """Relative change, or None when there is nothing to compare against."""
+    if prior is None or current is None or not prior or pd.isna(prior) or pd.isna(current):
+        return None
+    return current / prior - 1
+
+
+class DailyTotals:
+    """Running KPI totals per day and (dispatch type, sales channel type) pair."""
+
+    def __init__(self, first_day, pairs, cumulative):
+        self.first_day = first_day      # pd.Timestamp of row 1 (None when empty)
+        self.pairs = pairs              # [(dispatch type, sales channel type)], None = missing
+        self.cumulative = cumulative    # float64 [days + 1, pairs, MEASURES], row 0 = zeros
+
+    @classmethod
+    def build(cls, sales_data):
+        """One groupby over the orders (rows without an order time are left out)."""
+        df = sales_data[sales_data['Order time'].notna()]
+        if df.empty:
+            return cls(None, [], np.zeros((1, 0, len(MEASURES))))
+
+        days = df['Order time'].dt.normalize()
+        first_day = days.min()
+        keys = pd.DataFrame({
+            'Day': (days - first_day).dt.days.to_numpy(),
+            'Dispatch type': df['Dispatch type'].astype(object).to_numpy(),
+            'Sales channel type': df['Sales channel type'].astype(object).to_numpy(),
+        })
+        values = pd.DataFrame({
+            'Revenue': df['Revenue'].to_numpy(dtype=np.float64, na_value=0),
+            'Gross sales': df['Gross sales'].to_numpy(dtype=np.float64, na_value=0),
+            'Gross count': df['Gross sales'].notna().to_numpy(dtype=np.float64),
+            'Orders': np.ones(len(df)),
+            'Tax on gross sales': df['Tax on gross sales'].to_numpy(dtype=np.float64, na_value=0),
+            'Delivery charges': df['Delivery charges'].to_numpy(dtype=np.float64, na_value=0),
+        })
+        grouped = values.groupby([keys[col] for col in keys], dropna=False, sort=False).sum()
+
+        pair_index = grouped.index.droplevel('Day').unique()
+        pairs = [tuple(None if pd.isna(v) else v for v in pair) for pair in pair_index]
+        n_days = int(keys['Day'].max()) + 1
+        daily = np.zeros((n_days + 1, len(pairs), len(MEASURES)))
+        day_rows = grouped.index.get_level_values('Day').to_numpy() + 1
+        pair_cols = pair_index.get_indexer(grouped.index.droplevel('Day'))
+        daily[day_rows, pair_cols] = grouped[MEASURES].to_numpy()
+        return cls(first_day, pairs, daily.cumsum(axis=0))
+
+    @property
+    def last_day(self):
+        return None if self.first_day is None else self.first_day + timedelta(days=len(self.cumulative) - 2)
+
+    def covers(self, start_date, end_date):
+        """True if start..end lies inside the loaded history."""
+        return (
+            self.first_day is not None
+            and pd.Timestamp(start_date) >= self.first_day
+            and pd.Timestamp(end_date) <= self.last_day
+        )
+
+    def totals(self, start_date, end_date, dispatch=None, channel=None):
+        """
+        Summed MEASURES for start..end inclusive (clipped to the history).
+
+        Returns:
+            dict: measure -> total
+        """
+        columns = [
+            i for i, (d, c) in enumerate(self.pairs)
+            if (dispatch is None or d == dispatch) and (channel is None or c == channel)
+        ]
+        if self.first_day is None or not columns:
+            return dict.fromkeys(MEASURES, 0.0)
+        last_row = len(self.cumulative) - 1
+        lo = min(max((pd.Timestamp(start_date) - self.first_day).days, 0), last_row)
+        hi = min(max((pd.Timestamp(end_date) - self.first_day).days + 1, 0), last_row)
+        sums = (self.cumulative[hi, columns] - self.cumulative[lo, columns]).sum(axis=0)
+        return dict(zip(MEASURES, sums.tolist()))
+
+    def kpis(self, start_date, end_date, dispatch=None, channel=None):
+        """
+        The top-row KPIs for a range, or None if it is not inside the history.
+
+        Returns:
+            dict: Revenue, Average Order, Orders, Tax, Delivery Charges
+        """
+        if not self.covers(start_date, end_date):
+            return None
+        t = self.totals(start_date, end_date, dispatch, channel)
+        return {
+            'Revenue': t['Revenue'],
+            'Average Order': t['Gross sales'] / t['Gross count'] if t['Gross count'] else np.nan,
+            'Orders': t['Orders'],
+            'Tax': t['Tax on gross sales'],
+            'Delivery Charges': t['Delivery charges'],
+        }
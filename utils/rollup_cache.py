@@ -0,0 +1,169 @@
+"""
+Rollup Cache
+============
+Process-wide memo of section rollup bundles, shared by every session.
+
+Entries are keyed by (data version, normalized filter hash), so identical
+selections made by different viewers - or by the same viewer across
+reruns - are aggregated once per data version. A new data version simply
+stops matching the old keys, which then age out.
+
+Eviction is least-recently-used, bounded both by entry count and by the
+approximate bytes of the cached frames and of the figures later memoized
+on them (RollupBundle.memo). Concurrent requests for the same key wait for
+the first build instead of repeating it.
+
+Usage:
+    cache = RollupCache(max_entries=128, max_bytes=64 * 1024 * 1024)
+    key = cache.key(data_version, start_date=start, end_date=end, dispatch="Delivery")
+    rollups = cache.get_or_build(key, lambda: build_rollups(filtered_sales))
+"""
+
+import hashlib
+import logging
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils.perf_profiler import cache_event
+
+logger = logging.getLogger(__name__)
+
+
+def filter_hash(**filters):
+    """
+    Stable hash of a filter selection.
+
+    'All', None and empty selections are treated alike, and multi-value
+    selections are order-insensitive.
+    """
+    normalized = []
+    for name in sorted(filters):
+        value = filters[name]
+        if value in (None, 'All', (), []):
+            value = None
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            value = sorted(str(v) for v in value)
+        else:
+            value = str(value)
+        normalized.append((name, value))
+    return hashlib.sha1(repr(normalized).encode("utf-8")).hexdigest()
+
+
+def value_bytes(value):
+    """Approximate in-memory size of a frame or a memoized figure."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if hasattr(value, "to_json"):
+        # Plotly figures: their serialized size tracks the data they hold
+        return len(value.to_json())
+    return sys.getsizeof(value)
+
+
+def bundle_bytes(bundle):
+    """Approximate in-memory size of a RollupBundle, memoized values included."""
+    return sum(value_bytes(bundle[name]) for name in bundle.names) + sum(
+        value_bytes(value) for value in bundle.derived.values()
+    )
+
+
+class RollupCache:
+    """
+    Thread-safe LRU of rollup bundles.
+
+    Args:
+        max_entries: most bundles kept
+        max_bytes: most bytes kept (the newest entry is always kept)
+    """
+
+    def __init__(self, max_entries=128, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> (bundle, bytes)
+        self._building = {}             # key -> Lock held while building
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(data_version, **filters):
+        return data_version, filter_hash(**filters)
+
+    def get_or_build(self, key, build):
+        """Cached bundle for key, or build() it once and cache it."""
+        with self._lock:
+            bundle = self._lookup(key)
+            if bundle is not None:
+                cache_event("rollup_cache", True)
+                return bundle
+            key_lock = self._building.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Someone else may have built it while we waited
+            with self._lock:
+                bundle = self._lookup(key)
+                if bundle is not None:
+                    cache_event("rollup_cache", True)
+                    return bundle
+                self.misses += 1
+            cache_event("rollup_cache", False)
+            try:
+                bundle = build()
+                self._store(key, bundle)
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+        return bundle
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def _store(self, key, bundle):
+        size = bundle_bytes(bundle)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self._entries[key] = (bundle, size)
+            self.total_bytes += size
+            self._evict()
+        bundle.on_memo = lambda value: self._grow(key, bundle, value_bytes(value))
+
+    def _grow(self, key, bundle, size):
+        """Count a value memoized on a cached bundle after it was stored."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not bundle:
+                return
+            self._entries[key] = (bundle, entry[1] + size)
+            self.total_bytes += size
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes
+        ):
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted
@@ -0,0 +1,165 @@
+"""
+Rollup Engine
+=============
+Builds every aggregate the dashboard sections draw from in one pass over the
+filtered orders.
+
+The raw rows are grouped exactly once, into a small cube keyed by
+(day, hour, meal period, day part, dispatch type, sales channel name); hour,
+meal period, day part (and day) come from the columns utils.derived_columns
+adds at load. Each
+section's rollup is then a regroup of that cube, which has at most
+days x 24 x dimensions rows however many orders the range holds.
+
+Rollups (name -> columns), same shape as utils.sql_rollups:
+    daily     -> Date, Revenue, Gross Sales, Orders
+    week      -> Week ('YYYY-MM-DD/YYYY-MM-DD', Monday-Sunday), Revenue, Orders
+    month     -> Month ('YYYY-MM'), Revenue, Orders
+    weekday   -> Day, Total Revenue, Orders, Avg Order Value
+    hour      -> Hour, Revenue, Orders
+    meal      -> Meal Period, Revenue, Orders
+    day_part  -> Day Part, Revenue, Orders
+    dispatch  -> Dispatch type, Gross sales
+    channel   -> Sales channel name, Gross sales
+
+Usage:
+    rollups = build_rollups(filtered_sales)
+    rollups["daily"]
+"""
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils.time_buckets import DAY_PART_FALLBACK, DAY_PARTS, bucket_hours
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def week_label(week_start):
+    """Monday dates -> 'YYYY-MM-DD/YYYY-MM-DD' (matches pandas Period('W') strings)."""
+    week_start = pd.to_datetime(pd.Series(week_start))
+    return (
+        week_start.dt.strftime('%Y-%m-%d') + "/" +
+        (week_start + timedelta(days=6)).dt.strftime('%Y-%m-%d')
+    )
+
+
+class RollupBundle:
+    """
+    Named rollup frames for one filter selection.
+
+    memo() keeps things derived from the frames (e.g. a section's figure)
+    on the bundle, so they live and die with it in the rollup cache, which
+    sets on_memo to count them against its byte budget.
+    """
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.derived = {}
+        self.on_memo = None         # called with each newly memoized value
+
+    def __getitem__(self, name):
+        return self.frames[name]
+
+    def __contains__(self, name):
+        return name in self.frames
+
+    @property
+    def names(self):
+        return list(self.frames)
+
+    def memo(self, name, build):
+        """build() once per bundle, then the stored result."""
+        if name not in self.derived:
+            self.derived[name] = build()
+            if self.on_memo is not None:
+                self.on_memo(self.derived[name])
+        return self.derived[name]
+
+
+def _cube(df):
+    """The single pass over raw rows: sums and counts per day/hour/dimension."""
+    times = df['Order time']
+    hours = df['Hour'] if 'Hour' in df.columns else times.dt.hour
+    base = pd.DataFrame({
+        'Day': df['Day'] if 'Day' in df.columns else times.dt.normalize(),
+        'Hour': hours,
+        'Meal Period': df['Meal Period'] if 'Meal Period' in df.columns else bucket_hours(hours),
+        'Day Part': (
+            df['Day Part'] if 'Day Part' in df.columns
+            else bucket_hours(hours, DAY_PARTS, DAY_PART_FALLBACK)
+        ),
+        'Dispatch type': df['Dispatch type'],
+        'Sales channel name': df['Sales channel name'],
+        'Revenue': df['Revenue'].astype('float64'),
+        'Gross sales': df['Gross sales'].astype('float64'),
+        'Orders': df['Order ID'].notna().astype('int64'),
+        'Gross count': df['Gross sales'].notna().astype('int64'),
+    })
+    keys = ['Day', 'Hour', 'Meal Period', 'Day Part', 'Dispatch type', 'Sales channel name']
+    return base.groupby(keys, observed=True, dropna=False, sort=False).sum().reset_index()
+
+
+def build_rollups(df):
+    """
+    Aggregate a filtered orders frame into every section rollup.
+
+    Returns:
+        RollupBundle
+    """
+    cube = _cube(df)
+    measures = ['Revenue', 'Gross sales', 'Orders', 'Gross count']
+
+    days = cube.groupby('Day', sort=True)[measures].sum().reset_index()
+    day_ts = days['Day']
+
+    daily = pd.DataFrame({
+        'Date': day_ts.dt.date,
+        'Revenue': days['Revenue'],
+        'Gross Sales': days['Gross sales'],
+        'Orders': days['Orders'],
+    })
+
+    week_start = day_ts - pd.to_timedelta(day_ts.dt.weekday, unit='D')
+    week = days.groupby(week_start.to_numpy(), sort=True)[['Revenue', 'Orders']].sum()
+    week = pd.DataFrame({
+        'Week': week_label(week.index).to_numpy(),
+        'Revenue': week['Revenue'].to_numpy(),
+        'Orders': week['Orders'].to_numpy(),
+    })
+
+    month = days.groupby(day_ts.dt.strftime('%Y-%m').to_numpy(), sort=True)[['Revenue', 'Orders']].sum()
+    month = month.rename_axis('Month').reset_index()
+
+    weekday = days.groupby(day_ts.dt.weekday.to_numpy(), sort=True)[measures].sum()
+    weekday = pd.DataFrame({
+        'Day': [DAY_NAMES[d] for d in weekday.index],
+        'Total Revenue': weekday['Revenue'].to_numpy(),
+        'Orders': weekday['Orders'].to_numpy(),
+        'Avg Order Value': (
+            weekday['Gross sales'] / weekday['Gross count'].replace(0, np.nan)
+        ).to_numpy(),
+    })
+
+    hour = cube.groupby('Hour', sort=True)[['Revenue', 'Orders']].sum().reset_index()
+    hour['Hour'] = hour['Hour'].astype('int64')
+
+    meal = cube.groupby('Meal Period', observed=True, sort=True)[['Revenue', 'Orders']].sum().reset_index()
+    day_part = cube.groupby('Day Part', observed=True, sort=True)[['Revenue', 'Orders']].sum().reset_index()
+
+    dispatch = cube.groupby('Dispatch type', observed=True, sort=True)['Gross sales'].sum().reset_index()
+    channel = cube.groupby('Sales channel name', observed=True, sort=True)['Gross sales'].sum().reset_index()
+
+    return RollupBundle({
+        "daily": daily,
+        "week": week,
+        "month": month,
+        "weekday": weekday,
+        "hour": hour,
+        "meal": meal,
+        "day_part": day_part,
+        "dispatch": dispatch,
+        "channel": channel,
+    })
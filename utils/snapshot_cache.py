@@ -0,0 +1,188 @@
+"""
+Local Snapshot Cache
+====================
+Keeps an Arrow IPC (Feather v2) copy of the loaded orders / order_items
+frames on local disk, tagged with the watermarks they were loaded up to.
+
+On a cold start the dashboard reads the snapshot back and then asks
+Supabase only for the rows past those watermarks, so startup costs a local
+disk read instead of downloading the full history.
+
+The snapshot is a series of segments, one directory each:
+
+    snapshot-000001/   full      every held order / order item
+    snapshot-000002/   delta     orders / items with an id past the previous
+    ...                          segment's watermarks, less the store's overlap
+        orders.arrow       -> sales_data rows
+        order_items.arrow  -> item_data rows
+        meta.json          -> kind, watermarks, rewrite version, source, save time
+
+A segment is written under a temporary name and renamed into place in one
+step, so a crash never leaves a segment whose files disagree. Saves after
+the first only write the rows past the last segment's watermarks; after
+MAX_DELTAS deltas (or a rewrite) the next save is a full segment and the
+older segments are removed. Loading memory-maps each segment (they are
+written uncompressed) and concatenates them, the later copy of a re-read
+order or item winning.
+"""
+
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 3
+MAX_DELTAS = 20
+
+
+class SnapshotCache:
+    """
+    Read/write the on-disk snapshot.
+
+    Args:
+        directory: where the snapshot segments live
+        source: identifies the database the rows came from; a snapshot
+                saved for another source is ignored
+    """
+
+    def __init__(self, directory, source=""):
+        self.directory = directory
+        self.source = source
+        self._last_meta = None      # meta of the newest segment written or loaded
+
+    def _segments(self):
+        """(number, path) of every complete segment, oldest first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            (int(name.split("-")[1]), os.path.join(self.directory, name))
+            for name in names
+            if name.startswith("snapshot-") and name.split("-")[1].isdigit()
+        )
+
+    def load(self):
+        """
+        Read the snapshot back from its latest full segment onwards.
+
+        Returns:
+            tuple: (sales_data, item_data, meta) or None if there is no
+            usable snapshot; meta is the newest segment's
+        """
+        segments = self._segments()
+        try:
+            metas = []
+            for _, path in segments:
+                with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                    metas.append(json.load(f))
+            starts = [i for i, meta in enumerate(metas) if meta.get("kind") == "full"]
+            if not starts:
+                return None
+            first = starts[-1]
+            meta = metas[-1]
+            if any(
+                m.get("version") != SNAPSHOT_VERSION or m.get("source") != self.source
+                or m.get("rewrite_version") != meta.get("rewrite_version")
+                for m in metas[first:]
+            ):
+                logger.info("Snapshot ignored (different version, source or rewrite)")
+                return None
+            orders, items = [], []
+            for _, path in segments[first:]:
+                orders.append(self._read_table(os.path.join(path, "orders.arrow")))
+                items.append(self._read_table(os.path.join(path, "order_items.arrow")))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Could not read snapshot: {e}")
+            return None
+
+        sales_data = pd.concat(orders, ignore_index=True)
+        if len(orders) > 1:
+            sales_data = sales_data.drop_duplicates('Order ID', keep='last', ignore_index=True)
+        item_data = pd.concat(items, ignore_index=True)
+        if len(items) > 1:
+            item_data = item_data.drop_duplicates('Row ID', keep='last', ignore_index=True)
+        self._last_meta = meta
+        logger.info(
+            f"Snapshot loaded: {len(sales_data):,} orders from {len(orders)} segment(s) "
+            f"saved up to {meta.get('saved_at')}"
+        )
+        return sales_data, item_data, meta
+
+    def save(self, sales_data, item_data, order_watermark, item_watermark, rewrite_version=None,
+             overlap=0):
+        """
+        Write the rows past the last segment's watermarks (everything, for a
+        full segment); failures are logged, not raised.
+
+        Args:
+            overlap: ids below the last watermarks written again, so rows a
+                     late commit added under them reach the snapshot too
+        """
+        last = self._last_meta
+        segments = self._segments()
+        full = (
+            last is None or not segments
+            or last.get("rewrite_version") != rewrite_version
+            or last.get("order_watermark") is None or last.get("item_watermark") is None
+            or len(segments) > MAX_DELTAS
+        )
+        if full:
+            orders, items = sales_data, item_data
+        else:
+            orders = sales_data[sales_data['Change ID'] > last["order_watermark"] - overlap]
+            items = item_data[item_data['Row ID'] > last["item_watermark"] - overlap]
+
+        number = segments[-1][0] + 1 if segments else 1
+        path = os.path.join(self.directory, f"snapshot-{number:06d}")
+        tmp_path = path + ".tmp"
+        meta = {
+            "version": SNAPSHOT_VERSION,
+            "kind": "full" if full else "delta",
+            "source": self.source,
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+            "order_watermark": None if order_watermark is None else int(order_watermark),
+            "item_watermark": None if item_watermark is None else int(item_watermark),
+            "rewrite_version": rewrite_version,
+        }
+        try:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+            self._write_table(orders, os.path.join(tmp_path, "orders.arrow"))
+            self._write_table(items, os.path.join(tmp_path, "order_items.arrow"))
+            with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.rename(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not write snapshot: {e}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return
+        self._last_meta = meta
+        if full:
+            for _, old_path in segments:
+                shutil.rmtree(old_path, ignore_errors=True)
+
+    def clear(self):
+        for _, path in self._segments():
+            shutil.rmtree(path, ignore_errors=True)
+        self._last_meta = None
+
+    @staticmethod
+    def _read_table(path):
+        # Segments are written uncompressed, so the columns are mapped in
+        # from the page cache rather than read into a buffer first
+        return feather.read_table(path, memory_map=True).to_pandas()
+
+    @staticmethod
+    def _write_table(df, path):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        feather.write_feather(table, path, compression="uncompressed")
@@ -0,0 +1,166 @@
+"""
+SQL Rollup Queries
+==================
+Runs the dashboard's aggregations inside Postgres (Supabase) so a rerun only
+moves the grouped result, not the raw `orders` rows.
+
+Rollups (name -> dashboard columns):
+    daily     -> Date, Revenue, Gross Sales, Orders
+    week      -> Week ('YYYY-MM-DD/YYYY-MM-DD', Monday-Sunday), Revenue, Orders
+    month     -> Month ('YYYY-MM'), Revenue, Orders
+    weekday   -> Day, Total Revenue, Orders, Avg Order Value
+    hour      -> Hour, Revenue, Orders
+    meal      -> Meal Period, Revenue, Orders (regrouped from hour)
+    day_part  -> Day Part, Revenue, Orders (regrouped from hour)
+    dispatch  -> Dispatch type, Gross sales
+    channel   -> Sales channel name, Gross sales
+
+Sidebar filters become WHERE clauses; the date range is a half-open
+`order_time` range so an index on order_time can be used.
+
+This is the database-side twin of utils.rollup_engine.build_rollups() and
+returns the same RollupBundle, so sections do not care which one ran.
+
+Usage:
+    rollups = fetch_rollups(engine, start_date, end_date, dispatch_type="Delivery")
+    rollups["daily"]
+"""
+
+from datetime import timedelta
+
+import pandas as pd
+from sqlalchemy import text
+
+from utils.rollup_engine import DAY_NAMES, RollupBundle, week_label
+from utils.time_buckets import DAY_PART_FALLBACK, DAY_PARTS, MEAL_PERIODS, bucket_hours
+
+ROLLUP_QUERIES = {
+    "daily": """
+        SELECT order_time::date AS "Date",
+               COALESCE(SUM(revenue::float8), 0) AS "Revenue",
+               COALESCE(SUM(gross_sales::float8), 0) AS "Gross Sales",
+               COUNT(order_id) AS "Orders"
+        FROM orders {where}
+        GROUP BY 1 ORDER BY 1
+    """,
+    "week": """
+        SELECT date_trunc('week', order_time)::date AS "Week Start",
+               COALESCE(SUM(revenue::float8), 0) AS "Revenue",
+               COUNT(order_id) AS "Orders"
+        FROM orders {where}
+        GROUP BY 1 ORDER BY 1
+    """,
+    "month": """
+        SELECT to_char(order_time, 'YYYY-MM') AS "Month",
+               COALESCE(SUM(revenue::float8), 0) AS "Revenue",
+               COUNT(order_id) AS "Orders"
+        FROM orders {where}
+        GROUP BY 1 ORDER BY 1
+    """,
+    "weekday": """
+        SELECT EXTRACT(ISODOW FROM order_time)::int AS "ISO Day",
+               COALESCE(SUM(revenue::float8), 0) AS "Total Revenue",
+               COUNT(order_id) AS "Orders",
+               AVG(gross_sales::float8) AS "Avg Order Value"
+        FROM orders {where}
+        GROUP BY 1 ORDER BY 1
+    """,
+    "hour": """
+        SELECT EXTRACT(HOUR FROM order_time)::int AS "Hour",
+               COALESCE(SUM(revenue::float8), 0) AS "Revenue",
+               COUNT(order_id) AS "Orders"
+        FROM orders {where}
+        GROUP BY 1 ORDER BY 1
+    """,
+    "dispatch": """
+        SELECT dispatch_type AS "Dispatch type",
+               COALESCE(SUM(gross_sales::float8), 0) AS "Gross sales"
+        FROM orders {where} AND dispatch_type IS NOT NULL
+        GROUP BY 1 ORDER BY 1
+    """,
+    "channel": """
+        SELECT sales_channel_name AS "Sales channel name",
+               COALESCE(SUM(gross_sales::float8), 0) AS "Gross sales"
+        FROM orders {where} AND sales_channel_name IS NOT NULL
+        GROUP BY 1 ORDER BY 1
+    """,
+}
+
+
+def build_where(start_date=None, end_date=None, dispatch_type=None, channel_type=None):
+    """
+    Turn the sidebar selections into a WHERE clause.
+
+    Args:
+        start_date, end_date: inclusive dates (None = unbounded)
+        dispatch_type: value of orders.dispatch_type, or None for all
+        channel_type: value of orders.sales_channel_type, or None for all
+
+    Returns:
+        tuple: (where_sql, params)
+    """
+    clauses = ["TRUE"]
+    params = {}
+    if start_date is not None:
+        clauses.append("order_time >= :start_ts")
+        params["start_ts"] = pd.Timestamp(start_date).to_pydatetime()
+    if end_date is not None:
+        clauses.append("order_time < :end_ts")
+        params["end_ts"] = (pd.Timestamp(end_date) + timedelta(days=1)).to_pydatetime()
+    if dispatch_type is not None:
+        clauses.append("dispatch_type = :dispatch_type")
+        params["dispatch_type"] = dispatch_type
+    if channel_type is not None:
+        clauses.append("sales_channel_type = :channel_type")
+        params["channel_type"] = channel_type
+    return "WHERE " + " AND ".join(clauses), params
+
+
+def _shape(name, df):
+    """Put a raw rollup result into the shape the dashboard sections use."""
+    if name == "week":
+        df.insert(0, "Week", week_label(df["Week Start"]).to_numpy())
+    elif name == "weekday":
+        df.insert(0, "Day", df["ISO Day"].map(lambda d: DAY_NAMES[d - 1]))
+        df = df.drop(columns="ISO Day")
+    return df
+
+
+def fetch_rollup(conn, name, where, params):
+    """Run a single named rollup on an open connection."""
+    query = ROLLUP_QUERIES[name].format(where=where)
+    return _shape(name, pd.read_sql_query(text(query), conn, params=params))
+
+
+def meal_rollup(hour_rollup, meal_periods=MEAL_PERIODS):
+    """Meal periods are whole hours, so they regroup from the hourly result."""
+    meal = hour_rollup[['Revenue', 'Orders']].groupby(
+        bucket_hours(hour_rollup['Hour'], meal_periods), observed=True
+    ).sum()
+    return meal.rename_axis('Meal Period').reset_index()
+
+
+def day_part_rollup(hour_rollup):
+    """Day parts are whole hours too, so they regroup from the hourly result."""
+    day_part = hour_rollup[['Revenue', 'Orders']].groupby(
+        bucket_hours(hour_rollup['Hour'], DAY_PARTS, DAY_PART_FALLBACK), observed=True
+    ).sum()
+    return day_part.rename_axis('Day Part').reset_index()
+
+
+def fetch_rollups(engine, start_date=None, end_date=None, dispatch_type=None,
+                  channel_type=None, names=None, meal_periods=MEAL_PERIODS):
+    """
+    Run several rollups over one connection with the same filters.
+
+    Returns:
+        RollupBundle
+    """
+    where, params = build_where(start_date, end_date, dispatch_type, channel_type)
+    names = names or list(ROLLUP_QUERIES)
+    with engine.connect() as conn:
+        frames = {name: fetch_rollup(conn, name, where, params) for name in names}
+    if "hour" in frames:
+        frames["meal"] = meal_rollup(frames["hour"], meal_periods)
+        frames["day_part"] = day_part_rollup(frames["hour"])
+    return RollupBundle(frames)
@@ -0,0 +1,108 @@
+"""
+Time Bucketing
+==============
+Vectorized hour -> label lookups for meal periods, day parts and hour
+labels. Each bucket set is turned into a 24-entry lookup array once, so
+bucketing any number of orders is a single array index - no per-row
+Python function.
+
+Periods are (start_hour, end_hour, label) with end exclusive; a period may
+wrap past midnight, e.g. (22, 2, "Late"). Hours no period covers get the
+fallback label. Shops can override the meal periods in secrets.toml:
+
+    [[meal_periods]]
+    label = "🌅 Breakfast (8am-12pm)"
+    start = 8
+    end = 12
+
+Usage:
+    sales_data = add_time_buckets(sales_data)
+    sales_data['Meal Period']        # categorical, periods in day order
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+MEAL_PERIODS = [
+    (8, 12, "🌅 Breakfast (8am-12pm)"),
+    (12, 16, "🍽️ Lunch (12pm-4pm)"),
+    (16, 20, "🌆 Evening (4pm-8pm)"),
+    (20, 24, "🌙 Dinner (8pm-12am)"),
+]
+MEAL_FALLBACK = "🌃 Night Shift (12am-8am)"
+
+DAY_PARTS = [
+    (5, 12, "Morning"),
+    (12, 17, "Afternoon"),
+    (17, 22, "Evening"),
+]
+DAY_PART_FALLBACK = "Late Night"
+
+# '12 AM', '1 AM', ... '11 PM' - indexed by hour
+HOUR_LABELS = np.array([
+    datetime(2000, 1, 1, h).strftime("%I %p").lstrip("0") for h in range(24)
+], dtype=object)
+
+
+def meal_periods_from_config(config):
+    """
+    Read [[meal_periods]] entries from secrets; None/empty -> the defaults.
+
+    Returns:
+        list of (start, end, label)
+    """
+    if not config:
+        return MEAL_PERIODS
+    return [(int(p["start"]), int(p["end"]), str(p["label"])) for p in config]
+
+
+def hour_lookup(periods, fallback):
+    """
+    Build the lookup for a bucket set.
+
+    Returns:
+        tuple: (labels, codes) where codes[hour] indexes labels
+    """
+    labels = [label for _, _, label in periods]
+    codes = np.full(24, -1, dtype=np.int16)
+    for i, (start, end, _) in enumerate(periods):
+        hours = range(start, end) if start < end else list(range(start, 24)) + list(range(0, end))
+        for h in hours:
+            if codes[h % 24] == -1:
+                codes[h % 24] = i
+    if (codes == -1).any():
+        labels.append(fallback)
+        codes[codes == -1] = len(labels) - 1
+    return labels, codes
+
+
+def bucket_hours(hours, periods=MEAL_PERIODS, fallback=MEAL_FALLBACK):
+    """
+    Map hours (0-23; NaN allowed) to a categorical of period labels.
+
+    Returns:
+        pd.Categorical
+    """
+    labels, codes = hour_lookup(periods, fallback)
+    hours = pd.Series(hours)
+    valid = hours.notna().to_numpy()
+    index = np.where(valid, hours.fillna(0).to_numpy(), 0).astype(np.int64)
+    return pd.Categorical.from_codes(np.where(valid, codes[index], -1), categories=labels)
+
+
+def add_time_buckets(df, meal_periods=MEAL_PERIODS):
+    """
+    Return df with 'Hour', 'Meal Period' and 'Day Part' columns added.
+
+    Called once per data load, so sections never recompute them per rerun.
+    """
+    hours = df['Order time'].dt.hour
+    if hours.notna().all():
+        hours = hours.astype('int8')
+    return df.assign(**{
+        'Hour': hours,
+        'Meal Period': bucket_hours(hours, meal_periods, MEAL_FALLBACK),
+        'Day Part': bucket_hours(hours, DAY_PARTS, DAY_PART_FALLBACK),
+    })
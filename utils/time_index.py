@@ -0,0 +1,42 @@
+"""
+Sorted Time Index
+=================
+The order frame is kept sorted ascending on 'Order time', so a date range is
+two binary searches over the underlying int64 timestamps and the filtered
+view is a positional range of the base frame - no per-row date objects and
+no boolean mask over the whole history.
+
+Usage:
+    sales_data = sort_by_time(sales_data)
+    lo, hi = date_range_positions(sales_data, start_date, end_date)
+"""
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+
+def sort_by_time(df, column='Order time'):
+    """Sort ascending on the time column (no-op if it already is)."""
+    if df[column].is_monotonic_increasing:
+        return df
+    return df.sort_values(column, kind='stable', na_position='last').reset_index(drop=True)
+
+
+def _to_key(times, value):
+    """Convert a date/datetime to the same datetime64 unit as the index."""
+    return np.datetime64(pd.Timestamp(value)).astype(times.dtype)
+
+
+def date_range_positions(df, start_date, end_date, column='Order time'):
+    """
+    Row positions [lo, hi) covering start_date..end_date inclusive.
+
+    Rows with a missing time sort last and are never inside a range.
+    """
+    times = df[column].to_numpy()
+    lo = np.searchsorted(times, _to_key(times, start_date), side='left')
+    hi = np.searchsorted(times, _to_key(times, pd.Timestamp(end_date) + timedelta(days=1)), side='left')
+    return int(lo), int(hi)
+
@@ -0,0 +1,126 @@
+"""
+Transaction Pages
+=================
+Keyset ("seek") pagination of the orders table for the transaction grid.
+
+Each page is one index range scan in Supabase:
+
+    WHERE <sidebar filters> AND (sort_key, order_id) < (:after_key, :after_id)
+    ORDER BY sort_key DESC, order_id DESC
+    LIMIT :page_size
+
+so page 500 costs the same as page 1 and only page_size rows ever leave
+the database. The cursor is the (sort_key, order_id) of the last row shown;
+order_id breaks ties so no row is skipped or repeated. Jumping to a date is
+just a cursor at that day's boundary.
+
+Sortable columns and their indexes (install_page_indexes):
+    Order time -> order_time                      idx_orders_time_id
+    Revenue    -> COALESCE(revenue, 0)::float8    idx_orders_revenue_f8_id
+
+revenue is REAL. The sort key and the cursor are both float8, so the key
+read back for the last row compares equal to the stored value; a REAL
+printed and re-sent as a Python float would not, and rows at the page
+boundary would be skipped or repeated.
+
+Usage:
+    where, params = build_where(start_date, end_date, dispatch_type, channel_type)
+    page, next_cursor = fetch_page(conn, where, params, sort="Order time")
+    page, next_cursor = fetch_page(conn, where, params, after=next_cursor)
+"""
+
+from datetime import timedelta
+
+import pandas as pd
+from sqlalchemy import text
+
+SORT_KEYS = {
+    "Order time": "order_time",
+    "Revenue": "COALESCE(revenue, 0)::float8",
+}
+
+# SQL type the cursor's key is cast to, matching the sort key
+CURSOR_TYPES = {
+    "Order time": "timestamp",
+    "Revenue": "float8",
+}
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+PAGE_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_orders_time_id ON orders (order_time, order_id);
+DROP INDEX IF EXISTS idx_orders_revenue_id;
+CREATE INDEX IF NOT EXISTS idx_orders_revenue_f8_id ON orders ((COALESCE(revenue, 0)::float8), order_id);
+"""
+
+PAGE_QUERY = """
+SELECT
+    order_id as "Order ID",
+    order_time as "Order time",
+    revenue as "Revenue",
+    tax as "Tax on gross sales",
+    delivery_charges as "Delivery charges",
+    dispatch_type as "Dispatch type",
+    payment_method as "Payment method",
+    sales_channel_name as "Sales channel name",
+    {sort_key} as sort_key
+FROM orders
+{where}
+ORDER BY {sort_key} {direction}, order_id {direction}
+LIMIT :limit
+"""
+
+
+def install_page_indexes(cursor):
+    """Create the (sort key, order_id) indexes the pages seek on (idempotent)."""
+    cursor.execute(PAGE_INDEX_SQL)
+
+
+def date_cursor(day, descending=True):
+    """
+    Cursor that makes the next Order time page start at `day`.
+
+    Newest-first pages continue below the end of the day; oldest-first
+    pages continue from its start. The empty order_id sorts before every
+    real id, so no order at the boundary instant is skipped.
+    """
+    boundary = pd.Timestamp(day) + (timedelta(days=1) if descending else timedelta(0))
+    return boundary.to_pydatetime(), ""
+
+
+def fetch_page(conn, where, params, sort="Order time", descending=True, after=None, page_size=50):
+    """
+    One page of orders.
+
+    Args:
+        where, params: from utils.sql_rollups.build_where()
+        sort: a SORT_KEYS name
+        after: cursor returned for the previous page (None = first page)
+
+    Returns:
+        tuple: (page DataFrame, cursor for the next page or None at the end)
+    """
+    sort_key = SORT_KEYS[sort]
+    params = dict(params, limit=int(page_size) + 1)
+    if after is not None:
+        where += (
+            f" AND ({sort_key}, order_id) {'<' if descending else '>'}"
+            f" (CAST(:after_key AS {CURSOR_TYPES[sort]}), :after_id)"
+        )
+        params["after_key"], params["after_id"] = after
+
+    page = pd.read_sql_query(
+        text(PAGE_QUERY.format(
+            sort_key=sort_key, where=where, direction="DESC" if descending else "ASC"
+        )),
+        conn, params=params,
+    )
+    # One extra row is fetched only to learn whether another page exists
+    has_more = len(page) > page_size
+    page = page.iloc[:page_size]
+    next_cursor = None
+    if has_more:
+        last = page.iloc[-1]
+        key = last["sort_key"]
+        next_cursor = (key.to_pydatetime() if isinstance(key, pd.Timestamp) else float(key), last["Order ID"])
+    return page.drop(columns="sort_key"), next_cursor